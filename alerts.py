@@ -0,0 +1,276 @@
+from typing import Any, Callable, Iterable, NamedTuple
+from pathlib import Path
+from dataclasses import dataclass, field
+import json
+import time
+
+from pynecore.types.ohlcv import OHLCV
+from pynecore.types.na import NA
+
+__all__ = [
+    'AlertEvent',
+    'Cross',
+    'Threshold',
+    'Change',
+    'AlertEngine',
+    'QueueSink',
+    'FileSink',
+]
+
+
+class AlertEvent(NamedTuple):
+    timestamp: int  # Timestamp of the candle
+    bar_index: int
+    script: str | None  # Script id in a chart, None in `fork_runner`
+    alert: str  # Name of the condition
+    value: Any  # 'over'/'under' for crosses, 'above'/'below' for thresholds, the new value for changes
+
+
+def _value(values: dict[str, Any], key: str | float) -> Any:
+    """
+    Output value or constant, NA is None
+    """
+    value = values.get(key) if isinstance(key, str) else key
+    if value is None or isinstance(value, NA):
+        return None
+    return value
+
+
+@dataclass(slots=True)
+class Cross:
+    """
+    `a` crosses `b`, like `ta.crossover` / `ta.crossunder`
+
+    :param a: Output key
+    :param b: Output key or constant level
+    :param direction: 'over', 'under' or 'both'
+    :param name: Name of the alert, default is "<a> x <b>"
+    :param script: Script id, needed in charts
+    """
+    a: str
+    b: str | float
+    direction: str = 'both'
+    name: str | None = None
+    script: str | None = None
+    _prev: tuple[Any, Any] = field(default=(None, None), init=False, repr=False)
+
+    def __post_init__(self):
+        if self.direction not in ('over', 'under', 'both'):
+            raise ValueError(f"Unknown direction: {self.direction}")
+        if self.name is None:
+            self.name = f"{self.a} x {self.b}"
+
+    def reset(self):
+        self._prev = (None, None)
+
+    def check(self, values: dict[str, Any]) -> str | None:
+        a, b = _value(values, self.a), _value(values, self.b)
+        prev_a, prev_b = self._prev
+        self._prev = (a, b)
+        if a is None or b is None or prev_a is None or prev_b is None:
+            return None
+        if a > b and prev_a <= prev_b and self.direction != 'under':
+            return 'over'
+        if a < b and prev_a >= prev_b and self.direction != 'over':
+            return 'under'
+        return None
+
+
+@dataclass(slots=True)
+class Threshold:
+    """
+    Output value gets above or below a level, it fires on the bar it happens, not while it stays there
+
+    :param key: Output key
+    :param level: The level
+    :param direction: 'above', 'below' or 'both'
+    :param name: Name of the alert, default is "<key> <direction> <level>"
+    :param script: Script id, needed in charts
+    """
+    key: str
+    level: float
+    direction: str = 'both'
+    name: str | None = None
+    script: str | None = None
+    _prev: Any = field(default=None, init=False, repr=False)
+
+    def __post_init__(self):
+        if self.direction not in ('above', 'below', 'both'):
+            raise ValueError(f"Unknown direction: {self.direction}")
+        if self.name is None:
+            self.name = f"{self.key} {self.direction} {self.level}"
+
+    def reset(self):
+        self._prev = None
+
+    def check(self, values: dict[str, Any]) -> str | None:
+        value = _value(values, self.key)
+        prev, self._prev = self._prev, value
+        if value is None or prev is None:
+            return None
+        if value > self.level >= prev and self.direction != 'below':
+            return 'above'
+        if value < self.level <= prev and self.direction != 'above':
+            return 'below'
+        return None
+
+
+@dataclass(slots=True)
+class Change:
+    """
+    Output value changes, e.g. a trend flag flips
+
+    :param key: Output key
+    :param name: Name of the alert, default is "<key> change"
+    :param script: Script id, needed in charts
+    """
+    key: str
+    name: str | None = None
+    script: str | None = None
+    _prev: Any = field(default=None, init=False, repr=False)
+
+    def __post_init__(self):
+        if self.name is None:
+            self.name = f"{self.key} change"
+
+    def reset(self):
+        self._prev = None
+
+    def check(self, values: dict[str, Any]) -> Any:
+        value = _value(values, self.key)
+        prev, self._prev = self._prev, value
+        if value is None or prev is None or value == prev:
+            return None
+        return value
+
+
+Condition = Cross | Threshold | Change
+
+
+class AlertEngine:
+    """
+    Declarative alerts evaluated inside `fork_runner` and `ChartRunner.run_iter`
+
+    The runner passes the outputs of every bar to the engine instead of yielding them, and only the events
+    are emitted to the sinks, in batches. A sink is a callable of a list of events, e.g. a function,
+    a `QueueSink` or a `FileSink`.
+    """
+
+    __slots__ = ('conditions', 'sinks', 'batch_size', 'max_delay', 'events', 'emitted', '_batch', '_batch_started')
+
+    def __init__(self, conditions: Iterable[Condition], sinks: Iterable[Callable[[list[AlertEvent]], Any]],
+                 *, batch_size: int = 100, max_delay: float | None = 1.0):
+        """
+        :param conditions: Alert conditions
+        :param sinks: Callables receiving the batches of events
+        :param batch_size: Number of events per batch
+        :param max_delay: Emit a partial batch if its first event is older than this (seconds),
+                          None waits for a full batch or the end of the run
+        """
+        self.conditions = list(conditions)
+        self.sinks = list(sinks)
+        self.batch_size = batch_size
+        self.max_delay = max_delay
+        self.events = 0
+        self.emitted = 0
+        self._batch: list[AlertEvent] = []
+        self._batch_started = 0.0
+
+    def reset(self):
+        """
+        Reset the state of the conditions, the runners call it before the run
+        """
+        for condition in self.conditions:
+            condition.reset()
+
+    def check_scripts(self, script_ids: Iterable[str]):
+        """
+        Check that every condition names a script of the chart, `ChartRunner.run_iter` calls it before the run
+
+        :raises ValueError: If a condition has no script, or its script is not in the chart,
+                            it would never be evaluated
+        """
+        script_ids = set(script_ids)
+        for condition in self.conditions:
+            if condition.script is None:
+                raise ValueError(f"The alert '{condition.name}' needs a script id in a chart!")
+            if condition.script not in script_ids:
+                raise ValueError(f"The alert '{condition.name}' refers to an unknown script: {condition.script}")
+
+    def _check(self, candle: OHLCV, bar_index: int, script_id: str | None, condition: Condition,
+               values: dict[str, Any] | None):
+        if values is None:
+            return
+        value = condition.check(values)
+        if value is not None:
+            if not self._batch:
+                self._batch_started = time.monotonic()
+            self._batch.append(AlertEvent(candle.timestamp, bar_index, script_id, condition.name, value))
+            self.events += 1
+
+    def _after_bar(self):
+        batch = self._batch
+        if batch and (len(batch) >= self.batch_size or
+                      (self.max_delay is not None and time.monotonic() - self._batch_started >= self.max_delay)):
+            self.flush()
+
+    def on_bar(self, candle: OHLCV, bar_index: int, values: dict[str, Any]):
+        """
+        Evaluate the conditions on the outputs of a script
+        """
+        for condition in self.conditions:
+            self._check(candle, bar_index, None, condition, values)
+        self._after_bar()
+
+    def on_chart_bar(self, candle: OHLCV, bar_index: int, res: dict[str, dict[str, Any] | None]):
+        """
+        Evaluate the conditions on the outputs of the scripts of a chart, by the `script` of the conditions
+        """
+        for condition in self.conditions:
+            self._check(candle, bar_index, condition.script, condition, res.get(condition.script))
+        self._after_bar()
+
+    def flush(self):
+        """
+        Emit the pending events
+        """
+        batch = self._batch
+        if not batch:
+            return
+        self._batch = []
+        for sink in self.sinks:
+            sink(batch)
+        self.emitted += len(batch)
+
+
+class QueueSink:
+    """
+    Puts batches into a queue (`queue.Queue`, `multiprocessing.Queue`, ...), one message per batch
+    """
+
+    __slots__ = ('queue',)
+
+    def __init__(self, queue):
+        self.queue = queue
+
+    def __call__(self, events: list[AlertEvent]):
+        self.queue.put(events)
+
+
+class FileSink:
+    """
+    Appends events to a file as JSON lines
+    """
+
+    __slots__ = ('path', '_file')
+
+    def __init__(self, path: Path | str):
+        self.path = path
+        self._file = open(path, 'a')
+
+    def __call__(self, events: list[AlertEvent]):
+        self._file.write(''.join(json.dumps(event._asdict(), default=str) + '\n' for event in events))
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
@@ -0,0 +1,87 @@
+import gc
+import os
+import time
+from pathlib import Path
+
+from candle_cursor import CandleCursor
+
+script_path = Path("./scripts/demo_pyne.py")
+ohlcv_path = Path("./data/ccxt_BYBIT_BTC_USDT_60.ohlcv")
+inputs = {"src": "close", "fast_length": 16, "slow_length": 30}
+repeat = 20  # The bundled file repeated, to get a large backfill
+
+
+def _gc_collections() -> int:
+    return sum(stats['collections'] for stats in gc.get_stats())
+
+
+def _load_tuples() -> list:
+    from pynecore.core.ohlcv_file import OHLCVReader
+
+    with OHLCVReader(str(ohlcv_path)) as reader:
+        candles = [candle for candle in reader if candle.volume >= 0]
+    # Shifted copies, so the timestamps keep increasing
+    span = candles[-1].timestamp - candles[0].timestamp + 3600
+    return [candle._replace(timestamp=candle.timestamp + span * i) for i in range(repeat) for candle in candles]
+
+
+def _load_cursor() -> CandleCursor:
+    cursor = CandleCursor.from_ohlcv_file(ohlcv_path)
+    span = cursor.timestamps[-1] - cursor.timestamps[0] + 3600
+    timestamps = cursor.timestamps[:]
+    columns = (cursor.opens[:], cursor.highs[:], cursor.lows[:], cursor.closes[:], cursor.volumes[:])
+    for i in range(1, repeat):
+        cursor.extend_columns([timestamp + span * i for timestamp in timestamps], *columns)
+    return cursor
+
+
+def _load(loader) -> tuple[object, float, int, float]:
+    """
+    :return: The candles, load time, GC collections while loading, memory of the candles in MB
+    """
+    import tracemalloc
+
+    tracemalloc.start()
+    candles = loader()
+    memory = tracemalloc.get_traced_memory()[0] / 1e6
+    tracemalloc.stop()
+    del candles
+
+    collections = _gc_collections()
+    start = time.perf_counter()
+    candles = loader()
+    return candles, time.perf_counter() - start, _gc_collections() - collections, memory
+
+
+def _run(script_module, source) -> tuple[float, list[float]]:
+    from custom_script_runner_preload_script import fork_runner
+
+    start = time.perf_counter()
+    fast = [plot_data["Fast EMA"] for _, plot_data in fork_runner(script_module, source, inputs)]
+    return time.perf_counter() - start, fast
+
+
+def main():
+    os.environ.setdefault('PYNE_SAVE_SCRIPT_TOML', '0')
+    from custom_script_runner_preload_script import import_script
+
+    script_module = import_script(script_path)
+
+    results = {}
+    for name, loader in (("OHLCV tuples", _load_tuples), ("candle cursor", _load_cursor)):
+        source, load_time, collections, memory = _load(loader)
+        best = float('inf')
+        for _ in range(3):
+            elapsed, fast = _run(script_module, source)
+            best = min(best, elapsed)
+        results[name] = fast
+        print(f"{name}: load {load_time:.2f} s with {collections} GC collections, {memory:.1f} MB, "
+              f"run {len(fast) / best:.0f} bars/s, total {load_time + best:.2f} s")
+
+    # The float32 fields of the file convert exactly to the float64 columns
+    assert results["OHLCV tuples"] == results["candle cursor"], "Outputs differ!"
+    print(f"{len(results['candle cursor'])} bars, outputs are identical")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from typing import Any, Callable, Iterator
+import shutil
+import time
+
+from pynecore.core.ohlcv_file import OHLCVReader
+
+from chart_runner import ChartRunner, _set_lib_properties, _reset_lib_vars
+
+
+ohlcv_path = Path("./data/ccxt_BYBIT_BTC_USDT_60.ohlcv")
+scripts_folder = Path("./scripts")
+# 15 copies of both scripts, a 30 script chart, every copy is a separate module
+copies = 15
+rounds = 3
+
+
+class LegacyChartRunner(ChartRunner):
+    """
+    The bar loop before the execution plan, for comparison
+    """
+
+    __slots__ = ()
+
+    # noinspection PyProtectedMember
+    def run_iter(self, on_progress: Callable | None = None, memory_profiler=None) -> Iterator[dict[str, Any]]:
+        from pynecore import lib
+        from pynecore.lib import barstate
+        from pynecore.core import function_isolation
+        from pynecore.core import script
+
+        self.bar_index = 0
+        function_isolation.reset()
+        lib._plot_data.clear()
+
+        def execute_script_bar(script_id: str) -> dict[str, dict[str, Any]]:
+            self.script_module = self.scripts_modules[script_id].module
+            self.script = self.scripts_modules[script_id].script
+            lib._script = self.script
+            function_isolation.reset_step()
+            lib._lib_semaphore = True
+            for library_title, main_func in script._registered_libraries:
+                main_func()
+            lib._lib_semaphore = False
+            return self.scripts_modules[script_id].execute_bar()
+
+        try:
+            for candle in self.ohlcv_iter:
+                _set_lib_properties(candle, self.bar_index, self.tz, lib)
+                res: dict[str, dict[str, Any]] = {}
+                for script_id in self.scripts_modules:
+                    res[script_id] = execute_script_bar(script_id)
+                yield res
+                _reset_lib_vars(lib)
+                self.bar_index += 1
+                barstate.isfirst = False
+        finally:
+            _reset_lib_vars(lib)
+            function_isolation.reset()
+
+
+def run(runner_cls: type[ChartRunner], scripts: list[tuple[Path, dict[str, Any]]],
+        candles: list) -> tuple[float, list[dict[str, Any]]]:
+    chart = runner_cls(scripts, candles)
+    last: list[dict[str, Any]] = []
+    start = time.perf_counter()
+    for res in chart.run_iter():
+        last = [dict(res)]
+    return time.perf_counter() - start, last
+
+
+def main():
+    with OHLCVReader(str(ohlcv_path)) as reader:
+        candles = [candle for candle in reader if candle.volume >= 0]
+
+    with TemporaryDirectory() as tmp_dir:
+        scripts: list[tuple[Path, dict[str, Any]]] = []
+        for i in range(copies):
+            for name, inputs in (("demo_pyne", {"src": "close", "fast_length": 16, "slow_length": 30}),
+                                 ("vstop", {"length": 30, "src": "close", "factor": 2.0})):
+                path = Path(tmp_dir) / f"{name}_{i:02}.py"
+                shutil.copy(scripts_folder / f"{name}.py", path)
+                scripts.append((path, inputs))
+
+        print(f"{len(scripts)} scripts, {len(candles)} bars")
+        results = {}
+        for name, runner_cls in (("legacy loop", LegacyChartRunner), ("execution plan", ChartRunner)):
+            best = float('inf')
+            for _ in range(rounds):
+                elapsed, last = run(runner_cls, scripts, candles)
+                best = min(best, elapsed)
+                results[name] = last
+            print(f"{name:<20} {len(candles) / best:10.0f} bars/s  {len(candles) * len(scripts) / best:10.0f} "
+                  f"script bars/s")
+
+        assert results["legacy loop"] == results["execution plan"], "The results differ!"
+
+
+if __name__ == '__main__':
+    main()
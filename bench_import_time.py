@@ -0,0 +1,56 @@
+import subprocess
+import sys
+
+# The fast path of short jobs: importing a runner module mustn't import these, they are imported on first use
+entry_points = ('custom_script_runner_preload_script', 'custom_script_runner', 'chart_runner', 'candle_cursor')
+deferred = ('pynecore', 'pathlib', 'zoneinfo', 'dataclasses', 'csv')
+# Cold import of an entry point (module and its imports), best of the rounds, generous for slow machines
+budget_ms = 40.0
+rounds = 5
+
+
+def _cold_import(module: str) -> tuple[float, list[str]]:
+    """
+    Import a module in a fresh interpreter
+
+    :return: The cumulative import time in ms by `-X importtime`, the deferred packages it imported
+    """
+    code = (f"import sys; import {module}; "
+            f"print(' '.join(sorted({{name.split('.')[0] for name in sys.modules}} & {set(deferred)!r})))")
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', code],
+                          capture_output=True, text=True, check=True)
+    # The line of the module itself is the last one of its import, with the cumulative time in us
+    for line in proc.stderr.splitlines():
+        _, _, cumulative, name = (field.strip() for field in line.replace('|', ':').split(':'))
+        if name == module:
+            return int(cumulative) / 1000, proc.stdout.split()
+    raise RuntimeError(f"No import time of {module}!")
+
+
+def main() -> bool:
+    ok = True
+    for module in entry_points:
+        best = float('inf')
+        imported: list[str] = []
+        for _ in range(rounds):
+            elapsed, imported = _cold_import(module)
+            best = min(best, elapsed)
+        verdict = ''
+        if best > budget_ms:
+            verdict = '  <-- OVER BUDGET'
+            ok = False
+        if imported:
+            verdict += f"  <-- imports {', '.join(imported)}"
+            ok = False
+        print(f"{module:>36}: {best:6.1f} ms{verdict}")
+
+    # What the deferred imports cost, paid on the first run of a script
+    best = min(_cold_import('pynecore.lib')[0] for _ in range(rounds))
+    print(f"{'pynecore.lib (on first use)':>36}: {best:6.1f} ms")
+    print()
+    print(f"budget {budget_ms:.0f} ms: " + ("OK" if ok else "FAILED"))
+    return ok
+
+
+if __name__ == '__main__':
+    sys.exit(0 if main() else 1)
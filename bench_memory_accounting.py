@@ -0,0 +1,52 @@
+import os
+import sys
+import time
+from pathlib import Path
+
+from memory_accounting import ScriptMemoryProfiler
+
+# Relative paths, like the README: the frames of tracemalloc report them as the scripts were compiled
+scripts = [
+    (Path("./scripts/demo_pyne.py"), {"src": "close", "fast_length": 16, "slow_length": 30}),
+    (Path("./scripts/vstop.py"), {"length": 30, "src": "close", "factor": 2.0}),
+]
+ohlcv_path = Path("./data/ccxt_BYBIT_BTC_USDT_60.ohlcv")
+bars = 3000
+sample_every = 500
+
+
+def main() -> bool:
+    os.environ.setdefault('PYNE_SAVE_SCRIPT_TOML', '0')
+    from chart_runner import ChartRunner
+    from run_helpers import load_candles
+
+    candles = load_candles(ohlcv_path)[:bars]
+
+    start = time.perf_counter()
+    for _ in ChartRunner(scripts, candles).run_iter():
+        pass
+    plain = time.perf_counter() - start
+
+    profiler = ScriptMemoryProfiler(sample_every=sample_every)
+    start = time.perf_counter()
+    for _ in ChartRunner(scripts, candles).run_iter(memory_profiler=profiler):
+        pass
+    profiled = time.perf_counter() - start
+
+    print(f"{bars} bars, sampled every {sample_every}: {profiled / plain:.1f}x the time of the plain run")
+    print(profiler.summary())
+    print()
+
+    # Every script holds the state of its series and function instances, so nothing attributed means the
+    # frames were not matched to the scripts
+    ok = True
+    for script_id, memory in profiler.scripts.items():
+        if not memory.footprint or not memory.footprint[-1][1] or not memory.lines:
+            print(f"{script_id}: no memory attributed  <-- FAILED")
+            ok = False
+    print("attribution: " + ("OK" if ok else "FAILED"))
+    return ok
+
+
+if __name__ == '__main__':
+    sys.exit(0 if main() else 1)
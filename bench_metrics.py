@@ -0,0 +1,67 @@
+import os
+import time
+import urllib.request
+from pathlib import Path
+from time import perf_counter_ns
+
+from metrics import RunnerMetrics, serve_metrics
+
+script_path = Path("./scripts/demo_pyne.py")
+ohlcv_path = Path("./data/ccxt_BYBIT_BTC_USDT_60.ohlcv")
+inputs = {"src": "close", "fast_length": 16, "slow_length": 30}
+rounds = 7
+
+
+def _instrumentation_ns(bars: int = 200_000) -> float:
+    """
+    Cost of the instrumentation of a bar in isolation: the clock reads and the updates fork_runner makes
+    """
+    metrics = RunnerMetrics()
+    metrics.bar_script = 'demo_pyne'
+    start = time.perf_counter()
+    for timestamp in range(bars):
+        bar_started = perf_counter_ns()
+        bar_done = perf_counter_ns()
+        metrics.on_bar(timestamp, bar_started, bar_done)
+        metrics.consumer_wait_ns += perf_counter_ns() - bar_done
+    elapsed = time.perf_counter() - start
+    # Minus the loop itself
+    start = time.perf_counter()
+    for _ in range(bars):
+        pass
+    return (elapsed - (time.perf_counter() - start)) / bars * 1e9
+
+
+def main():
+    os.environ.setdefault('PYNE_SAVE_SCRIPT_TOML', '0')
+    from custom_script_runner_preload_script import fork_runner, import_script
+    from run_helpers import load_candles
+
+    script_module = import_script(script_path)
+    candles = load_candles(ohlcv_path)
+
+    metrics = RunnerMetrics('demo_pyne')
+    server = serve_metrics(metrics, port=0)
+    best = {False: float('inf'), True: float('inf')}
+    # Interleaved rounds, so a slower period of the machine hits both
+    for _ in range(rounds):
+        for instrumented in (False, True):
+            start = time.perf_counter()
+            for _ in fork_runner(script_module, candles, inputs, metrics=metrics if instrumented else None):
+                pass
+            best[instrumented] = min(best[instrumented], time.perf_counter() - start)
+
+    print(f"instrumentation in isolation: {_instrumentation_ns():.0f} ns/bar")
+    print(f"fork_runner: {best[False] / len(candles) * 1e9:.0f} ns/bar, "
+          f"with metrics {best[True] / len(candles) * 1e9:.0f} ns/bar")
+    print()
+
+    host, port = server.server_address[:2]
+    with urllib.request.urlopen(f"http://{host}:{port}/metrics") as response:
+        print(response.headers['Content-Type'])
+        print(response.read().decode())
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
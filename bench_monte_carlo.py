@@ -0,0 +1,29 @@
+import os
+
+import numpy as np
+
+from monte_carlo import TradeSample, monte_carlo
+
+
+trades_count = 1000
+simulations = 100_000
+
+
+def main():
+    # Synthetic trades with a small edge: 45% winners, 1.5 win/loss ratio
+    rng = np.random.default_rng(42)
+    initial_capital = 100_000.0
+    returns = np.where(rng.random(trades_count) < 0.45, rng.normal(0.015, 0.005, trades_count),
+                       rng.normal(-0.01, 0.003, trades_count))
+    trades = TradeSample(returns * initial_capital / 10, returns, initial_capital)
+
+    for workers in sorted({1, os.cpu_count() or 1}):
+        for method in ('shuffle', 'bootstrap'):
+            result = monte_carlo(trades, simulations, method=method, workers=workers, seed=1)
+            print(f"{method}, {workers} workers: {simulations * trades_count / result.elapsed / 1e6:.1f} M trades/s")
+            print(result.summary())
+            print()
+
+
+if __name__ == '__main__':
+    main()
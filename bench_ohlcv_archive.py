@@ -0,0 +1,71 @@
+from pathlib import Path
+from tempfile import TemporaryDirectory
+import time
+import csv
+
+from pynecore.types.ohlcv import OHLCV
+from pynecore.core.ohlcv_file import OHLCVReader
+
+from ohlcv_archive import OHLCVArchiveWriter, OHLCVArchiveReader
+from custom_script_runner_preload_script import fork_runner, import_script
+
+
+ohlcv_path = Path("./data/ccxt_BYBIT_BTC_USDT_60.ohlcv")
+csv_path = Path("./data/ccxt_BYBIT_BTC_USDT_60.csv")
+script_path = Path("./scripts/demo_pyne.py")
+rounds = 5
+
+variants = [
+    # name, source, writer options
+    ("zlib, float64", ohlcv_path, dict(codec='zlib')),
+    ("zlib, float32", ohlcv_path, dict(codec='zlib', float_format='f')),
+    ("lzma, float32", ohlcv_path, dict(codec='lzma', float_format='f')),
+    ("zlib, 3 decimals (from CSV)", csv_path, dict(codec='zlib', decimals=3)),
+    ("lzma, 3 decimals (from CSV)", csv_path, dict(codec='lzma', decimals=3)),
+]
+
+
+def read_candles(path: Path) -> list[OHLCV]:
+    if path.suffix == '.csv':
+        with open(path, mode='r') as csvfile:
+            return [OHLCV(int(row['timestamp']), float(row['open']), float(row['high']), float(row['low']),
+                          float(row['close']), float(row['volume'])) for row in csv.DictReader(csvfile)]
+    with OHLCVReader(str(path)) as reader:
+        return list(reader)
+
+
+def best_of(func) -> float:
+    best = float('inf')
+    for _ in range(rounds):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    print(f"{'csv':<30} {csv_path.stat().st_size:>9} bytes")
+    print(f"{'ohlcv':<30} {ohlcv_path.stat().st_size:>9} bytes")
+
+    with TemporaryDirectory() as tmp_dir:
+        for name, source_path, options in variants:
+            candles = read_candles(source_path)
+            archive_path = Path(tmp_dir) / "archive.ohlcva"
+            with OHLCVArchiveWriter(archive_path, **options) as writer:
+                writer.write_many(candles)
+
+            with OHLCVArchiveReader(archive_path) as reader:
+                decoded = list(reader)
+                assert [c[:6] for c in decoded] == [c[:6] for c in candles] or options.get('float_format') == 'f'
+                seconds = best_of(lambda: sum(1 for _ in reader.read_from()))
+            print(f"{name:<30} {archive_path.stat().st_size:>9} bytes, "
+                  f"decoding {len(candles) / seconds / 1e6:.2f} M candles/s")
+
+    # Script execution throughput, for comparison
+    script_module = import_script(script_path)
+    candles = read_candles(ohlcv_path)
+    seconds = best_of(lambda: sum(1 for _ in fork_runner(script_module, candles, {})))
+    print(f"{'script execution (demo_pyne)':<30} {len(candles) / seconds / 1e6:.2f} M candles/s")
+
+
+main()
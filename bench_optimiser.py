@@ -0,0 +1,40 @@
+import os
+from pathlib import Path
+
+from pynecore.core.syminfo import SymInfo
+
+from optimiser import Optimiser
+
+script_path = Path("./scripts/ema_cross_strategy.py")
+ohlcv_path = Path("./data/ccxt_BYBIT_BTC_USDT_60.ohlcv")
+
+syminfo = SymInfo(prefix="BYBIT", description="BTC/USDT", ticker="BTC/USDT", currency="USDT", basecurrency="BTC",
+                  period="60", type="crypto", mintick=0.01, pricescale=100, pointvalue=1.0,
+                  opening_hours=[], session_starts=[], session_ends=[])
+space = {
+    "fast_length": range(5, 50, 3),
+    "slow_length": range(20, 200, 10),
+}
+
+
+def main():
+    os.environ.setdefault('PYNE_SAVE_SCRIPT_TOML', '0')
+
+    with Optimiser(script_path, ohlcv_path, space, syminfo=syminfo, seed=1) as optimiser:
+        # Exhaustive grid: every candidate on the full history
+        grid = optimiser.successive_halving(optimiser.grid_size, min_bars=optimiser.total_bars)
+        ranks = {tuple(trial.inputs.values()): rank for rank, trial in enumerate(grid.trials, 1)}
+        print(f"grid: {grid.elapsed:.2f} s, best {grid.best.score:.2f} {grid.best.inputs}")
+        print()
+
+        for name, result in (("successive halving", optimiser.successive_halving(81)),
+                             ("hyperband", optimiser.hyperband(min_bars=300))):
+            rank = ranks[tuple(result.best.inputs.values())]
+            print(f"{name}: {result.elapsed:.2f} s ({result.elapsed / grid.elapsed:.1%} of the grid time), "
+                  f"best is #{rank} of {len(grid.trials)} in the grid")
+            print(result.summary(5))
+            print()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,149 @@
+import copy
+import os
+import pickle
+import random
+import time
+from pathlib import Path
+
+from output_stream import OutputEncoder, OutputDecoder
+
+ohlcv_path = Path("./data/ccxt_BYBIT_BTC_USDT_60.ohlcv")
+scripts = [(Path("./scripts/demo_pyne.py"), {}), (Path("./scripts/vstop.py"), {})]
+wide_scripts = 50
+wide_bars = 20_000
+
+
+def _chart_results() -> list[dict]:
+    from chart_runner import ChartRunner
+    from candle_cursor import CandleCursor
+
+    chart = ChartRunner(scripts, CandleCursor.from_ohlcv_file(ohlcv_path))
+    return [copy.deepcopy(res) for res in chart.run_iter()]
+
+
+def _policy_results() -> list[dict]:
+    """
+    A script with an execution policy has no values (None) before its first due bar
+    """
+    from chart_runner import ChartRunner
+    from execution_policy import ExecutionPolicy
+    from run_helpers import load_candles
+
+    chart = ChartRunner([(*scripts[0], ExecutionPolicy(stride=4, offset=3)), scripts[1]],
+                        load_candles(ohlcv_path)[:2000])
+    bars = [copy.deepcopy(res) for res in chart.run_iter()]
+    assert bars[0]["demo_pyne"] is None
+    return bars
+
+
+def _wide_results() -> list[dict]:
+    """
+    A wide chart: per script a fast moving value, a slow level, a signal and a counter, like a screener
+    """
+    rng = random.Random(1)
+    res = {f"script{i}": {"value": 0.0, "level": 100.0, "signal": False, "count": 0} for i in range(wide_scripts)}
+    bars = []
+    for bar in range(wide_bars):
+        for i, values in enumerate(res.values()):
+            if i % 5 == 0:
+                values["value"] = rng.random()
+            if rng.random() < 0.05:
+                values["level"] = rng.random() * 100.0
+            if rng.random() < 0.01:
+                values["signal"] = not values["signal"]
+                values["count"] += 1
+        bars.append(copy.deepcopy(res))
+    return bars
+
+
+def _toggling_results() -> list[dict]:
+    """
+    Keys which come and go, e.g. a script plotting a value only in a trend
+    """
+    bars = []
+    for bar in range(250):
+        values = {"value": float(bar)}
+        if bar % 3:
+            values["in trend"] = float(bar % 7)
+        if bar % 5 < 2:
+            values["signal"] = bar % 2 == 0
+        bars.append({"toggling": values})
+    return bars
+
+
+def _check(expected: dict, decoded: dict) -> bool:
+    """
+    Every value of the input is decoded, NA and NaN equal themselves, missing keys keep their last value
+    """
+    from pynecore.types.na import NA
+
+    for script_id, values in expected.items():
+        if values is None:  # No values yet, so no columns
+            if decoded.get(script_id):
+                return False
+            continue
+        decoded_values = decoded[script_id]
+        for key, value in values.items():
+            other = decoded_values[key]
+            if isinstance(value, NA) or value != value:
+                if not (isinstance(other, NA) or other != other):
+                    return False
+            elif value != other or value.__class__ is not other.__class__:
+                return False
+    return True
+
+
+def _bench(name: str, bars: list[dict]):
+    start = time.perf_counter()
+    pickles = [pickle.dumps(res, pickle.HIGHEST_PROTOCOL) for res in bars]
+    pickle_encode = time.perf_counter() - start
+    start = time.perf_counter()
+    for data in pickles:
+        pickle.loads(data)
+    pickle_decode = time.perf_counter() - start
+
+    encoder = OutputEncoder()
+    start = time.perf_counter()
+    batches = [batch for batch in map(encoder.encode, bars) if batch]
+    batches.append(encoder.flush())
+    encode = time.perf_counter() - start
+    decoder = OutputDecoder()
+    start = time.perf_counter()
+    decoded = 0
+    for batch in batches:
+        for _ in decoder.decode(batch):
+            decoded += 1
+    decode = time.perf_counter() - start
+    assert decoded == len(bars)
+
+    # The same again, checking every decoded bar against the input
+    decoder = OutputDecoder()
+    bar_iter = iter(bars)
+    for batch in batches:
+        for res in decoder.decode(batch):
+            assert _check(next(bar_iter), res), f"Bar {decoded} decoded wrong!"
+    columns = {(script_id, key) for res in bars for script_id, values in res.items() for key in values or ()}
+    assert len(decoder.columns) == len(columns), "A column got more than one id!"
+
+    n = len(bars)
+    pickle_bytes = sum(map(len, pickles))
+    stream_bytes = sum(map(len, batches))
+    print(f"{name}: {n} bars, {len(columns)} columns, decoded bars equal the input")
+    print(f"    pickle per bar: {pickle_bytes / n:7.1f} B/bar, encode {pickle_encode / n * 1e9:7.0f} ns, "
+          f"decode {pickle_decode / n * 1e9:7.0f} ns")
+    print(f"    delta stream:   {stream_bytes / n:7.1f} B/bar, encode {encode / n * 1e9:7.0f} ns, "
+          f"decode {decode / n * 1e9:7.0f} ns")
+    print(f"    {pickle_bytes / stream_bytes:.1f}x less bandwidth, encode {pickle_encode / encode:.2f}x, "
+          f"decode {pickle_decode / decode:.2f}x the speed")
+
+
+def main():
+    os.environ.setdefault('PYNE_SAVE_SCRIPT_TOML', '0')
+    _bench("demo_pyne + vstop", _chart_results())
+    _bench(f"{wide_scripts} scripts x 4 keys", _wide_results())
+    _bench("toggling keys", _toggling_results())
+    _bench("execution policy, stride 4 offset 3", _policy_results())
+
+
+if __name__ == '__main__':
+    main()
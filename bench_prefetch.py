@@ -0,0 +1,90 @@
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from functools import partial
+from typing import Iterator
+import time
+import csv
+
+from pynecore.types.ohlcv import OHLCV
+from pynecore.core.ohlcv_file import OHLCVReader
+
+from prefetch import PrefetchingSource
+from ohlcv_archive import OHLCVArchiveWriter, OHLCVArchiveReader
+from custom_script_runner_preload_script import fork_runner, import_script
+
+
+ohlcv_path = Path("./data/ccxt_BYBIT_BTC_USDT_60.ohlcv")
+script_path = Path("./scripts/demo_pyne.py")
+repeat = 10  # the bundled history is repeated to have a longer backfill
+
+
+def read_candles_csv(file_path: Path) -> Iterator[OHLCV]:
+    with open(file_path, mode='r') as csvfile:
+        csv_reader = csv.DictReader(csvfile)
+        for row in csv_reader:
+            yield OHLCV(
+                timestamp=int(row['timestamp']),
+                open=float(row['open']),
+                high=float(row['high']),
+                low=float(row['low']),
+                close=float(row['close']),
+                volume=float(row['volume']),
+                extra_fields=None,
+            )
+
+
+def read_archive(archive_path: Path) -> Iterator[OHLCV]:
+    with OHLCVArchiveReader(archive_path) as reader:
+        yield from reader.read_from()
+
+
+def read_network(candles: list[OHLCV], latency: float = 0.02, page_size: int = 4096) -> Iterator[OHLCV]:
+    """ Stand-in for a paged network source """
+    for start in range(0, len(candles), page_size):
+        time.sleep(latency)
+        yield from candles[start:start + page_size]
+
+
+def run(name: str, script_module, source):
+    start = time.perf_counter()
+    count = sum(1 for _ in fork_runner(script_module, source, {}))
+    seconds = time.perf_counter() - start
+    line = f"{name:<36} {count / seconds / 1e3:8.1f} k bars/s"
+    if isinstance(source, PrefetchingSource):
+        stats = source.stats()
+        line += f"  stall {stats['stall_s'] * 1000:7.1f} ms, compute {stats['compute_s'] * 1000:7.1f} ms"
+    print(line)
+
+
+def main():
+    script_module = import_script(script_path)
+    with OHLCVReader(str(ohlcv_path)) as reader:
+        history = list(reader)
+    span = history[-1].timestamp - history[0].timestamp + (history[1].timestamp - history[0].timestamp)
+    candles = [candle._replace(timestamp=candle.timestamp + i * span) for i in range(repeat) for candle in history]
+
+    with TemporaryDirectory() as tmp_dir:
+        csv_path = Path(tmp_dir) / "candles.csv"
+        with open(csv_path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(('timestamp', 'open', 'high', 'low', 'close', 'volume'))
+            writer.writerows(candle[:6] for candle in candles)
+
+        archive_path = Path(tmp_dir) / "archive.ohlcva"
+        with OHLCVArchiveWriter(archive_path, codec='lzma', chunk_size=1024) as writer:
+            writer.write_many(candles)
+
+        run("in-memory list", script_module, candles)
+        run("lzma archive", script_module, read_archive(archive_path))
+        run("lzma archive, prefetch thread", script_module, PrefetchingSource(read_archive(archive_path)))
+        run("network stand-in", script_module, read_network(candles))
+        run("network stand-in, prefetch thread", script_module,
+            PrefetchingSource(read_network(candles)))
+        run("csv", script_module, read_candles_csv(csv_path))
+        run("csv, prefetch thread", script_module, PrefetchingSource(read_candles_csv(csv_path)))
+        run("csv, prefetch process", script_module,
+            PrefetchingSource(partial(read_candles_csv, csv_path), mode='process'))
+
+
+if __name__ == '__main__':
+    main()
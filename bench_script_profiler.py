@@ -0,0 +1,52 @@
+import os
+import time
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+from script_profiler import ScriptProfiler
+
+script_path = Path("./scripts/vstop.py")
+ohlcv_path = Path("./data/ccxt_BYBIT_BTC_USDT_60.ohlcv")
+inputs = {"length": 30, "src": "close", "factor": 2.0}
+rounds = 3
+
+
+def main():
+    os.environ.setdefault('PYNE_SAVE_SCRIPT_TOML', '0')
+    from custom_script_runner_preload_script import fork_runner, import_script
+    from run_helpers import load_candles
+
+    script_module = import_script(script_path)
+    candles = load_candles(ohlcv_path)
+
+    best: dict[str, float] = {}
+    profilers: dict[str, ScriptProfiler] = {}
+    # Interleaved rounds, so a slower period of the machine hits every mode
+    for _ in range(rounds):
+        for mode in (None, 'sample', 'trace'):
+            profiler = ScriptProfiler(mode) if mode else None
+            start = time.perf_counter()
+            for _ in fork_runner(script_module, candles, inputs, profiler=profiler):
+                pass
+            elapsed = time.perf_counter() - start
+            if elapsed < best.get(str(mode), float('inf')):
+                best[str(mode)] = elapsed
+                if profiler:
+                    profilers[mode] = profiler
+
+    for mode, elapsed in best.items():
+        print(f"{mode:>8}: {elapsed / len(candles) * 1e6:6.1f} us/bar ({elapsed / best['None']:.2f}x)")
+    print()
+    for mode, profiler in profilers.items():
+        print(profiler.report(10))
+        print()
+
+    with TemporaryDirectory() as tmp_dir:
+        path = Path(tmp_dir) / "vstop.folded"
+        profilers['trace'].write_folded(path)
+        print(f"{path.name}: {len(path.read_text().splitlines())} stacks, e.g.")
+        print(''.join(path.read_text().splitlines(keepends=True)[-3:]))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+import os
+import time
+from pathlib import Path
+from typing import Any, Callable, Iterator
+
+from pynecore.core.syminfo import SymInfo
+
+from custom_script_runner import ScriptRunner, _SyminfoContext, _switch_syminfo_context, \
+    _set_lib_syminfo_properties
+
+script_path = Path("./scripts/demo_pyne.py")
+ohlcv_path = Path("./data/ccxt_BYBIT_BTC_USDT_60.ohlcv")
+runners = 100
+bars = 300
+rounds = 3
+timezones = ("UTC", "America/New_York", "Europe/Budapest", "Asia/Tokyo", "UTC+0530")
+
+
+def _syminfo(i: int) -> SymInfo:
+    return SymInfo(prefix=f"EX{i % 7}", description=f"Symbol {i}", ticker=f"SYM{i}/USDT", currency="USDT",
+                   basecurrency=f"SYM{i}", period="60", type="crypto", mintick=0.01 * (1 + i % 5), pricescale=100,
+                   pointvalue=1.0, opening_hours=[], session_starts=[], session_ends=[],
+                   timezone=timezones[i % len(timezones)])
+
+
+class LegacyScriptRunner(ScriptRunner):
+    """
+    Sets the whole syminfo and parses the timezone before every bar, like before the context switch
+    """
+
+    __slots__ = ()
+
+    # noinspection PyProtectedMember
+    def run_iter(self, on_progress: Callable | None = None) -> Iterator[tuple[Any, ...]]:
+        from pynecore import lib
+        from pynecore.lib import _parse_timezone
+
+        bar_iter = super().run_iter(on_progress)
+        while True:
+            _set_lib_syminfo_properties(self.syminfo, lib)
+            self.tz = _parse_timezone(lib.syminfo.timezone)
+            try:
+                item = next(bar_iter)
+            except StopIteration:
+                return
+            yield item
+
+
+def _interleaved(runner_cls: type[ScriptRunner], update_syminfo_every_run: bool, candles: list) -> float:
+    """
+    Run the runners bar by bar in turn, like a multi-symbol process does
+    """
+    instances = [runner_cls(script_path, candles, _syminfo(i), update_syminfo_every_run=update_syminfo_every_run)
+                 for i in range(runners)]
+    iters = [runner.run_iter() for runner in instances]
+    start = time.perf_counter()
+    for _ in range(bars):
+        for bar_iter in iters:
+            next(bar_iter)
+    return time.perf_counter() - start
+
+
+def _switch_ns(switches: int = 100_000) -> tuple[float, float, float]:
+    """
+    The syminfo work of a bar: full set and timezone parse, a switch to another context, and no switch
+    """
+    from pynecore import lib
+    from pynecore.lib import _parse_timezone
+
+    syminfos = [_syminfo(i) for i in range(runners)]
+    contexts = [_SyminfoContext(syminfo) for syminfo in syminfos]
+    start = time.perf_counter()
+    for i in range(switches):
+        _set_lib_syminfo_properties(syminfos[i % runners], lib)
+        _parse_timezone(lib.syminfo.timezone)
+    full = time.perf_counter() - start
+    start = time.perf_counter()
+    for i in range(switches):
+        _switch_syminfo_context(contexts[i % runners], lib)
+    switch = time.perf_counter() - start
+    start = time.perf_counter()
+    for i in range(switches):
+        _switch_syminfo_context(contexts[0], lib)
+    same = time.perf_counter() - start
+    return full / switches * 1e9, switch / switches * 1e9, same / switches * 1e9
+
+
+def main():
+    os.environ.setdefault('PYNE_SAVE_SCRIPT_TOML', '0')
+    from candle_cursor import CandleCursor
+
+    candles = list(CandleCursor.from_ohlcv_file(ohlcv_path).window(0, bars))
+
+    full, switch, same = _switch_ns()
+    print(f"syminfo per bar: full set + timezone {full:.0f} ns, switch between {runners} contexts {switch:.0f} ns, "
+          f"same context {same:.0f} ns")
+
+    print(f"{runners} interleaved runners, {bars} bars each")
+    for name, runner_cls, update in (("full set every bar", LegacyScriptRunner, False),
+                                     ("context switch", ScriptRunner, True)):
+        best = min(_interleaved(runner_cls, update, candles) for _ in range(rounds))
+        print(f"{name:<20} {best / (runners * bars) * 1e9:8.0f} ns/bar")
+
+
+if __name__ == '__main__':
+    main()
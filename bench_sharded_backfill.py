@@ -0,0 +1,28 @@
+import os
+from pathlib import Path
+
+from sharded_backfill import sharded_backfill
+
+ohlcv_path = Path("./data/ccxt_BYBIT_BTC_USDT_60.ohlcv")
+scripts = [
+    (Path("./scripts/demo_pyne.py"), {"src": "close", "fast_length": 16, "slow_length": 30}),
+    # Its trailing stop never forgets the path, the verification shows it can't be sharded
+    (Path("./scripts/vstop.py"), {"length": 30, "src": "close", "factor": 2.0}),
+]
+
+
+def main():
+    os.environ.setdefault('PYNE_SAVE_SCRIPT_TOML', '0')
+
+    workers = os.cpu_count() or 1
+    print(f"{workers} CPUs")
+    for script_path, inputs in scripts:
+        result = sharded_backfill(script_path, ohlcv_path, inputs, shards=max(4, workers), workers=workers,
+                                  verify=True)
+        print(f"{script_path.stem}: {result.serial_elapsed / result.elapsed:.2f}x of the serial speed")
+        print(result.summary())
+        print()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+from multiprocessing import get_context
+import time
+
+from shm_table import SharedTablePublisher, SharedTableReader
+
+
+table_name = "pyne_bench_table"
+symbols = [f"SYM{i}" for i in range(100)]
+columns = [(f"script{i}", key) for i in range(10) for key in ("value", "signal")]
+publications = 200_000
+
+
+def writer(name: str, count: int):
+    """
+    Publish rows whose values all equal the publication counter, a torn read would mix them
+    """
+    publisher = SharedTablePublisher(name)
+    values = [0.0] * len(columns)
+    for i in range(count):
+        values[:] = [float(i)] * len(columns)
+        publisher.publish_row(symbols[i % 4], i, i, values)
+    publisher.close()
+
+
+def main():
+    with SharedTablePublisher(table_name, symbols, columns) as publisher, SharedTableReader(table_name) as reader:
+        res = {script_id: {"value": 1.0, "signal": True} for script_id, _ in columns}
+        start = time.perf_counter()
+        for i in range(publications):
+            publisher.publish(symbols[i % len(symbols)], i, i, res)
+        elapsed = time.perf_counter() - start
+        print(f"publish (dict of {len(columns)} values): {elapsed / publications * 1e9:8.0f} ns")
+
+        for name, func in (("sequence poll", lambda: reader.sequence("SYM7")),
+                           ("get", lambda: reader.get("SYM7", "script3", "value")),
+                           ("read_row", lambda: reader.read_row("SYM7")),
+                           ("read (dict)", lambda: reader.read("SYM7"))):
+            start = time.perf_counter()
+            for _ in range(publications):
+                func()
+            elapsed = time.perf_counter() - start
+            print(f"{name:<35} {elapsed / publications * 1e9:8.0f} ns")
+
+        # Consistency while another process is writing
+        for symbol in symbols[:4]:
+            publisher.publish_row(symbol, 0, 0, [0.0] * len(columns))
+        process = get_context('spawn').Process(target=writer, args=(table_name, publications))
+        process.start()
+        reads = torn = 0
+        while process.is_alive():
+            for symbol in symbols[:4]:
+                _, _, bar_index, values = reader.read_row(symbol)
+                reads += 1
+                if any(value != values[0] for value in values) or (bar_index and values[0] != bar_index):
+                    torn += 1
+        process.join()
+        print(f"concurrent reads: {reads}, torn: {torn}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from typing import Iterator
+import time
+import csv
+
+from pynecore.types.ohlcv import OHLCV
+from pynecore.core.ohlcv_file import OHLCVReader
+
+from sqlite_ohlcv import SQLiteOHLCVWriter, SQLiteOHLCVReader
+
+
+ohlcv_path = Path("./data/ccxt_BYBIT_BTC_USDT_60.ohlcv")
+csv_path = Path("./data/ccxt_BYBIT_BTC_USDT_60.csv")
+symbols_count = 50  # synthetic symbols, to have a realistic index size
+rounds = 5
+
+
+def read_candles_csv(file_path: Path) -> Iterator[OHLCV]:
+    with open(file_path, mode='r') as csvfile:
+        csv_reader = csv.DictReader(csvfile)
+        for row in csv_reader:
+            yield OHLCV(
+                timestamp=int(row['timestamp']),
+                open=float(row['open']),
+                high=float(row['high']),
+                low=float(row['low']),
+                close=float(row['close']),
+                volume=float(row['volume']),
+                extra_fields=None,
+            )
+
+
+def bench(name: str, func):
+    best = float('inf')
+    count = 0
+    for _ in range(rounds):
+        start = time.perf_counter()
+        count = func()
+        best = min(best, time.perf_counter() - start)
+    print(f"{name:<40} {count:>8} candles  {best * 1000:8.2f} ms  {count / best / 1e6:6.2f} M candles/s")
+
+
+def main():
+    with TemporaryDirectory() as tmp_dir:
+        db_path = Path(tmp_dir) / "ohlcv.sqlite"
+
+        start = time.perf_counter()
+        with SQLiteOHLCVWriter(db_path) as writer:
+            for i in range(symbols_count):
+                writer.import_ohlcv_file(f"BTC{i}", ohlcv_path)
+            writer.import_csv("BTC_CSV", csv_path)
+        print(f"import of {symbols_count + 1} symbols: {time.perf_counter() - start:.2f} s")
+
+        with OHLCVReader(str(ohlcv_path)) as reader, SQLiteOHLCVReader(db_path) as db:
+            start_ts, end_ts = reader.start_timestamp, reader.end_timestamp
+            # The last tenth of the history
+            range_start = end_ts - (end_ts - start_ts) // 10
+
+            bench("OHLCVReader.read_from, full", lambda: sum(1 for _ in reader.read_from(start_ts, end_ts)))
+            bench("read_candles_csv, full", lambda: sum(1 for _ in read_candles_csv(csv_path)))
+            bench("SQLiteOHLCVReader.read_from, full", lambda: sum(1 for _ in db.read_from("BTC7")))
+            bench("SQLiteOHLCVReader.read_columns, full", lambda: len(db.read_columns("BTC7")['close']))
+            bench("OHLCVReader.read_from, last 10%", lambda: sum(1 for _ in reader.read_from(range_start, end_ts)))
+            bench("SQLiteOHLCVReader.read_from, last 10%",
+                  lambda: sum(1 for _ in db.read_from("BTC7", range_start, end_ts)))
+
+
+main()
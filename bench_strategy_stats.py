@@ -0,0 +1,94 @@
+import math
+import os
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+from pynecore.core.syminfo import SymInfo
+
+from strategy_stats import StrategyStats, track_stats, YEAR_SECONDS
+
+script_path = Path("./scripts/ema_cross_strategy.py")
+ohlcv_path = Path("./data/ccxt_BYBIT_BTC_USDT_60.ohlcv")
+inputs = {"fast_length": 12, "slow_length": 26}
+syminfo = SymInfo(prefix="BYBIT", description="BTC/USDT", ticker="BTC/USDT", currency="USDT", basecurrency="BTC",
+                  period="60", type="crypto", mintick=0.01, pricescale=100, pointvalue=1.0,
+                  opening_hours=[], session_starts=[], session_ends=[])
+
+
+def _batch(trades: list, timestamps: list[int], equity: list[float], initial_capital: float) -> dict[str, float]:
+    """
+    The statistics recomputed from the retained trades and equity curve
+    """
+    profits = np.array([float(trade.profit) for trade in trades])
+    equity_curve = np.array(equity)
+    peak = np.maximum.accumulate(np.concatenate(([initial_capital], equity_curve)))[1:]
+    returns = equity_curve[1:] / equity_curve[:-1] - 1.0
+    periods = YEAR_SECONDS * (len(timestamps) - 1) / (timestamps[-1] - timestamps[0])
+    gross_loss = -profits[profits < 0].sum()
+    return {
+        'net_profit': profits.sum(),
+        'trades': len(profits),
+        'win_rate': (profits > 0).mean(),
+        'profit_factor': profits[profits > 0].sum() / gross_loss,
+        'max_drawdown': (peak - equity_curve).max(),
+        'max_drawdown_percent': ((peak - equity_curve) / peak).max() * 100.0,
+        'sharpe': returns.mean() / returns.std(ddof=1) * math.sqrt(periods),
+    }
+
+
+def main():
+    os.environ.setdefault('PYNE_SAVE_SCRIPT_TOML', '0')
+    from pynecore import lib
+    from pynecore.lib.strategy import Position
+    from pynecore.core.script_runner import _set_lib_syminfo_properties
+    from custom_script_runner_preload_script import fork_runner
+    from run_helpers import load_candles, import_fresh
+
+    script = str(script_path.resolve())
+    script_module = import_fresh(script)
+    script_obj = script_module.main.script
+    _set_lib_syminfo_properties(syminfo, lib)
+    candles = load_candles(ohlcv_path)
+
+    # Streaming: constant memory, the statistics are read every 1000 bars like a live monitor would
+    script_obj.position = Position()
+    tracemalloc.start()
+    stats = StrategyStats(script_obj.initial_capital)
+    start = time.perf_counter()
+    for bar, _ in enumerate(track_stats(fork_runner(script_module, candles, inputs), stats)):
+        if bar % 1000 == 0:
+            stats.as_dict()
+    streaming = time.perf_counter() - start
+    streaming_peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    position = script_obj.position
+
+    # Retained: every trade and equity value kept, recomputed at the end
+    import_fresh(script)  # Restores the module state before the first run
+    script_obj.position = Position()
+    tracemalloc.start()
+    trades, timestamps, equity = [], [], []
+    start = time.perf_counter()
+    for candle, _, new_trades in fork_runner(script_module, candles, inputs):
+        trades.extend(new_trades)
+        timestamps.append(candle.timestamp)
+        p = script_obj.position
+        equity.append(script_obj.initial_capital + p.netprofit + p.openprofit)
+    batch = _batch(trades, timestamps, equity, script_obj.initial_capital)
+    retained = time.perf_counter() - start
+    retained_peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    print(stats.summary())
+    print(f"streaming: {streaming:.2f} s, peak traced memory {streaming_peak / 1e6:.1f} MB")
+    print(f"retained and recomputed: {retained:.2f} s, peak traced memory {retained_peak / 1e6:.1f} MB")
+    print(f"position: net profit {position.netprofit:.2f}, {position.wintrades} winning trades")
+    values = stats.as_dict()
+    for key, value in batch.items():
+        print(f"    {key:>22}: streaming {values[key]:.10g}, batch {value:.10g}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,218 @@
+from typing import Iterable, Iterator, TYPE_CHECKING
+from array import array
+
+if TYPE_CHECKING:
+    from pathlib import Path
+    from pynecore.types.ohlcv import OHLCV
+    from ohlcv_archive import OHLCVArchiveReader
+
+__all__ = [
+    'CandleCursor',
+]
+
+# Fields of an `.ohlcv` record: timestamp (uint32), open, high, low, close, volume (float32)
+_RECORD_FIELDS = 6
+
+
+def _extend(column: array, values: Iterable):
+    # Arrays only extend with arrays of the same type as a block
+    if isinstance(values, array) and values.typecode != column.typecode:
+        values = values.tolist()
+    column.extend(values)
+
+
+class CandleCursor:
+    """
+    Candles in contiguous columns, with a cursor on the current bar
+
+    The columns are arrays, so a long history is a handful of buffers instead of a namedtuple (and
+    a dict of extra fields) per bar, which the garbage collector would have to traverse again and again.
+    `fork_runner` and `ChartRunner` recognise it, advance the cursor in place and read the fields directly
+    from the columns, they yield the cursor itself as the candle. Iterating it gives `OHLCV` tuples,
+    so it can be passed to anything expecting an OHLCV iterator.
+    """
+
+    __slots__ = ('timestamps', 'opens', 'highs', 'lows', 'closes', 'volumes', 'index')
+
+    def __init__(self):
+        self.timestamps = array('q')
+        self.opens = array('d')
+        self.highs = array('d')
+        self.lows = array('d')
+        self.closes = array('d')
+        self.volumes = array('d')
+        # The current bar
+        self.index = 0
+
+    def __len__(self) -> int:
+        return len(self.timestamps)
+
+    def __iter__(self) -> Iterator['OHLCV']:
+        """
+        Iterate the candles as `OHLCV` tuples, the fallback for other consumers
+        """
+        from pynecore.types.ohlcv import OHLCV
+        return map(OHLCV, self.timestamps, self.opens, self.highs, self.lows, self.closes, self.volumes)
+
+    def walk(self) -> Iterator['CandleCursor']:
+        """
+        Advance the cursor over the candles in place
+
+        :return: Iterator yielding the cursor itself on every bar
+        """
+        for self.index in range(len(self.timestamps)):
+            yield self
+
+    # The fields of the current bar, like the ones of `OHLCV`
+
+    @property
+    def timestamp(self) -> int:
+        return self.timestamps[self.index]
+
+    @property
+    def open(self) -> float:
+        return self.opens[self.index]
+
+    @property
+    def high(self) -> float:
+        return self.highs[self.index]
+
+    @property
+    def low(self) -> float:
+        return self.lows[self.index]
+
+    @property
+    def close(self) -> float:
+        return self.closes[self.index]
+
+    @property
+    def volume(self) -> float:
+        return self.volumes[self.index]
+
+    @property
+    def extra_fields(self) -> None:
+        return None
+
+    def ohlcv(self, index: int | None = None) -> 'OHLCV':
+        """
+        Copy of a candle, the cursor changes, so keep a copy if you need the candle later
+
+        :param index: Index of the candle, default is the current bar
+        """
+        from pynecore.types.ohlcv import OHLCV
+        if index is None:
+            index = self.index
+        return OHLCV(self.timestamps[index], self.opens[index], self.highs[index], self.lows[index],
+                     self.closes[index], self.volumes[index])
+
+    def window(self, start: int, end: int) -> 'CandleCursor':
+        """
+        New cursor of a range of the candles, the columns are copied as blocks
+        """
+        cursor = CandleCursor()
+        cursor.extend_columns(self.timestamps[start:end], self.opens[start:end], self.highs[start:end],
+                              self.lows[start:end], self.closes[start:end], self.volumes[start:end])
+        return cursor
+
+    def append(self, candle: 'OHLCV'):
+        """
+        Append a candle
+        """
+        self.timestamps.append(candle.timestamp)
+        self.opens.append(candle.open)
+        self.highs.append(candle.high)
+        self.lows.append(candle.low)
+        self.closes.append(candle.close)
+        self.volumes.append(candle.volume)
+
+    def extend_columns(self, timestamps: Iterable[int], opens: Iterable[float], highs: Iterable[float],
+                       lows: Iterable[float], closes: Iterable[float], volumes: Iterable[float]):
+        """
+        Append candles given by columns, arrays of the same type are copied as a block
+        """
+        _extend(self.timestamps, timestamps)
+        _extend(self.opens, opens)
+        _extend(self.highs, highs)
+        _extend(self.lows, lows)
+        _extend(self.closes, closes)
+        _extend(self.volumes, volumes)
+
+    @classmethod
+    def from_iter(cls, ohlcv_iter: Iterable['OHLCV'], skip_gaps: bool = True) -> 'CandleCursor':
+        """
+        Collect candles of any source
+
+        :param ohlcv_iter: Iterator of OHLCV data
+        :param skip_gaps: Skip gap candles (negative volume)
+        """
+        cursor = cls()
+        append = cursor.append
+        for candle in ohlcv_iter:
+            if skip_gaps and candle.volume < 0:
+                continue
+            append(candle)
+        return cursor
+
+    @classmethod
+    def from_ohlcv_file(cls, path: 'Path', start_timestamp: int | None = None, end_timestamp: int | None = None,
+                        skip_gaps: bool = True) -> 'CandleCursor':
+        """
+        Load an `.ohlcv` file, the records are split into columns without unpacking them one by one
+
+        :param path: Path to the file
+        :param start_timestamp: Start timestamp (inclusive), None means from the first candle
+        :param end_timestamp: End timestamp (inclusive), None means until the last candle
+        :param skip_gaps: Skip gap candles (negative volume), the writer fills gaps with them
+        """
+        from pynecore.core.ohlcv_file import OHLCVReader, RECORD_SIZE
+
+        cursor = cls()
+        with OHLCVReader(str(path)) as reader:
+            start, end = reader.get_positions(start_timestamp, end_timestamp)
+            if end <= start:
+                return cursor
+            # noinspection PyProtectedMember
+            data = reader._mmap[start * RECORD_SIZE:end * RECORD_SIZE]  # type: ignore[index]
+
+        # The records viewed as uint32 and float32 fields, every column is a strided slice
+        fields = array('f', data)
+        timestamps = array('I', data)[0::_RECORD_FIELDS]
+        columns = [fields[i::_RECORD_FIELDS] for i in range(1, _RECORD_FIELDS)]
+        if skip_gaps and any(volume < 0 for volume in columns[-1]):
+            keep = [i for i, volume in enumerate(columns[-1]) if volume >= 0]
+            timestamps = array('I', [timestamps[i] for i in keep])
+            columns = [array('f', [column[i] for i in keep]) for column in columns]
+        cursor.extend_columns(timestamps, *(array('d', column) for column in columns))
+        return cursor
+
+    @classmethod
+    def from_csv(cls, path: 'Path') -> 'CandleCursor':
+        """
+        Load a CSV file with timestamp, open, high, low, close and volume columns
+        """
+        import csv
+        cursor = cls()
+        with open(path, mode='r') as csvfile:
+            reader = csv.reader(csvfile)
+            header = next(reader)
+            columns = [header.index(name) for name in ('timestamp', 'open', 'high', 'low', 'close', 'volume')]
+            timestamp_col, open_col, high_col, low_col, close_col, volume_col = columns
+            for row in reader:
+                cursor.timestamps.append(int(row[timestamp_col]))
+                cursor.opens.append(float(row[open_col]))
+                cursor.highs.append(float(row[high_col]))
+                cursor.lows.append(float(row[low_col]))
+                cursor.closes.append(float(row[close_col]))
+                cursor.volumes.append(float(row[volume_col]))
+        return cursor
+
+    @classmethod
+    def from_archive(cls, reader: 'OHLCVArchiveReader', start_timestamp: int | None = None,
+                     end_timestamp: int | None = None) -> 'CandleCursor':
+        """
+        Load a time range of an `OHLCVArchiveReader`, its chunks are decoded into columns already
+        """
+        cursor = cls()
+        for columns in reader.iter_chunks(start_timestamp, end_timestamp):
+            cursor.extend_columns(*columns)
+        return cursor
@@ -1,17 +1,24 @@
 from typing import Iterable, Iterator, Callable, TYPE_CHECKING, Any
 from types import ModuleType
 import sys
-from pathlib import Path
+import time
+from time import perf_counter_ns
 from datetime import datetime, UTC
 
-from pynecore.types.ohlcv import OHLCV
-
-from pynecore.types import script_type
-
+# pynecore is imported on first use, `bench_import_time.py` checks the budget of the import
 if TYPE_CHECKING:
+    from pathlib import Path
     from zoneinfo import ZoneInfo
+    from candle_cursor import CandleCursor
+    from pynecore.types.ohlcv import OHLCV
     from pynecore.core.script import script
     from pynecore.lib.strategy import Trade
+    from memory_accounting import ScriptMemoryProfiler
+    from execution_policy import ExecutionPolicy
+    from alerts import AlertEngine
+    from hot_reload import HotReloader
+    from metrics import RunnerMetrics
+    from script_profiler import ScriptProfiler
 
 __all__ = [
     'import_script',
@@ -19,7 +26,7 @@ __all__ = [
 ]
 
 
-def import_script(script_path: Path) -> ModuleType:
+def import_script(script_path: 'Path') -> ModuleType:
     """
     Import the script
     """
@@ -50,7 +57,7 @@ def import_script(script_path: Path) -> ModuleType:
 
 
 # noinspection PyShadowingNames
-def _set_lib_properties(ohlcv: OHLCV, bar_index: int, tz: 'ZoneInfo', lib: ModuleType):
+def _set_lib_properties(ohlcv: 'OHLCV', bar_index: int, tz: 'ZoneInfo', lib: ModuleType):
     """
     Set lib properties from OHLCV
     """
@@ -75,6 +82,33 @@ def _set_lib_properties(ohlcv: OHLCV, bar_index: int, tz: 'ZoneInfo', lib: Modul
     lib._time = lib.last_bar_time = int(dt.timestamp() * 1000)  # PineScript representation of time
 
 
+# noinspection PyShadowingNames
+def _set_lib_columns(cursor: 'CandleCursor', bar_index: int, tz: 'ZoneInfo', lib: ModuleType):
+    """
+    Set lib properties from the current bar of a candle cursor
+    """
+    if TYPE_CHECKING:  # This is needed for the type checker to work
+        from .. import lib
+
+    i = cursor.index
+    lib.bar_index = lib.last_bar_index = bar_index
+
+    lib.open = o = cursor.opens[i]
+    lib.high = h = cursor.highs[i]
+    lib.low = l = cursor.lows[i]
+    lib.close = c = cursor.closes[i]
+
+    lib.volume = cursor.volumes[i]
+
+    lib.hl2 = (h + l) / 2.0
+    lib.hlc3 = (h + l + c) / 3.0
+    lib.ohlc4 = (o + h + l + c) / 4.0
+    lib.hlcc4 = (h + l + 2 * c) / 4.0
+
+    dt = lib._datetime = datetime.fromtimestamp(cursor.timestamps[i], UTC).astimezone(tz)
+    lib._time = lib.last_bar_time = int(dt.timestamp() * 1000)  # PineScript representation of time
+
+
 def _reset_lib_vars(lib: ModuleType):
     """
     Reset lib variables to be able to run other scripts
@@ -106,11 +140,12 @@ def _reset_lib_vars(lib: ModuleType):
 
 
 class ScriptModule:
-    def __init__(self, script_path: Path, script_inputs: dict[str, Any]):
+    def __init__(self, script_path: 'Path', script_inputs: dict[str, Any], policy: 'ExecutionPolicy | None' = None):
         """
         Initialize the script module
         :param script_path: The path to the script to run
         :param script_inputs: Inputs to pass to pyne script: {"src": "close", "length": 20,}
+        :param policy: Execution policy of the script, None runs it on every bar
 
         :raises ImportError: If the script does not have a 'main' function
         :raises ImportError: If the 'main' function is not decorated with @script.[indicator|strategy|library]
@@ -118,10 +153,49 @@ class ScriptModule:
         self.module = import_script(script_path)
         self.script = self.module.main.script
         self.inputs = script_inputs
+        self.policy = policy
+
+    @property
+    def skip_safe(self) -> bool:
+        """
+        Whether the script may be skipped on the bars its policy is not due
+        """
+        if self.policy is not None and self.policy.skip_safe is not None:
+            return self.policy.skip_safe
+        return bool(getattr(self.module, '__skip_safe__', False))
+
     def execute_bar(self):
         return self.module.main(**self.inputs)
 
 
+class _ExecutionPlan:
+    """
+    Execution plan of a chart, built once per run
+
+    Module, function and input references are resolved in advance, so the bar loop only has to
+    iterate over tuples, and the result dictionary is allocated once.
+    """
+
+    __slots__ = ('steps', 'libraries', 'res', 'has_policies')
+
+    def __init__(self, scripts_modules: dict[str, ScriptModule],
+                 registered_libraries: list[tuple[str, Callable]]):
+        """
+        :param scripts_modules: script_id -> ScriptModule
+        :param registered_libraries: (library title, main function) of the registered libraries
+        """
+        # (script_id, script, main function, inputs, policy, skip safe)
+        self.steps: tuple[tuple[str, 'script', Callable[..., dict[str, Any]], dict[str, Any],
+                                'ExecutionPolicy | None', bool], ...] = tuple(
+            (script_id, script_module.script, script_module.module.main, script_module.inputs,
+             script_module.policy, script_module.skip_safe)
+            for script_id, script_module in scripts_modules.items()
+        )
+        self.has_policies = any(step[4] is not None for step in self.steps)
+        self.libraries: tuple[Callable, ...] = tuple(main_func for _, main_func in registered_libraries)
+        self.res: dict[str, dict[str, Any]] = dict.fromkeys(scripts_modules)  # type: ignore
+
+
 class ChartRunner:
     """
     Chart runner
@@ -131,16 +205,18 @@ class ChartRunner:
 
     scripts_modules = {}
 
-    def __init__(self, scripts: list[tuple[Path, dict[str, Any]]], ohlcv_iter: Iterable[OHLCV]):
+    def __init__(self, scripts: list[tuple['Path', dict[str, Any]] | tuple['Path', dict[str, Any], 'ExecutionPolicy']],
+                 ohlcv_iter: Iterable['OHLCV']):
         """
         Initialize the chart runner
 
-        :param scripts: script to run: path to script, script_inputs
-        :param ohlcv_iter: Iterator of OHLCV data
+        :param scripts: script to run: path to script, script_inputs, optionally an `ExecutionPolicy`
+        :param ohlcv_iter: Iterator of OHLCV data, or a `CandleCursor`, which is advanced in place
         """
-        for script_path, script_inputs in scripts:
+        for script_path, script_inputs, *policy in scripts:
             script_name = script_path.name[:-3]
-            self.scripts_modules[script_name] = ScriptModule(script_path, script_inputs)
+            self.scripts_modules[script_name] = ScriptModule(script_path, script_inputs,
+                                                             policy[0] if policy else None)
 
         self.ohlcv_iter = ohlcv_iter
         self.bar_index = 0
@@ -149,14 +225,29 @@ class ChartRunner:
         self.tz: ZoneInfo = ZoneInfo("UTC")
 
     # noinspection PyProtectedMember
-    def run_iter(self, on_progress: Callable[[datetime], None] | None = None) \
-            -> Iterator[tuple[OHLCV, dict[str, Any]] | tuple[OHLCV, dict[str, Any], list['Trade']]]:
+    def run_iter(self, on_progress: Callable[[datetime], None] | None = None,
+                 memory_profiler: 'ScriptMemoryProfiler | None' = None,
+                 alerts: 'AlertEngine | None' = None,
+                 hot_reload: 'HotReloader | None' = None,
+                 metrics: 'RunnerMetrics | None' = None,
+                 profiler: 'ScriptProfiler | None' = None) \
+            -> Iterator[tuple['OHLCV', dict[str, Any]] | tuple['OHLCV', dict[str, Any], list['Trade']]]:
         """
         Run the script on the data
 
         :param on_progress: Callback to call on every iteration
-        :return: Return a dictionary with all data the sctipt plotted
+        :param memory_profiler: Optional per-script memory profiler, it samples every Nth bar
+        :param alerts: Evaluate alert conditions on the outputs and emit only the events to its sinks,
+                       the bars are not yielded then, just exhaust the iterator
+        :param hot_reload: Re-import changed scripts between bars, and rebuild their state from the candles
+                           retained by the reloader, the other scripts keep running
+        :param metrics: Record bar latency, per-script execution time, source lag and consumer wait time into it
+        :param profiler: Optional time profiler, it attributes the time to script lines and library call sites
+        :return: Return a dictionary with all data the sctipt plotted, the dictionary is reused between bars,
+                 copy it if you need to keep it. Scripts with an execution policy keep their last published
+                 values (None before the first one) on the bars they are not due
         :raises AssertionError: If the 'main' function does not return a dictionary
+        :raises ValueError: If an alert condition has no script id, or not one of the chart
         """
         from pynecore import lib
         from pynecore.lib import _parse_timezone, barstate, string
@@ -171,39 +262,124 @@ class ChartRunner:
         # Clear plot data
         lib._plot_data.clear()
 
-        def execute_script_bar(script_id: str) -> dict[str, dict[str, Any]]:
-            self.script_module = self.scripts_modules[script_id].module
-            self.script = self.scripts_modules[script_id].script
-            lib._script = self.script
-
-            # Reset function isolation
-            function_isolation.reset_step()
-
-            # Execute registered library main functions before main script
-            lib._lib_semaphore = True
-            for library_title, main_func in script._registered_libraries:
-                main_func()
-            lib._lib_semaphore = False
-
-            # Run the script
-            indic_values = self.scripts_modules[script_id].execute_bar()
-
-            return indic_values
+        plan = _ExecutionPlan(self.scripts_modules, script._registered_libraries)
+        steps = plan.steps
+        libraries = plan.libraries
+        res = plan.res
+        has_policies = plan.has_policies
+        reset_step = function_isolation.reset_step
+        set_lib_properties = _set_lib_properties
+        set_lib_columns = _set_lib_columns
+        tz = self.tz
+
+        if memory_profiler:
+            memory_profiler.start({script_id: script_module.module.__file__
+                                   for script_id, script_module in self.scripts_modules.items()})
+        if profiler:
+            profiler.start({script_id: script_module.module.__file__
+                            for script_id, script_module in self.scripts_modules.items()})
+        if alerts:
+            alerts.check_scripts(self.scripts_modules)
+            alerts.reset()
+        if hot_reload:
+            hot_reload.start(self.scripts_modules)
+
+        # Fast path of columnar candles: no candle object per bar, the fields are read from the columns,
+        # a `CandleCursor` is recognised by its `walk`, so the runner works without `candle_cursor.py`
+        ohlcv_iter = self.ohlcv_iter
+        cursor = ohlcv_iter if hasattr(ohlcv_iter, 'walk') else None
+        if cursor is not None:
+            ohlcv_iter = cursor.walk()
+
+        bar_started = bar_done = 0
 
         try:
-            for candle in self.ohlcv_iter:
-                # Update lib properties
-                _set_lib_properties(candle, self.bar_index, self.tz, lib)
+            for candle in ohlcv_iter:
+                bar_index = self.bar_index
+                if metrics:
+                    bar_started = perf_counter_ns()
+
+                if hot_reload:
+                    changed = hot_reload.changed()
+                    if changed:
+                        for script_id in changed:
+                            self._hot_reload(script_id, hot_reload, res)
+                        plan = _ExecutionPlan(self.scripts_modules, script._registered_libraries)
+                        plan.res = res
+                        steps = plan.steps
+                        libraries = plan.libraries
+                        has_policies = plan.has_policies
 
-                res: dict[str, dict[str, Any]] = {}
-                for script_id in self.scripts_modules:
-                    res[script_id] = execute_script_bar(script_id)
-                yield res
-                
-                _reset_lib_vars(lib)
+                # Update lib properties
+                if cursor is not None:
+                    set_lib_columns(cursor, bar_index, tz, lib)
+                else:
+                    set_lib_properties(candle, bar_index, tz, lib)
+
+                # Execute registered library main functions once, before the scripts
+                if libraries:
+                    reset_step()
+                    lib._lib_semaphore = True
+                    for main_func in libraries:
+                        main_func()
+                    lib._lib_semaphore = False
+
+                profiled = memory_profiler is not None and memory_profiler.is_sampled(bar_index)
+                if profiled or has_policies:
+                    for script_id, script_, main, inputs, policy, skip_safe in steps:
+                        due = policy is None or policy.is_due(bar_index, candle, res)
+                        if not due and skip_safe:
+                            continue
+                        lib._script = script_
+                        reset_step()
+                        if profiled:
+                            memory_profiler.before_script()
+                        if metrics:
+                            script_started = perf_counter_ns()
+                            values = main(**inputs)
+                            metrics.on_script(script_id, perf_counter_ns() - script_started)
+                        else:
+                            values = main(**inputs)
+                        if profiled:
+                            memory_profiler.after_script(script_id)
+                        # Not due scripts run only to keep their state, the last published values are kept
+                        if due:
+                            res[script_id] = values
+                    if profiled:
+                        memory_profiler.sample(bar_index)
+                elif metrics:
+                    # The end of a script is the start of the next one, one clock read per script
+                    script_started = perf_counter_ns()
+                    for script_id, script_, main, inputs, _, _ in steps:
+                        lib._script = script_
+                        reset_step()
+                        res[script_id] = main(**inputs)
+                        script_done = perf_counter_ns()
+                        metrics.on_script(script_id, script_done - script_started)
+                        script_started = script_done
+                else:
+                    for script_id, script_, main, inputs, _, _ in steps:
+                        lib._script = script_
+                        reset_step()
+                        res[script_id] = main(**inputs)
+
+                if metrics:
+                    bar_done = perf_counter_ns()
+                    metrics.on_bar(candle.timestamp, bar_started, bar_done)
+
+                if alerts:
+                    alerts.on_chart_bar(candle, bar_index, res)
+                else:
+                    yield res
+                    if metrics:
+                        metrics.consumer_wait_ns += perf_counter_ns() - bar_done
+
+                if hot_reload:
+                    # The cursor moves on, the reloader keeps a copy
+                    hot_reload.record(bar_index, candle if cursor is None else cursor.ohlcv())
 
                 # Update bar index
-                self.bar_index += 1
+                self.bar_index = bar_index + 1
                 # It is no longer the first bar
                 barstate.isfirst = False
         except GeneratorExit:
@@ -212,4 +388,49 @@ class ChartRunner:
             # Reset library variables
             _reset_lib_vars(lib)
             # Reset function isolation
-            function_isolation.reset()
\ No newline at end of file
+            function_isolation.reset()
+            # Stop memory tracing
+            if memory_profiler:
+                memory_profiler.stop()
+            if profiler:
+                profiler.stop()
+            # Emit the remaining events
+            if alerts:
+                alerts.flush()
+
+    # noinspection PyProtectedMember
+    def _hot_reload(self, script_id: str, hot_reload: 'HotReloader', res: dict[str, dict[str, Any] | None]):
+        """
+        Re-import a changed script and replay the retained candles on it
+        """
+        from pynecore import lib
+        from pynecore.lib import barstate
+        from pynecore.core import function_isolation
+
+        started = time.perf_counter()
+        script_module = self.scripts_modules[script_id]
+        error = hot_reload.reload(script_module)
+        if error is None:
+            main, inputs = script_module.module.main, script_module.inputs
+            # The library mains run before the script on every bar, like in the bar loop
+            libraries = hot_reload.replay_libraries(script_module.module)
+            values = None
+            try:
+                for replay_index, (bar_index, candle) in enumerate(hot_reload.candles):
+                    _set_lib_properties(candle, bar_index, self.tz, lib)
+                    barstate.isfirst = replay_index == 0
+                    if libraries:
+                        function_isolation.reset_step()
+                        lib._lib_semaphore = True
+                        for _, main_func in libraries:
+                            main_func()
+                        lib._lib_semaphore = False
+                    lib._script = script_module.script
+                    function_isolation.reset_step()
+                    values = main(**inputs)
+            finally:
+                hot_reload.release_libraries(libraries)
+            barstate.isfirst = self.bar_index == 0
+            res[script_id] = values
+        if hot_reload.on_reload:
+            hot_reload.on_reload(script_id, time.perf_counter() - started, error)
@@ -1,18 +1,16 @@
 from typing import Iterable, Iterator, Callable, TYPE_CHECKING, Any
 from types import ModuleType
 import sys
-from pathlib import Path
 from datetime import datetime, UTC
-from dataclasses import field
-
-from pynecore.types.ohlcv import OHLCV
-from pynecore.core.syminfo import SymInfo
-from pynecore.core.csv_file import CSVWriter
-
-from pynecore.types import script_type
+from itertools import count
 
+# Only the fast path is imported with the module, pynecore, the syminfo, the CSV writers and the strategy
+# machinery are imported on first use, `bench_import_time.py` checks the budget of the import
 if TYPE_CHECKING:
+    from pathlib import Path
     from zoneinfo import ZoneInfo
+    from pynecore.types.ohlcv import OHLCV
+    from pynecore.core.syminfo import SymInfo
     from pynecore.core.script import script
     from pynecore.lib.strategy import Trade
 
@@ -22,15 +20,13 @@ __all__ = [
 ]
 
 
-from zoneinfo import ZoneInfo
-
 # modified from ScriptRunner.run_iter to match desired parameters and return values
 # tz and last_bar_index are hardcoded to match desired parameters and return values
-def fork_runner(script_path: Path,
-                ohlcv_iter: Iterable[OHLCV],
+def fork_runner(script_path: 'Path',
+                ohlcv_iter: Iterable['OHLCV'],
                 script_inputs: dict[str, Any] = {},
                 on_progress: Callable[[datetime], None] | None = None) \
-            -> Iterator[tuple[OHLCV, dict[str, Any]] | tuple[OHLCV, dict[str, Any], list['Trade']]]:
+            -> Iterator[tuple['OHLCV', dict[str, Any]] | tuple['OHLCV', dict[str, Any], list['Trade']]]:
         """
         Run the script on the data
 
@@ -43,6 +39,7 @@ def fork_runner(script_path: Path,
         """
 
         last_bar_index = 0
+        from zoneinfo import ZoneInfo
         tz: ZoneInfo = ZoneInfo("UTC")
 
 
@@ -59,6 +56,7 @@ def fork_runner(script_path: Path,
         # from ..lib import _parse_timezone, barstate, string
         from pynecore.lib import _parse_timezone, barstate, string
         from pynecore.core import function_isolation
+        from pynecore.types import script_type
 
         is_strat = script_obj.script_type == script_type.strategy
 
@@ -135,7 +133,7 @@ def fork_runner(script_path: Path,
             pass
 
 
-def import_script(script_path: Path) -> ModuleType:
+def import_script(script_path: 'Path') -> ModuleType:
     """
     Import the script
     """
@@ -162,7 +160,7 @@ def import_script(script_path: Path) -> ModuleType:
 
 
 # noinspection PyShadowingNames
-def _set_lib_properties(ohlcv: OHLCV, bar_index: int, tz: 'ZoneInfo', lib: ModuleType):
+def _set_lib_properties(ohlcv: 'OHLCV', bar_index: int, tz: 'ZoneInfo', lib: ModuleType):
     """
     Set lib properties from OHLCV
     """
@@ -187,7 +185,7 @@ def _set_lib_properties(ohlcv: OHLCV, bar_index: int, tz: 'ZoneInfo', lib: Modul
     lib._time = int(dt.timestamp() * 1000)  # PineScript representation of time
 
 
-def _set_lib_syminfo_properties(syminfo: SymInfo, lib: ModuleType):
+def _set_lib_syminfo_properties(syminfo: 'SymInfo', lib: ModuleType):
     """
     Set syminfo library properties from this object
     """
@@ -210,17 +208,97 @@ def _set_lib_syminfo_properties(syminfo: SymInfo, lib: ModuleType):
     lib.syminfo._session_ends = syminfo.session_ends
 
 
+_context_versions = count(1)
+# Diffs kept per context, the contexts of runners gone are forgotten when it is full
+_MAX_DIFFS = 64
+
+
+class _SyminfoContext:
+    """
+    The syminfo lib properties of a runner, precomputed, so runners can switch between their contexts
+    by setting only the properties which differ
+    """
+
+    __slots__ = ('version', 'properties', 'ticker', '_diffs')
+
+    def __init__(self, syminfo: 'SymInfo'):
+        # Every context has a new version, even for the same syminfo, the diffs are keyed by it
+        self.version = next(_context_versions)
+        # The same properties `_set_lib_syminfo_properties` sets, in the same order
+        properties = {key: value for key, value in syminfo.__dict__.items() if value is not None}
+        properties['root'] = syminfo.ticker
+        properties['ticker'] = self.ticker = syminfo.prefix + ':' + syminfo.ticker
+        properties['_opening_hours'] = syminfo.opening_hours
+        properties['_session_starts'] = syminfo.session_starts
+        properties['_session_ends'] = syminfo.session_ends
+        self.properties = properties
+        # Version of the previous context -> properties to set when switching from it
+        self._diffs: dict[int, list[tuple[str, Any]]] = {}
+
+    def diff(self, previous: '_SyminfoContext') -> list[tuple[str, Any]]:
+        """
+        Properties to set when switching from the previous context, None values are not set,
+        as in `_set_lib_syminfo_properties`, so they keep the value of the previous context
+        """
+        try:
+            return self._diffs[previous.version]
+        except KeyError:
+            if len(self._diffs) >= _MAX_DIFFS:
+                self._diffs.clear()
+            missing = object()
+            old = previous.properties
+            diff = self._diffs[previous.version] = [
+                (key, value) for key, value in self.properties.items()
+                if (old_value := old.get(key, missing)) is not value and old_value != value
+            ]
+            return diff
+
+
+# The context installed into lib by a runner, None if unknown
+_installed_context: _SyminfoContext | None = None
+
+
+def _switch_syminfo_context(context: _SyminfoContext, lib: ModuleType):
+    """
+    Install the syminfo context of a runner into lib, nothing is done if it is installed already,
+    only the differences are set if the context of another runner is installed
+    """
+    global _installed_context
+    if TYPE_CHECKING:  # This is needed for the type checker to work
+        # from .. import lib
+        from pynecore.lib import lib
+
+    installed = _installed_context
+    syminfo = lib.syminfo
+    # The ticker string is built for every context, so if it is not the one of the installed context,
+    # someone else (e.g. `_set_lib_syminfo_properties`) has set the syminfo since, and it is set again fully
+    if installed is not None and syminfo.ticker is installed.ticker:
+        if installed is context:
+            return
+        properties = context.diff(installed)
+    else:
+        properties = context.properties.items()
+
+    for key, value in properties:
+        try:
+            setattr(syminfo, key, value)
+        except AttributeError:
+            pass
+    _installed_context = context
+
+
 class ScriptRunner:
     """
     Script runner
     """
 
     __slots__ = ('script_module', 'script', 'ohlcv_iter', 'syminfo', 'update_syminfo_every_run',
-                 'bar_index', 'tz', 'plot_writer', 'strat_writer', 'equity_writer', 'last_bar_index')
+                 'bar_index', 'tz', 'plot_writer', 'strat_writer', 'equity_writer', 'last_bar_index',
+                 'syminfo_context')
 
-    def __init__(self, script_path: Path, ohlcv_iter: Iterable[OHLCV], syminfo: SymInfo, *,
-                 plot_path: Path | None = None, strat_path: Path | None = None,
-                 equity_path: Path | None = None,
+    def __init__(self, script_path: 'Path', ohlcv_iter: Iterable['OHLCV'], syminfo: 'SymInfo', *,
+                 plot_path: 'Path | None' = None, strat_path: 'Path | None' = None,
+                 equity_path: 'Path | None' = None,
                  update_syminfo_every_run: bool = False, last_bar_index=0):
         """
         Initialize the script runner
@@ -232,7 +310,8 @@ class ScriptRunner:
         :param strat_path: Path to save the strategy results
         :param equity_path: Path to save the equity data of the strategy
         :param update_syminfo_every_run: If it is needed to update the syminfo lib in every run,
-                                         needed for parallel script executions
+                                         needed for parallel script executions, only the properties
+                                         differing from the ones of the last runner are set
         :param last_bar_index: Last bar index, the index of the last bar of the historical data
         :raises ImportError: If the script does not have a 'main' function
         :raises ImportError: If the 'main' function is not decorated with @script.[indicator|strategy|library]
@@ -247,7 +326,8 @@ class ScriptRunner:
         self.script: script = self.script_module.main.script
 
         # noinspection PyProtectedMember
-        from ..lib import _parse_timezone
+        # from ..lib import _parse_timezone
+        from pynecore.lib import _parse_timezone
 
         self.ohlcv_iter = ohlcv_iter
         self.syminfo = syminfo
@@ -256,7 +336,9 @@ class ScriptRunner:
         self.bar_index = 0
 
         self.tz = _parse_timezone(syminfo.timezone)
+        self.syminfo_context = _SyminfoContext(syminfo)
 
+        from pynecore.core.csv_file import CSVWriter
         self.plot_writer = CSVWriter(
             plot_path, float_fmt=f".{self.script.precision or 8}g"
         ) if plot_path else None
@@ -270,7 +352,7 @@ class ScriptRunner:
 
     # noinspection PyProtectedMember
     def run_iter(self, on_progress: Callable[[datetime], None] | None = None) \
-            -> Iterator[tuple[OHLCV, dict[str, Any]] | tuple[OHLCV, dict[str, Any], list['Trade']]]:
+            -> Iterator[tuple['OHLCV', dict[str, Any]] | tuple['OHLCV', dict[str, Any], list['Trade']]]:
         """
         Run the script on the data
 
@@ -279,11 +361,13 @@ class ScriptRunner:
         :raises AssertionError: If the 'main' function does not return a dictionary
         """
         # from .. import lib
-        from pynecore.lib import lib
-        from ..lib import _parse_timezone, barstate, string
+        from pynecore import lib
+        # from ..lib import _parse_timezone, barstate, string
+        from pynecore.lib import _parse_timezone, barstate, string
         from pynecore.core import function_isolation
         # from . import script
         from pynecore.core import script
+        from pynecore.types import script_type
 
         is_strat = self.script.script_type == script_type.strategy
 
@@ -295,10 +379,17 @@ class ScriptRunner:
         # Set script data
         lib._script = self.script  # Store script object in lib
 
-        # Update syminfo lib properties if needed
-        if not self.update_syminfo_every_run:
-            _set_lib_syminfo_properties(self.syminfo, lib)
-            self.tz = _parse_timezone(lib.syminfo.timezone)
+        # Update syminfo lib properties, the syminfo may have been changed since the last run. An unchanged
+        # context is kept, so the other contexts don't cache a new diff for every run of this runner
+        context = _SyminfoContext(self.syminfo)
+        if context.properties == self.syminfo_context.properties:
+            context = self.syminfo_context
+        else:
+            self.syminfo_context = context
+        _switch_syminfo_context(context, lib)
+        # The timezone is parsed once, other runners can't change it for this one
+        self.tz = _parse_timezone(lib.syminfo.timezone)
+        update_syminfo = self.update_syminfo_every_run
 
         # Open plot writer if we have one
         if self.plot_writer:
@@ -321,10 +412,10 @@ class ScriptRunner:
 
         try:
             for candle in self.ohlcv_iter:
-                # Update syminfo lib properties if needed, other ScriptRunner instances may have changed them
-                if self.update_syminfo_every_run:
-                    _set_lib_syminfo_properties(self.syminfo, lib)
-                    self.tz = _parse_timezone(lib.syminfo.timezone)
+                # Switch back to the syminfo of this runner if needed, other ScriptRunner instances may have
+                # changed it, nothing is done if it is still installed
+                if update_syminfo:
+                    _switch_syminfo_context(context, lib)
 
                 if self.bar_index == self.last_bar_index:
                     barstate.islast = True
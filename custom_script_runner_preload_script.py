@@ -1,20 +1,23 @@
 from typing import Iterable, Iterator, Callable, TYPE_CHECKING, Any
 from types import ModuleType
+from time import perf_counter_ns
 import sys
-from pathlib import Path
 from datetime import datetime, UTC
-from dataclasses import field
-
-from pynecore.types.ohlcv import OHLCV
-from pynecore.core.syminfo import SymInfo
-from pynecore.core.csv_file import CSVWriter
-
-from pynecore.types import script_type
+from itertools import count
 
+# Only the fast path is imported with the module, pynecore, the syminfo, the CSV writers and the strategy
+# machinery are imported on first use, `bench_import_time.py` checks the budget of the import
 if TYPE_CHECKING:
+    from pathlib import Path
     from zoneinfo import ZoneInfo
+    from candle_cursor import CandleCursor
+    from pynecore.types.ohlcv import OHLCV
+    from pynecore.core.syminfo import SymInfo
     from pynecore.core.script import script
     from pynecore.lib.strategy import Trade
+    from alerts import AlertEngine
+    from metrics import RunnerMetrics
+    from script_profiler import ScriptProfiler
 
 __all__ = [
     'import_script',
@@ -22,28 +25,39 @@ __all__ = [
 ]
 
 
-from zoneinfo import ZoneInfo
-
-
 # modified from ScriptRunner.run_iter to match desired parameters and return values
 # tz and last_bar_index are hardcoded to match desired parameters and return values
 def fork_runner(script_module: ModuleType,
-                ohlcv_iter: Iterable[OHLCV],
+                ohlcv_iter: Iterable['OHLCV'],
                 script_inputs: dict[str, Any] = {},
-                on_progress: Callable[[datetime], None] | None = None) \
-            -> Iterator[tuple[OHLCV, dict[str, Any]] | tuple[OHLCV, dict[str, Any], list['Trade']]]:
+                on_progress: Callable[[datetime], None] | None = None,
+                series_guard: bool = False,
+                alerts: 'AlertEngine | None' = None,
+                first_bar_index: int = 0,
+                metrics: 'RunnerMetrics | None' = None,
+                profiler: 'ScriptProfiler | None' = None) \
+            -> Iterator[tuple['OHLCV', dict[str, Any]] | tuple['OHLCV', dict[str, Any], list['Trade']]]:
         """
         Run the script on the data
 
         :param script_path: The path to the script to run
-        :param ohlcv_iter: Iterator of OHLCV data
+        :param ohlcv_iter: Iterator of OHLCV data, or a `CandleCursor`, which is advanced in place
+                           and yielded as the candle
         :param script_inputs: Inputs to pass to pyne script: {"src": "close", "length": 20,}
         :param on_progress: Callback to call on every iteration
+        :param series_guard: Raise if a bounded series is indexed beyond its bound,
+                             only for scripts imported with `bound_series=True`
+        :param alerts: Evaluate alert conditions on the outputs and emit only the events to its sinks,
+                       the bars are not yielded then, just exhaust the iterator
+        :param first_bar_index: Bar index of the first candle, for runs on a later part of a history
+        :param metrics: Record bar latency, script time, source lag and consumer wait time into it
+        :param profiler: Optional time profiler, it attributes the time to script lines and library call sites
         :return: Return a dictionary with all data the sctipt plotted
         :raises AssertionError: If the 'main' function does not return a dictionary
         """
 
         last_bar_index = 0
+        from zoneinfo import ZoneInfo
         tz: ZoneInfo = ZoneInfo("UTC")
 
         script_obj: script = script_module.main.script
@@ -53,14 +67,21 @@ def fork_runner(script_module: ModuleType,
         # from ..lib import _parse_timezone, barstate, string
         from pynecore.lib import _parse_timezone, barstate, string
         from pynecore.core import function_isolation
+        from pynecore.types import script_type
 
         is_strat = script_obj.script_type == script_type.strategy
 
         # Reset bar_index
-        bar_index = 0
+        bar_index = first_bar_index
         # Reset function isolation
         function_isolation.reset()
 
+        # Bound series buffers to the lookback of the script, isolated functions copy them from the module
+        guard = None
+        if hasattr(script_module, '__series_lookback__'):
+            from series_bounds import apply_series_bounds
+            guard = apply_series_bounds(script_module, script_inputs, guard=series_guard)
+
         # Set script data
         lib._script = script_obj  # Store script object in lib
 
@@ -75,6 +96,22 @@ def fork_runner(script_module: ModuleType,
         # Position shortcut
         position = script_obj.position
 
+        if alerts:
+            alerts.reset()
+
+        if metrics:
+            # The only script, its executions are the bars
+            metrics.bar_script = script_module.__name__
+        if profiler:
+            profiler.start({script_module.__name__: script_module.__file__})
+        bar_started = bar_done = 0
+
+        # Fast path of columnar candles: no candle object per bar, the fields are read from the columns,
+        # a `CandleCursor` is recognised by its `walk`, so the runner works without `candle_cursor.py`
+        cursor = ohlcv_iter if hasattr(ohlcv_iter, 'walk') else None
+        if cursor is not None:
+            ohlcv_iter = cursor.walk()
+
         try:
             for candle in ohlcv_iter:
                 # # Update syminfo lib properties if needed, other ScriptRunner instances may have changed them
@@ -82,11 +119,17 @@ def fork_runner(script_module: ModuleType,
                 #     _set_lib_syminfo_properties(self.syminfo, lib)
                 #     self.tz = _parse_timezone(lib.syminfo.timezone)
 
+                if metrics:
+                    bar_started = perf_counter_ns()
+
                 if bar_index == last_bar_index:
                     barstate.islast = True
 
                 # Update lib properties
-                _set_lib_properties(candle, bar_index, tz, lib)
+                if cursor is not None:
+                    _set_lib_columns(cursor, bar_index, tz, lib)
+                else:
+                    _set_lib_properties(candle, bar_index, tz, lib)
 
                 # Reset function isolation
                 function_isolation.reset_step()
@@ -98,17 +141,30 @@ def fork_runner(script_module: ModuleType,
                 # Run the script
                 res = script_module.main(**script_inputs)
 
+                # Guard the series of newly isolated functions
+                if guard:
+                    guard.sweep()
+
                 # Update plot data with the results
                 if res is not None:
                     assert isinstance(res, dict), "The 'main' function must return a dictionary!"
                     lib._plot_data.update(res)
-                
+
+                if metrics:
+                    bar_done = perf_counter_ns()
+                    metrics.on_bar(candle.timestamp, bar_started, bar_done)
+
                 # Yield plot data to be able to process in a subclass
-                if not is_strat:
+                if alerts:
+                    alerts.on_bar(candle, bar_index, lib._plot_data)
+                elif not is_strat:
                     yield candle, lib._plot_data
                 elif position:
                     yield candle, lib._plot_data, position.new_closed_trades
-                
+
+                if metrics:
+                    metrics.consumer_wait_ns += perf_counter_ns() - bar_done
+
                 # Clear plot data
                 lib._plot_data.clear()
 
@@ -127,11 +183,23 @@ def fork_runner(script_module: ModuleType,
 
         except GeneratorExit:
             pass
+        finally:  # Python reference counter will close this even if the iterator is not exhausted
+            # Reset library variables, so scripts imported after this run see clean sources
+            _reset_lib_vars(lib)
+            if profiler:
+                profiler.stop()
+            # Emit the remaining events
+            if alerts:
+                alerts.flush()
 
 
-def import_script(script_path: Path) -> ModuleType:
+def import_script(script_path: 'Path', bound_series: bool = False) -> ModuleType:
     """
     Import the script
+
+    :param script_path: The path to the script
+    :param bound_series: Analyse the lookback of the series of the script, `fork_runner` will bound
+                         every series buffer to it, `max_bars_back` of the script's toml overrides it
     """
     from importlib import import_module
     # Import hook only before importing the script, to make import hook being used only for Pyne scripts
@@ -156,11 +224,15 @@ def import_script(script_path: Path) -> ModuleType:
         raise ImportError(f"The 'main' function must be decorated with "
                             f"@script.[indicator|strategy|library] to run!")
 
+    if bound_series:
+        from series_bounds import analyse_lookback
+        module.__series_lookback__ = analyse_lookback(script_path)
+
     return module
 
 
 # noinspection PyShadowingNames
-def _set_lib_properties(ohlcv: OHLCV, bar_index: int, tz: 'ZoneInfo', lib: ModuleType):
+def _set_lib_properties(ohlcv: 'OHLCV', bar_index: int, tz: 'ZoneInfo', lib: ModuleType):
     """
     Set lib properties from OHLCV
     """
@@ -185,7 +257,62 @@ def _set_lib_properties(ohlcv: OHLCV, bar_index: int, tz: 'ZoneInfo', lib: Modul
     lib._time = int(dt.timestamp() * 1000)  # PineScript representation of time
 
 
-def _set_lib_syminfo_properties(syminfo: SymInfo, lib: ModuleType):
+# noinspection PyShadowingNames
+def _set_lib_columns(cursor: 'CandleCursor', bar_index: int, tz: 'ZoneInfo', lib: ModuleType):
+    """
+    Set lib properties from the current bar of a candle cursor
+    """
+    if TYPE_CHECKING:  # This is needed for the type checker to work
+        from pynecore.lib import lib
+
+    i = cursor.index
+    lib.bar_index = bar_index
+
+    lib.open = o = cursor.opens[i]
+    lib.high = h = cursor.highs[i]
+    lib.low = l = cursor.lows[i]
+    lib.close = c = cursor.closes[i]
+    lib.volume = cursor.volumes[i]
+
+    lib.hl2 = (h + l) / 2.0
+    lib.hlc3 = (h + l + c) / 3.0
+    lib.ohlc4 = (o + h + l + c) / 4.0
+    lib.hlcc4 = (h + l + 2 * c) / 4.0
+
+    dt = lib._datetime = datetime.fromtimestamp(cursor.timestamps[i], UTC).astimezone(tz)
+    lib._time = int(dt.timestamp() * 1000)  # PineScript representation of time
+
+
+def _reset_lib_vars(lib: ModuleType):
+    """
+    Reset lib variables to be able to run other scripts
+    :param lib:
+    :return:
+    """
+    if TYPE_CHECKING:  # This is needed for the type checker to work
+        from pynecore.lib import lib
+    from pynecore.types.source import Source
+
+    lib.open = Source("open")
+    lib.high = Source("high")
+    lib.low = Source("low")
+    lib.close = Source("close")
+    lib.volume = Source("volume")
+    lib.hl2 = Source("hl2")
+    lib.hlc3 = Source("hlc3")
+    lib.ohlc4 = Source("ohlc4")
+    lib.hlcc4 = Source("hlcc4")
+
+    lib._time = 0
+    lib._datetime = datetime.fromtimestamp(0, UTC)
+
+    lib._lib_semaphore = False
+
+    lib.barstate.isfirst = True
+    lib.barstate.islast = False
+
+
+def _set_lib_syminfo_properties(syminfo: 'SymInfo', lib: ModuleType):
     """
     Set syminfo library properties from this object
     """
@@ -208,17 +335,100 @@ def _set_lib_syminfo_properties(syminfo: SymInfo, lib: ModuleType):
     lib.syminfo._session_ends = syminfo.session_ends
 
 
+# The syminfo contexts are a copy of the ones of `custom_script_runner`, so this module stays standalone.
+# The runners of the two modules can be interleaved: each module knows only its own installed context,
+# and a ticker which is not the one of its context means the syminfo was set elsewhere, so it is set fully
+_context_versions = count(1)
+# Diffs kept per context, the contexts of runners gone are forgotten when it is full
+_MAX_DIFFS = 64
+
+
+class _SyminfoContext:
+    """
+    The syminfo lib properties of a runner, precomputed, so runners can switch between their contexts
+    by setting only the properties which differ
+    """
+
+    __slots__ = ('version', 'properties', 'ticker', '_diffs')
+
+    def __init__(self, syminfo: 'SymInfo'):
+        # Every context has a new version, even for the same syminfo, the diffs are keyed by it
+        self.version = next(_context_versions)
+        # The same properties `_set_lib_syminfo_properties` sets, in the same order
+        properties = {key: value for key, value in syminfo.__dict__.items() if value is not None}
+        properties['root'] = syminfo.ticker
+        properties['ticker'] = self.ticker = syminfo.prefix + ':' + syminfo.ticker
+        properties['_opening_hours'] = syminfo.opening_hours
+        properties['_session_starts'] = syminfo.session_starts
+        properties['_session_ends'] = syminfo.session_ends
+        self.properties = properties
+        # Version of the previous context -> properties to set when switching from it
+        self._diffs: dict[int, list[tuple[str, Any]]] = {}
+
+    def diff(self, previous: '_SyminfoContext') -> list[tuple[str, Any]]:
+        """
+        Properties to set when switching from the previous context, None values are not set,
+        as in `_set_lib_syminfo_properties`, so they keep the value of the previous context
+        """
+        try:
+            return self._diffs[previous.version]
+        except KeyError:
+            if len(self._diffs) >= _MAX_DIFFS:
+                self._diffs.clear()
+            missing = object()
+            old = previous.properties
+            diff = self._diffs[previous.version] = [
+                (key, value) for key, value in self.properties.items()
+                if (old_value := old.get(key, missing)) is not value and old_value != value
+            ]
+            return diff
+
+
+# The context installed into lib by a runner, None if unknown
+_installed_context: _SyminfoContext | None = None
+
+
+def _switch_syminfo_context(context: _SyminfoContext, lib: ModuleType):
+    """
+    Install the syminfo context of a runner into lib, nothing is done if it is installed already,
+    only the differences are set if the context of another runner is installed
+    """
+    global _installed_context
+    if TYPE_CHECKING:  # This is needed for the type checker to work
+        # from .. import lib
+        from pynecore.lib import lib
+
+    installed = _installed_context
+    syminfo = lib.syminfo
+    # The ticker string is built for every context, so if it is not the one of the installed context,
+    # someone else (e.g. `_set_lib_syminfo_properties`) has set the syminfo since, and it is set again fully
+    if installed is not None and syminfo.ticker is installed.ticker:
+        if installed is context:
+            return
+        properties = context.diff(installed)
+    else:
+        properties = context.properties.items()
+
+    for key, value in properties:
+        try:
+            setattr(syminfo, key, value)
+        except AttributeError:
+            pass
+    _installed_context = context
+
+
 class ScriptRunner:
     """
     Script runner
     """
 
     __slots__ = ('script_module', 'script', 'ohlcv_iter', 'syminfo', 'update_syminfo_every_run',
-                 'bar_index', 'tz', 'plot_writer', 'strat_writer', 'equity_writer', 'last_bar_index')
+                 'bar_index', 'tz', 'plot_writer', 'strat_writer', 'equity_writer', 'last_bar_index',
+                 'syminfo_context')
 
-    def __init__(self, script_path: Path, ohlcv_iter: Iterable[OHLCV], syminfo: SymInfo, *,
-                 plot_path: Path | None = None, strat_path: Path | None = None,
-                 equity_path: Path | None = None,
+    def __init__(self, script_path: 'Path', ohlcv_iter: Iterable['OHLCV'], syminfo: 'SymInfo', *,
+                 plot_path: 'Path | None' = None, strat_path: 'Path | None' = None,
+                 equity_path: 'Path | None' = None,
                  update_syminfo_every_run: bool = False, last_bar_index=0):
         """
         Initialize the script runner
@@ -245,7 +455,8 @@ class ScriptRunner:
         self.script: script = self.script_module.main.script
 
         # noinspection PyProtectedMember
-        from ..lib import _parse_timezone
+        # from ..lib import _parse_timezone
+        from pynecore.lib import _parse_timezone
 
         self.ohlcv_iter = ohlcv_iter
         self.syminfo = syminfo
@@ -254,7 +465,9 @@ class ScriptRunner:
         self.bar_index = 0
 
         self.tz = _parse_timezone(syminfo.timezone)
+        self.syminfo_context = _SyminfoContext(syminfo)
 
+        from pynecore.core.csv_file import CSVWriter
         self.plot_writer = CSVWriter(
             plot_path, float_fmt=f".{self.script.precision or 8}g"
         ) if plot_path else None
@@ -268,7 +481,7 @@ class ScriptRunner:
 
     # noinspection PyProtectedMember
     def run_iter(self, on_progress: Callable[[datetime], None] | None = None) \
-            -> Iterator[tuple[OHLCV, dict[str, Any]] | tuple[OHLCV, dict[str, Any], list['Trade']]]:
+            -> Iterator[tuple['OHLCV', dict[str, Any]] | tuple['OHLCV', dict[str, Any], list['Trade']]]:
         """
         Run the script on the data
 
@@ -277,11 +490,13 @@ class ScriptRunner:
         :raises AssertionError: If the 'main' function does not return a dictionary
         """
         # from .. import lib
-        from pynecore.lib import lib
-        from ..lib import _parse_timezone, barstate, string
+        from pynecore import lib
+        # from ..lib import _parse_timezone, barstate, string
+        from pynecore.lib import _parse_timezone, barstate, string
         from pynecore.core import function_isolation
         # from . import script
         from pynecore.core import script
+        from pynecore.types import script_type
 
         is_strat = self.script.script_type == script_type.strategy
 
@@ -293,10 +508,17 @@ class ScriptRunner:
         # Set script data
         lib._script = self.script  # Store script object in lib
 
-        # Update syminfo lib properties if needed
-        if not self.update_syminfo_every_run:
-            _set_lib_syminfo_properties(self.syminfo, lib)
-            self.tz = _parse_timezone(lib.syminfo.timezone)
+        # Update syminfo lib properties, the syminfo may have been changed since the last run. An unchanged
+        # context is kept, so the other contexts don't cache a new diff for every run of this runner
+        context = _SyminfoContext(self.syminfo)
+        if context.properties == self.syminfo_context.properties:
+            context = self.syminfo_context
+        else:
+            self.syminfo_context = context
+        _switch_syminfo_context(context, lib)
+        # The timezone is parsed once, other runners can't change it for this one
+        self.tz = _parse_timezone(lib.syminfo.timezone)
+        update_syminfo = self.update_syminfo_every_run
 
         # Open plot writer if we have one
         if self.plot_writer:
@@ -319,10 +541,10 @@ class ScriptRunner:
 
         try:
             for candle in self.ohlcv_iter:
-                # Update syminfo lib properties if needed, other ScriptRunner instances may have changed them
-                if self.update_syminfo_every_run:
-                    _set_lib_syminfo_properties(self.syminfo, lib)
-                    self.tz = _parse_timezone(lib.syminfo.timezone)
+                # Switch back to the syminfo of this runner if needed, other ScriptRunner instances may have
+                # changed it, nothing is done if it is still installed
+                if update_syminfo:
+                    _switch_syminfo_context(context, lib)
 
                 if self.bar_index == self.last_bar_index:
                     barstate.islast = True
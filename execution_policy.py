@@ -0,0 +1,78 @@
+from typing import Any, Callable
+from dataclasses import dataclass
+from datetime import datetime, timedelta, UTC
+
+from pynecore.types.ohlcv import OHLCV
+
+__all__ = [
+    'ExecutionPolicy',
+    'session_close',
+]
+
+
+@dataclass(slots=True)
+class ExecutionPolicy:
+    """
+    Execution policy of a script in a `ChartRunner` chart, the script is due on a bar if all the
+    conditions hold. Between due bars the last published values of the script are carried forward.
+
+    Scripts which are not safe to skip still run on every bar to keep their series and persistent state
+    correct, only their outputs are published on schedule. A script is safe to skip if it declares
+    `__skip_safe__ = True` on module level (its state is only advanced on the bars it runs on),
+    or if `skip_safe` is set here.
+
+    :param stride: Run on every Nth bar
+    :param offset: Bar index offset of the stride: the script is due if bar_index % stride == offset
+    :param schedule: Callable of the candle, e.g. `session_close(...)`
+    :param predicate: Callable of the results of the chart on this bar, results of scripts earlier in
+                      the chart are already updated, others are from their last publication
+    :param skip_safe: Override the `__skip_safe__` declaration of the script
+    """
+    stride: int = 1
+    offset: int = 0
+    schedule: Callable[[OHLCV], bool] | None = None
+    predicate: Callable[[dict[str, dict[str, Any] | None]], bool] | None = None
+    skip_safe: bool | None = None
+
+    def __post_init__(self):
+        if self.stride < 1:
+            raise ValueError("Stride must be at least 1!")
+        if not 0 <= self.offset < self.stride:
+            raise ValueError("Offset must be in [0, stride)!")
+
+    def is_due(self, bar_index: int, candle: OHLCV, res: dict[str, dict[str, Any] | None]) -> bool:
+        """
+        Check if the script is due on the bar
+        """
+        if self.stride > 1 and bar_index % self.stride != self.offset:
+            return False
+        if self.schedule is not None and not self.schedule(candle):
+            return False
+        if self.predicate is not None and not self.predicate(res):
+            return False
+        return True
+
+
+def session_close(session_end: str, timeframe: int, tz: str = 'UTC') -> Callable[[OHLCV], bool]:
+    """
+    Schedule of the bars which contain the session close
+
+    :param session_end: Session close time in "HH:MM" format
+    :param timeframe: Timeframe of the bars in seconds
+    :param tz: Timezone of the session
+    :return: Schedule for `ExecutionPolicy`
+    """
+    from zoneinfo import ZoneInfo
+
+    zone = ZoneInfo(tz)
+    hour, minute = (int(part) for part in session_end.split(':'))
+    bar_length = timedelta(seconds=timeframe)
+
+    def schedule(candle: OHLCV) -> bool:
+        bar_open = datetime.fromtimestamp(candle.timestamp, UTC).astimezone(zone)
+        close_time = bar_open.replace(hour=hour, minute=minute, second=0, microsecond=0)
+        if close_time <= bar_open:
+            close_time += timedelta(days=1)
+        return close_time <= bar_open + bar_length
+
+    return schedule
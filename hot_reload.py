@@ -0,0 +1,217 @@
+from typing import Any, Callable, TYPE_CHECKING
+from types import ModuleType
+from pathlib import Path
+from collections import deque
+import importlib
+import importlib.util
+import os
+import sys
+import time
+
+from pynecore.types.ohlcv import OHLCV
+
+if TYPE_CHECKING:
+    from chart_runner import ScriptModule
+
+__all__ = [
+    'HotReloader',
+]
+
+
+def _file_state(path: str) -> tuple[int, int]:
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:  # E.g. the editor is replacing the file
+        return -1, -1
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _exec_fresh(module: ModuleType) -> ModuleType:
+    """
+    Execute the current source of a module into a new module object, `sys.modules` keeps the old one
+
+    A failing import can't leave the running module half-updated, as `importlib.reload` would.
+    """
+    path = Path(module.__file__)
+    # The bytecode cache is only invalidated by mtime in seconds and size, a quick edit could be missed
+    try:
+        os.remove(importlib.util.cache_from_source(str(path)))
+    except OSError:
+        pass
+    importlib.invalidate_caches()
+
+    new_module = importlib.util.module_from_spec(module.__spec__)
+    sys.path.insert(0, str(path.parent))
+    # Like a normal import, e.g. dataclasses look up their module while the body is executed
+    sys.modules[module.__name__] = new_module
+    try:
+        module.__spec__.loader.exec_module(new_module)
+    finally:
+        sys.modules[module.__name__] = module
+        sys.path.pop(0)
+    return new_module
+
+
+def _drop_scope(scope: Any):
+    """
+    Drop the isolated function instances of a module scope
+    """
+    from pynecore.core import function_isolation
+
+    # noinspection PyProtectedMember
+    function_cache = function_isolation._function_cache
+    for key in [key for key in function_cache if _root_scope(key) == scope]:
+        del function_cache[key]
+
+
+def _root_scope(key: Any) -> Any:
+    """
+    Module scope of a `function_isolation._function_cache` key: ((parent scope, call id), call counter),
+    where the parent scope is the key of the calling isolated function, or the scope id of the module
+    """
+    while isinstance(key, tuple):
+        key = key[0][0]
+    return key
+
+
+class HotReloader:
+    """
+    Hot reload of the scripts of a `ChartRunner`, pass it to `run_iter`
+
+    The script files are checked for changes every `check_interval` seconds. A changed script is
+    re-imported, its isolated function instances are dropped, and its state is rebuilt by replaying
+    the retained candles, the other scripts keep their state.
+    """
+
+    __slots__ = ('check_interval', 'history', 'on_reload', 'candles', 'reloads',
+                 '_files', '_next_check')
+
+    def __init__(self, check_interval: float = 1.0, history: int = 5000,
+                 on_reload: Callable[[str, float, Exception | None], None] | None = None):
+        """
+        :param check_interval: Seconds between checks of the script files
+        :param history: Number of candles retained for replaying, a reloaded script is warmed up on them
+        :param on_reload: Callback: script_id, seconds taken by the reload and replay, the error if the
+                          new version could not be imported (the old version keeps running then)
+        """
+        self.check_interval = check_interval
+        self.history = history
+        self.on_reload = on_reload
+        # (bar_index, candle) of the last bars
+        self.candles: deque[tuple[int, OHLCV]] = deque(maxlen=history)
+        self.reloads = 0
+        # script_id -> (path, file state)
+        self._files: dict[str, tuple[str, tuple[int, int]]] = {}
+        self._next_check = 0.0
+
+    def start(self, scripts_modules: dict[str, 'ScriptModule']):
+        """
+        Start watching the scripts
+        """
+        self._files = {}
+        for script_id, script_module in scripts_modules.items():
+            path = script_module.module.__file__
+            self._files[script_id] = (path, _file_state(path))
+        self.candles.clear()
+        self._next_check = time.monotonic() + self.check_interval
+
+    def record(self, bar_index: int, candle: OHLCV):
+        """
+        Retain a candle for replaying
+        """
+        self.candles.append((bar_index, candle))
+
+    def changed(self) -> list[str]:
+        """
+        Script ids of the changed scripts, the files are checked at most once per `check_interval`
+        """
+        now = time.monotonic()
+        if now < self._next_check:
+            return []
+        self._next_check = now + self.check_interval
+
+        res = []
+        for script_id, (path, state) in self._files.items():
+            new_state = _file_state(path)
+            if new_state != state and new_state[0] >= 0:
+                self._files[script_id] = (path, new_state)
+                res.append(script_id)
+        return res
+
+    # noinspection PyProtectedMember
+    def reload(self, script_module: 'ScriptModule') -> Exception | None:
+        """
+        Re-import the module of a script into a new module object, swap it in if it imports cleanly,
+        and drop the isolated function instances of the old one
+
+        :return: The error if the new version could not be imported, the old version is untouched then
+        """
+        from pynecore.core import script
+
+        module = script_module.module
+        registered = script._registered_libraries
+        libraries = list(registered)
+        try:
+            new_module = _exec_fresh(module)
+            if not hasattr(new_module, 'main'):
+                raise ImportError(f"Script '{module.__file__}' must have a 'main' function to run!")
+            new_script = new_module.main.script
+        except Exception as e:  # The old code keeps running
+            registered[:] = libraries
+            return e
+
+        # A reloaded library has registered its new main function, the old one is dropped
+        old_main = getattr(module, 'main', None)
+        registered[:] = [entry for entry in registered if entry[1] is not old_main]
+
+        sys.modules[module.__name__] = new_module
+        self.reloads += 1
+        old_scope = getattr(module, '__scope_id__', None)
+        if old_scope is not None:
+            _drop_scope(old_scope)
+            # A new scope, so nothing can hit the instances of the old version
+            new_module.__scope_id__ = f"{new_module.__scope_id__}·r{self.reloads}"
+        script_module.module = new_module
+        script_module.script = new_script
+        return None
+
+    # noinspection PyProtectedMember
+    def replay_libraries(self, exclude: ModuleType) -> list[tuple[ModuleType, Callable[[], Any]]]:
+        """
+        Fresh copies of the modules of the registered libraries, to run their main functions while
+        replaying, so the state of the running libraries isn't advanced twice
+
+        :param exclude: The reloaded module, it is replayed as a script
+        :return: (module copy, main function) of the libraries, release them with `release_libraries`
+        """
+        from pynecore.core import script
+
+        registered = script._registered_libraries
+        libraries = list(registered)
+        res = []
+        try:
+            for _, main_func in libraries:
+                module = sys.modules.get(main_func.__module__)
+                if module is None or module is exclude:
+                    continue
+                try:
+                    copy = _exec_fresh(module)
+                except Exception:  # Its own reload reports the error, the running version is not affected
+                    continue
+                if hasattr(copy, '__scope_id__'):
+                    copy.__scope_id__ = f"{copy.__scope_id__}·replay{self.reloads}"
+                res.append((copy, copy.main))
+        finally:
+            # The copies register themselves, but they only live for the replay
+            registered[:] = libraries
+        return res
+
+    @staticmethod
+    def release_libraries(copies: list[tuple[ModuleType, Callable[[], Any]]]):
+        """
+        Drop the isolated function instances of the library copies of a replay
+        """
+        for copy, _ in copies:
+            scope = getattr(copy, '__scope_id__', None)
+            if scope is not None:
+                _drop_scope(scope)
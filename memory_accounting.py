@@ -0,0 +1,186 @@
+from dataclasses import dataclass, field
+import tracemalloc
+import linecache
+import os
+
+__all__ = [
+    'ScriptMemory',
+    'ScriptMemoryProfiler',
+]
+
+
+@dataclass(slots=True)
+class ScriptMemory:
+    """
+    Memory accounting of one script
+
+    :param script_id: The script id in the chart
+    :param filename: The script file
+    :param footprint: (bar_index, bytes) samples of the memory allocated by the script and still alive
+    :param bar_deltas: Net allocated bytes while executing the script on the sampled bars
+    :param lines: Bytes alive by script line at the last sample
+    """
+    script_id: str
+    filename: str
+    footprint: list[tuple[int, int]] = field(default_factory=list)
+    bar_deltas: list[int] = field(default_factory=list)
+    lines: dict[int, int] = field(default_factory=dict)
+
+    def growth(self) -> tuple[float, float]:
+        """
+        Linear regression of the footprint over bar_index
+
+        :return: (bytes per bar, r squared)
+        """
+        n = len(self.footprint)
+        if n < 2:
+            return 0.0, 0.0
+        mean_x = sum(x for x, _ in self.footprint) / n
+        mean_y = sum(y for _, y in self.footprint) / n
+        sxx = sum((x - mean_x) ** 2 for x, _ in self.footprint)
+        syy = sum((y - mean_y) ** 2 for _, y in self.footprint)
+        sxy = sum((x - mean_x) * (y - mean_y) for x, y in self.footprint)
+        if not sxx:
+            return 0.0, 0.0
+        slope = sxy / sxx
+        r2 = sxy * sxy / (sxx * syy) if syy else 0.0
+        return slope, r2
+
+
+class ScriptMemoryProfiler:
+    """
+    Per-script memory profiler for `ChartRunner.run_iter`
+
+    Allocations are traced by tracemalloc and attributed to the innermost script frame of their
+    traceback, so memory allocated by library calls (e.g. `ta.ema`) counts for the calling script line.
+    Tracing slows down every bar, sampling only limits the cost of the measurements.
+    """
+
+    __slots__ = ('sample_every', 'frames', 'min_samples', 'min_growth', 'min_r2',
+                 'scripts', '_files', '_frame_files', '_started_tracing', '_before')
+
+    def __init__(self, sample_every: int = 100, *, frames: int = 32,
+                 min_samples: int = 5, min_growth: float = 1.0, min_r2: float = 0.9):
+        """
+        Initialize the profiler
+
+        :param sample_every: Measure on every Nth bar
+        :param frames: Number of traceback frames tracemalloc stores, it must reach the script frame
+        :param min_samples: Minimum number of samples for the leak detector
+        :param min_growth: Minimum growth in bytes per bar to flag a script as leaking
+        :param min_r2: Minimum r squared of the linear fit to flag a script as leaking
+        """
+        self.sample_every = sample_every
+        self.frames = frames
+        self.min_samples = min_samples
+        self.min_growth = min_growth
+        self.min_r2 = min_r2
+        self.scripts: dict[str, ScriptMemory] = {}
+        self._files: dict[str, ScriptMemory] = {}
+        # Filename of a traceback frame -> absolute path of the script, None if it is not a script
+        self._frame_files: dict[str, str | None] = {}
+        self._started_tracing = False
+        self._before = 0
+
+    def start(self, script_files: dict[str, str]):
+        """
+        Start tracing
+
+        :param script_files: script_id -> script file path
+        """
+        self.scripts = {script_id: ScriptMemory(script_id, filename) for script_id, filename in script_files.items()}
+        # Frames report the filename the code was compiled with, which may be relative, so both are absolute
+        self._files = {os.path.abspath(memory.filename): memory for memory in self.scripts.values()}
+        self._frame_files = {}
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+            self._started_tracing = True
+
+    def stop(self):
+        """
+        Stop tracing if it was started by the profiler
+        """
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+    def is_sampled(self, bar_index: int) -> bool:
+        """
+        Check if the bar needs to be measured
+        """
+        return bar_index % self.sample_every == 0
+
+    def before_script(self):
+        """
+        Call before executing a script on a sampled bar
+        """
+        self._before = tracemalloc.get_traced_memory()[0]
+
+    def after_script(self, script_id: str):
+        """
+        Call after executing a script on a sampled bar
+        """
+        self.scripts[script_id].bar_deltas.append(tracemalloc.get_traced_memory()[0] - self._before)
+
+    def sample(self, bar_index: int):
+        """
+        Take a snapshot and attribute the alive memory to scripts and script lines
+
+        :param bar_index: The current bar index
+        """
+        snapshot = tracemalloc.take_snapshot()
+        files = self._files
+        totals = dict.fromkeys(files, 0)
+        lines: dict[str, dict[int, int]] = {filename: {} for filename in files}
+
+        frame_files = self._frame_files
+        for stat in snapshot.statistics('traceback'):
+            # Innermost script frame first
+            for frame in reversed(stat.traceback):
+                try:
+                    filename = frame_files[frame.filename]
+                except KeyError:
+                    filename = os.path.abspath(frame.filename)
+                    filename = frame_files[frame.filename] = filename if filename in files else None
+                if filename is not None:
+                    totals[filename] += stat.size
+                    script_lines = lines[filename]
+                    script_lines[frame.lineno] = script_lines.get(frame.lineno, 0) + stat.size
+                    break
+
+        for filename, memory in files.items():
+            memory.footprint.append((bar_index, totals[filename]))
+            memory.lines = lines[filename]
+
+    def leaks(self) -> list[str]:
+        """
+        Scripts whose footprint grows linearly with bar_index
+        """
+        res = []
+        for script_id, memory in self.scripts.items():
+            if len(memory.footprint) < self.min_samples:
+                continue
+            slope, r2 = memory.growth()
+            if slope >= self.min_growth and r2 >= self.min_r2:
+                res.append(script_id)
+        return res
+
+    def summary(self, top_lines: int = 5) -> str:
+        """
+        Human readable summary: footprint, growth and the top lines of every script
+
+        :param top_lines: Number of script lines to show per script
+        """
+        leaks = set(self.leaks())
+        out = []
+        for script_id, memory in sorted(self.scripts.items(),
+                                        key=lambda item: -(item[1].footprint[-1][1] if item[1].footprint else 0)):
+            current = memory.footprint[-1][1] if memory.footprint else 0
+            slope, r2 = memory.growth()
+            mean_delta = sum(memory.bar_deltas) / len(memory.bar_deltas) if memory.bar_deltas else 0.0
+            out.append(f"{script_id}: {current / 1024:.1f} KiB, growth {slope:.2f} B/bar (r2 {r2:.2f}), "
+                       f"{mean_delta:.0f} B/bar net allocated{'  <-- LEAK?' if script_id in leaks else ''}")
+            for lineno, size in sorted(memory.lines.items(), key=lambda item: -item[1])[:top_lines]:
+                source = linecache.getline(memory.filename, lineno).strip()
+                out.append(f"    {memory.filename}:{lineno}: {size / 1024:.1f} KiB  {source}")
+        return '\n'.join(out)
@@ -0,0 +1,270 @@
+from typing import Iterable, TYPE_CHECKING
+from bisect import bisect_left
+import threading
+import time
+
+if TYPE_CHECKING:
+    from http.server import ThreadingHTTPServer
+
+__all__ = [
+    'LATENCY_BUCKETS',
+    'WriterMetrics',
+    'RunnerMetrics',
+    'render_openmetrics',
+    'serve_metrics',
+]
+
+# Upper bounds of the bar latency histogram buckets in seconds
+LATENCY_BUCKETS = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+                   0.05, 0.1, 0.25, 1.0)
+
+CONTENT_TYPE = 'application/openmetrics-text; version=1.0.0; charset=utf-8'
+
+
+class WriterMetrics:
+    """
+    Throughput counters of an output writer, e.g. `publish_stage`, or call `record` from your own writer
+    """
+
+    __slots__ = ('name', 'rows', 'bytes')
+
+    def __init__(self, name: str):
+        self.name = name
+        self.rows = 0
+        self.bytes = 0
+
+    def record(self, rows: int = 1, nbytes: int = 0):
+        self.rows += rows
+        self.bytes += nbytes
+
+
+class RunnerMetrics:
+    """
+    Health metrics of a runner, pass it to `fork_runner` or `ChartRunner.run_iter`
+
+    The runner thread is the only writer, and every update is a single integer operation, so there are
+    no locks: the scraping thread may see a bar half recorded (e.g. the sum of the histogram a bar ahead
+    of its buckets), but never a corrupted value. Times are measured in integer nanoseconds.
+
+    The per bar cost is the clock reads of the runner and the `on_bar` call, about 0.4-0.7 us in Python on
+    a slow machine, so the target of well under a microsecond is only met on fast ones. The latencies of
+    a runner mostly fall in the same bucket, so the bucket of the last bar is checked first.
+    """
+
+    __slots__ = ('runner', 'latency_buckets', 'latency_sum_ns', 'script_ns', 'script_runs',
+                 'bar_script', 'last_timestamp', 'last_bar_ns', 'consumer_wait_ns', 'writers', '_bounds_ns',
+                 '_wall_offset_ns', '_bucket', '_bucket_low_ns', '_bucket_high_ns')
+
+    def __init__(self, runner: str = 'default', buckets: Iterable[float] = LATENCY_BUCKETS):
+        """
+        :param runner: Name of the runner, the `runner` label of the metrics
+        :param buckets: Upper bounds of the bar latency histogram buckets in seconds
+        """
+        self.runner = runner
+        self._bounds_ns = [round(bound * 1e9) for bound in sorted(buckets)]
+        # The last one is the +Inf bucket
+        self.latency_buckets = [0] * (len(self._bounds_ns) + 1)
+        # The bucket of the last bar, and its bounds: low < latency <= high, none before the first bar
+        self._bucket = 0
+        self._bucket_low_ns = self._bucket_high_ns = 0
+        self.latency_sum_ns = 0
+        # script_id -> total execution time, number of executions
+        self.script_ns: dict[str, int] = {}
+        self.script_runs: dict[str, int] = {}
+        # The only script of a single script runner, its executions are the bars, so they are not counted twice
+        self.bar_script: str | None = None
+        # Timestamp (open time) of the last candle, and the performance counter when it was done
+        self.last_timestamp = 0
+        self.last_bar_ns = 0
+        # Wall clock minus the performance counter, so reading the wall clock on every bar is not needed
+        self._wall_offset_ns = time.time_ns() - time.perf_counter_ns()
+        self.consumer_wait_ns = 0
+        self.writers: dict[str, WriterMetrics] = {}
+
+    def on_bar(self, timestamp: int, started_ns: int, done_ns: int):
+        """
+        Record a processed bar, runners call it before yielding the bar
+
+        :param timestamp: Timestamp of the candle
+        :param started_ns: `perf_counter_ns()` when the processing of the bar started
+        :param done_ns: `perf_counter_ns()` when the bar was done
+        """
+        latency_ns = done_ns - started_ns
+        if self._bucket_low_ns < latency_ns <= self._bucket_high_ns:
+            self.latency_buckets[self._bucket] += 1
+        else:
+            self._count_in_new_bucket(latency_ns)
+        self.latency_sum_ns += latency_ns
+        self.last_timestamp = timestamp
+        self.last_bar_ns = done_ns
+
+    def _count_in_new_bucket(self, latency_ns: int):
+        bounds = self._bounds_ns
+        i = self._bucket = bisect_left(bounds, latency_ns)
+        self._bucket_low_ns = bounds[i - 1] if i else -1
+        self._bucket_high_ns = bounds[i] if i < len(bounds) else 1 << 62  # +Inf
+        self.latency_buckets[i] += 1
+
+    @property
+    def bars(self) -> int:
+        """
+        Bars processed, the count of the histogram
+        """
+        return sum(self.latency_buckets)
+
+    def on_script(self, script_id: str, elapsed_ns: int):
+        """
+        Record an execution of a script
+        """
+        try:
+            self.script_ns[script_id] += elapsed_ns
+            self.script_runs[script_id] += 1
+        except KeyError:
+            self.script_ns[script_id] = elapsed_ns
+            self.script_runs[script_id] = 1
+
+    def scripts(self) -> list[tuple[str, int, int]]:
+        """
+        Total execution time in nanoseconds and number of executions of the scripts
+        """
+        scripts = [(script_id, ns, self.script_runs.get(script_id, 0))
+                   for script_id, ns in list(self.script_ns.items())]
+        if self.bar_script is not None:
+            scripts.append((self.bar_script, self.latency_sum_ns, self.bars))
+        return scripts
+
+    @property
+    def source_lag(self) -> float:
+        """
+        Wall clock minus the timestamp of the last candle when it was done, in seconds
+        """
+        if not self.bars:
+            return 0.0
+        return (self._wall_offset_ns + self.last_bar_ns) / 1e9 - self.last_timestamp
+
+    def writer(self, name: str) -> WriterMetrics:
+        """
+        Throughput counters of an output writer, created on first use
+        """
+        try:
+            return self.writers[name]
+        except KeyError:
+            writer = self.writers[name] = WriterMetrics(name)
+            return writer
+
+    def render(self) -> str:
+        """
+        The metrics in the OpenMetrics text format
+        """
+        return render_openmetrics([self])
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(**labels: str) -> str:
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + '}'
+
+
+def render_openmetrics(metrics: Iterable[RunnerMetrics]) -> str:
+    """
+    Render the metrics of runners in the OpenMetrics text format, the runners are told apart by
+    the `runner` label
+    """
+    metrics = list(metrics)
+    out: list[str] = []
+
+    def family(name: str, metric_type: str, help_text: str, unit: str = ''):
+        out.append(f"# TYPE {name} {metric_type}")
+        if unit:
+            out.append(f"# UNIT {name} {unit}")
+        out.append(f"# HELP {name} {help_text}")
+
+    family('pyne_bars', 'counter', "Bars processed")
+    for m in metrics:
+        out.append(f"pyne_bars_total{_labels(runner=m.runner)} {m.bars}")
+
+    family('pyne_bar_latency_seconds', 'histogram', "Processing time of a bar", 'seconds')
+    for m in metrics:
+        buckets = list(m.latency_buckets)  # Snapshot, the runner keeps counting
+        cumulative = 0
+        for bound_ns, count in zip(m._bounds_ns, buckets):
+            cumulative += count
+            out.append(f"pyne_bar_latency_seconds_bucket{_labels(runner=m.runner, le=repr(bound_ns / 1e9))} "
+                       f"{cumulative}")
+        cumulative += buckets[-1]
+        out.append(f"pyne_bar_latency_seconds_bucket{_labels(runner=m.runner, le='+Inf')} {cumulative}")
+        out.append(f"pyne_bar_latency_seconds_count{_labels(runner=m.runner)} {cumulative}")
+        out.append(f"pyne_bar_latency_seconds_sum{_labels(runner=m.runner)} {m.latency_sum_ns / 1e9}")
+
+    family('pyne_script_execution_seconds', 'counter', "Total execution time of a script", 'seconds')
+    scripts = [(m, m.scripts()) for m in metrics]
+    for m, script_list in scripts:
+        for script_id, ns, _ in script_list:
+            out.append(f"pyne_script_execution_seconds_total{_labels(runner=m.runner, script=script_id)} "
+                       f"{ns / 1e9}")
+    family('pyne_script_executions', 'counter', "Executions of a script")
+    for m, script_list in scripts:
+        for script_id, _, runs in script_list:
+            out.append(f"pyne_script_executions_total{_labels(runner=m.runner, script=script_id)} {runs}")
+
+    family('pyne_source_lag_seconds', 'gauge', "Wall clock minus the open time of the last candle", 'seconds')
+    for m in metrics:
+        out.append(f"pyne_source_lag_seconds{_labels(runner=m.runner)} {m.source_lag}")
+    family('pyne_last_candle_timestamp_seconds', 'gauge', "Open time of the last candle", 'seconds')
+    for m in metrics:
+        out.append(f"pyne_last_candle_timestamp_seconds{_labels(runner=m.runner)} {m.last_timestamp}")
+
+    family('pyne_consumer_wait_seconds', 'counter', "Time the runner waited for the consumer of the yielded bars",
+           'seconds')
+    for m in metrics:
+        out.append(f"pyne_consumer_wait_seconds_total{_labels(runner=m.runner)} {m.consumer_wait_ns / 1e9}")
+
+    family('pyne_output_rows', 'counter', "Rows written by an output writer")
+    for m in metrics:
+        for writer in list(m.writers.values()):
+            out.append(f"pyne_output_rows_total{_labels(runner=m.runner, writer=writer.name)} {writer.rows}")
+    family('pyne_output_bytes', 'counter', "Bytes written by an output writer", 'bytes')
+    for m in metrics:
+        for writer in list(m.writers.values()):
+            out.append(f"pyne_output_bytes_total{_labels(runner=m.runner, writer=writer.name)} {writer.bytes}")
+
+    out.append("# EOF")
+    return '\n'.join(out) + '\n'
+
+
+def serve_metrics(metrics: RunnerMetrics | Iterable[RunnerMetrics], host: str = '127.0.0.1',
+                  port: int = 9464) -> 'ThreadingHTTPServer':
+    """
+    Serve the metrics on `GET /metrics` from a background thread
+
+    :param metrics: Metrics of one or more runners
+    :param host: Host to bind to, keep it on localhost, there is no authentication
+    :param port: Port to listen on, 0 picks a free one (see `server.server_address`)
+    :return: The server, call `shutdown()` to stop it
+    """
+    from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+    runners = [metrics] if isinstance(metrics, RunnerMetrics) else list(metrics)
+
+    class Handler(BaseHTTPRequestHandler):
+        # noinspection PyPep8Naming
+        def do_GET(self):
+            if self.path != '/metrics':
+                self.send_error(404)
+                return
+            data = render_openmetrics(runners).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', CONTENT_TYPE)
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='pyne-metrics', daemon=True).start()
+    return server
@@ -0,0 +1,207 @@
+from typing import Iterable, Any, Sequence, TYPE_CHECKING
+from dataclasses import dataclass, field
+import time
+
+import numpy as np
+
+if TYPE_CHECKING:
+    from pynecore.lib.strategy import Trade
+
+__all__ = [
+    'TradeSample',
+    'MonteCarloResult',
+    'collect_trades',
+    'monte_carlo',
+]
+
+QUANTILES = (0.01, 0.05, 0.25, 0.5, 0.75, 0.95, 0.99)
+
+
+@dataclass(slots=True)
+class TradeSample:
+    """
+    Closed trades of a strategy run as arrays
+
+    :param profits: Profit of the trades in the account currency
+    :param returns: Profit of the trades relative to the equity at entry
+    :param initial_capital: The initial capital of the strategy
+    """
+    profits: np.ndarray
+    returns: np.ndarray
+    initial_capital: float
+
+    def __len__(self) -> int:
+        return len(self.profits)
+
+
+@dataclass(slots=True)
+class MonteCarloResult:
+    """
+    Distributions of the resampled equity curves
+
+    :param simulations: Number of simulations
+    :param trades: Number of trades per simulation
+    :param quantiles: The quantile levels
+    :param final_equity: Quantiles of the final equity
+    :param max_drawdown: Quantiles of the maximum drawdown in the account currency
+    :param max_drawdown_percent: Quantiles of the maximum drawdown relative to the equity peak, in percent
+    :param ruin_probability: Ratio of simulations, whose equity fell to zero or below
+    :param elapsed: Running time in seconds
+    """
+    simulations: int
+    trades: int
+    quantiles: tuple[float, ...]
+    final_equity: np.ndarray
+    max_drawdown: np.ndarray
+    max_drawdown_percent: np.ndarray
+    ruin_probability: float
+    elapsed: float = field(default=0.0)
+
+    def summary(self) -> str:
+        """
+        Human readable table of the quantiles
+        """
+        out = [f"{self.simulations} simulations of {self.trades} trades in {self.elapsed:.2f} s, "
+               f"ruin probability {self.ruin_probability:.2%}",
+               f"{'quantile':>10} {'final equity':>16} {'max drawdown':>16} {'max drawdown %':>16}"]
+        for q, equity, dd, dd_pct in zip(self.quantiles, self.final_equity, self.max_drawdown,
+                                         self.max_drawdown_percent):
+            out.append(f"{q:>10.2f} {equity:>16.2f} {dd:>16.2f} {dd_pct:>16.2f}")
+        return '\n'.join(out)
+
+
+def collect_trades(source: Iterable[Any], initial_capital: float | None = None) -> TradeSample:
+    """
+    Collect the closed trades of a strategy run
+
+    :param source: The iterator of `fork_runner` of a strategy: (candle, plot data, new closed trades),
+                   or an iterable of trades
+    :param initial_capital: Initial capital, default is the entry equity of the first trade
+    """
+    profits = []
+    returns = []
+    first_equity = None
+
+    def add(trade: 'Trade'):
+        nonlocal first_equity
+        if first_equity is None:
+            first_equity = float(trade.entry_equity)
+        profit = float(trade.profit)
+        equity = float(trade.entry_equity)
+        profits.append(profit)
+        # Return on the equity, `profit_percent` is relative to the position value
+        returns.append(profit / equity if equity else 0.0)
+
+    for item in source:
+        if isinstance(item, tuple):
+            if len(item) == 3:
+                for trade in item[2]:
+                    add(trade)
+        else:
+            add(item)
+
+    if initial_capital is None:
+        initial_capital = first_equity or 0.0
+    return TradeSample(np.array(profits, dtype=np.float64), np.array(returns, dtype=np.float64),
+                       float(initial_capital))
+
+
+def _simulate(profits: np.ndarray, returns: np.ndarray, initial_capital: float, simulations: int,
+              method: str, compounding: bool, batch_size: int,
+              seed: np.random.SeedSequence) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Run simulations in batches of a (batch_size, trades) matrix
+
+    :return: Final equity, max drawdown and max drawdown percent per simulation
+    """
+    rng = np.random.default_rng(seed)
+    n = len(profits)
+    values = returns if compounding else profits
+    final_equity = np.empty(simulations)
+    max_dd = np.empty(simulations)
+    max_dd_pct = np.empty(simulations)
+
+    order = np.broadcast_to(np.arange(n), (min(batch_size, simulations), n))
+    for start in range(0, simulations, batch_size):
+        size = min(batch_size, simulations - start)
+        if method == 'shuffle':
+            idx = rng.permuted(order[:size], axis=1)
+        else:  # Bootstrap: draw trades with replacement
+            idx = rng.integers(0, n, size=(size, n))
+        sampled = values[idx]
+
+        if compounding:
+            np.add(sampled, 1.0, out=sampled)
+            equity = np.cumprod(sampled, axis=1, out=sampled)
+            equity *= initial_capital
+        else:
+            equity = np.cumsum(sampled, axis=1, out=sampled)
+            equity += initial_capital
+
+        # The equity peak starts at the initial capital
+        peak = np.maximum.accumulate(equity, axis=1)
+        np.maximum(peak, initial_capital, out=peak)
+        drawdown = peak - equity
+        end = start + size
+        final_equity[start:end] = equity[:, -1]
+        max_dd[start:end] = drawdown.max(axis=1)
+        np.divide(drawdown, peak, out=drawdown)
+        max_dd_pct[start:end] = drawdown.max(axis=1) * 100.0
+
+    return final_equity, max_dd, max_dd_pct
+
+
+def monte_carlo(trades: TradeSample, simulations: int = 10000, *, method: str = 'shuffle',
+                compounding: bool = False, quantiles: Sequence[float] = QUANTILES, batch_size: int = 2000,
+                workers: int = 1, seed: int | None = None) -> MonteCarloResult:
+    """
+    Monte Carlo robustness analysis of the trades
+
+    Shuffling keeps the trades but changes their order, so it shows the drawdowns the same edge could
+    have had (the final equity only changes with compounding). Bootstrap draws trades with replacement,
+    so the final equity varies too.
+
+    :param trades: The trades, from `collect_trades`
+    :param simulations: Number of simulations
+    :param method: 'shuffle' or 'bootstrap'
+    :param compounding: Resample the returns of the trades instead of the profits
+    :param quantiles: Quantile levels of the result
+    :param batch_size: Simulations computed together, memory use is about 3 * 8 * batch_size * trades bytes
+    :param workers: Number of processes, the simulations are split among them
+    :param seed: Random seed, the result is reproducible with the same seed and workers
+    :return: Quantiles of the final equity and drawdowns
+    :raises ValueError: If the method is unknown or there are no trades
+    """
+    if method not in ('shuffle', 'bootstrap'):
+        raise ValueError(f"Unknown method: {method}")
+    if not len(trades):
+        raise ValueError("No trades to resample!")
+
+    started = time.perf_counter()
+    seeds = np.random.SeedSequence(seed).spawn(workers)
+    common = (trades.profits, trades.returns, trades.initial_capital)
+    options = (method, compounding, batch_size)
+
+    if workers <= 1:
+        parts = [_simulate(*common, simulations, *options, seeds[0])]
+    else:
+        from concurrent.futures import ProcessPoolExecutor
+
+        counts = [simulations // workers + (1 if i < simulations % workers else 0) for i in range(workers)]
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(_simulate, *common, count, *options, worker_seed)
+                       for count, worker_seed in zip(counts, seeds) if count]
+            parts = [future.result() for future in futures]
+
+    final_equity, max_dd, max_dd_pct = (np.concatenate(columns) for columns in zip(*parts))
+    levels = np.asarray(quantiles)
+    return MonteCarloResult(
+        simulations=simulations,
+        trades=len(trades),
+        quantiles=tuple(quantiles),
+        final_equity=np.quantile(final_equity, levels),
+        max_drawdown=np.quantile(max_dd, levels),
+        max_drawdown_percent=np.quantile(max_dd_pct, levels),
+        ruin_probability=float(np.mean(max_dd_pct >= 100.0)),
+        elapsed=time.perf_counter() - started,
+    )
@@ -0,0 +1,254 @@
+from typing import Iterable, Iterator, Any, Callable, TYPE_CHECKING
+from types import ModuleType
+from pathlib import Path
+from itertools import groupby
+from operator import itemgetter
+import heapq
+import sys
+import re
+
+from pynecore.types.ohlcv import OHLCV
+
+from chart_runner import _set_lib_properties, _reset_lib_vars
+
+if TYPE_CHECKING:
+    from zoneinfo import ZoneInfo
+
+__all__ = [
+    'merge_feeds',
+    'security',
+    'MultiFeedChartRunner',
+]
+
+# Last candle of every feed at the current timestamp of the merge, scripts read it through `security`
+_aligned: dict[str, OHLCV] = {}
+
+
+def merge_feeds(feeds: dict[str, Iterable[OHLCV]]) -> Iterator[tuple[int, dict[str, OHLCV]]]:
+    """
+    Streaming k-way merge of feeds by timestamp, it keeps only one candle per feed in memory
+
+    Feeds may have gaps: a timestamp only has the candles of the feeds which have a bar there.
+    Gap candles (negative volume) of `.ohlcv` files are skipped.
+
+    :param feeds: symbol -> iterator of OHLCV data in timestamp order
+    :return: Iterator of (timestamp, {symbol: candle}), symbols in the order of the feeds
+    """
+    def tagged(order: int, symbol: str, ohlcv_iter: Iterable[OHLCV]) -> Iterator[tuple[int, int, str, OHLCV]]:
+        for candle in ohlcv_iter:
+            if candle.volume >= 0:
+                yield candle.timestamp, order, symbol, candle
+
+    merged = heapq.merge(*(tagged(order, symbol, ohlcv_iter)
+                           for order, (symbol, ohlcv_iter) in enumerate(feeds.items())))
+    for timestamp, items in groupby(merged, key=itemgetter(0)):
+        yield timestamp, {symbol: candle for _, _, symbol, candle in items}
+
+
+def security(symbol: str, source: str = 'close') -> Any:
+    """
+    Value of another feed aligned to the current bar, like `request.security` without lookahead:
+    the last candle of the feed at or before the timestamp of the bar. Call it from scripts running
+    in a `MultiFeedChartRunner`.
+
+    :param symbol: Symbol of the feed
+    :param source: Field of the candle: 'open', 'high', 'low', 'close', 'volume' or 'timestamp'
+    :return: The value, or na if the feed has no bar yet
+    """
+    candle = _aligned.get(symbol)
+    if candle is None:
+        from pynecore.types.na import NA
+        return NA(float)
+    return getattr(candle, source)
+
+
+def _import_script_as(script_path: Path, module_name: str) -> ModuleType:
+    """
+    Import a script under a distinct module name, so the same script can run on several feeds
+    with separate state
+    """
+    import importlib.util
+    from pynecore.core.import_hook import PyneLoader
+
+    if module_name in sys.modules:
+        return sys.modules[module_name]
+
+    loader = PyneLoader(module_name, str(script_path))
+    spec = importlib.util.spec_from_file_location(module_name, script_path, loader=loader)
+    assert spec is not None
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[module_name] = module
+    sys.path.insert(0, str(script_path.parent))
+    try:
+        loader.exec_module(module)
+    except BaseException:
+        del sys.modules[module_name]
+        raise
+    finally:
+        sys.path.pop(0)
+
+    # The isolation scope of the calls is derived from the file path, it must differ between the instances
+    if hasattr(module, '__scope_id__'):
+        module.__scope_id__ = f"{module.__scope_id__}·{module_name}"
+
+    if not hasattr(module, 'main') or not hasattr(module.main, 'script'):
+        raise ImportError(f"Script '{script_path}' must have a 'main' function decorated with "
+                          f"@script.[indicator|strategy|library] to run!")
+    return module
+
+
+class MultiFeedChartRunner:
+    """
+    Chart runner of several symbols in one pass
+
+    The feeds are merged by timestamp, every script runs on the bars of its primary symbol, and can read
+    the aligned values of the other feeds with `security`. Only the last candle of each feed is kept,
+    so the memory does not depend on the length of the history.
+    """
+
+    __slots__ = ('feeds', 'scripts', 'bar_indices', 'tz', '_steps', '_libraries', '_res', '_lib', '_reset_step')
+
+    def __init__(self, feeds: dict[str, Iterable[OHLCV]], scripts: list[tuple[str, Path, dict[str, Any]]]):
+        """
+        Initialize the chart runner
+
+        :param feeds: symbol -> iterator of OHLCV data
+        :param scripts: scripts to run: primary symbol, path to script, script_inputs. The script id in
+                        the results is "<symbol>:<script name>"
+        :raises ValueError: If a script refers to an unknown symbol
+        """
+        self.feeds = feeds
+        # script_id -> (symbol, module, inputs)
+        self.scripts: dict[str, tuple[str, ModuleType, dict[str, Any]]] = {}
+        for symbol, script_path, script_inputs in scripts:
+            if symbol not in feeds:
+                raise ValueError(f"No feed for symbol: {symbol}")
+            module_name = script_path.stem + '__' + re.sub(r'\W', '_', symbol)
+            self.scripts[f"{symbol}:{script_path.stem}"] = \
+                (symbol, _import_script_as(script_path, module_name), script_inputs)
+
+        self.bar_indices: dict[str, int] = dict.fromkeys(feeds, 0)
+
+        from zoneinfo import ZoneInfo
+        self.tz: ZoneInfo = ZoneInfo("UTC")
+
+        # State of a run, set by `_start`
+        # symbol -> (script_id, script, main function, inputs) of the scripts of the symbol
+        self._steps: dict[str, list[tuple[str, Any, Callable[..., dict[str, Any]], dict[str, Any]]]] = {}
+        # Main functions of the registered libraries
+        self._libraries: tuple[Callable[[], Any], ...] = ()
+        self._res: dict[str, dict[str, Any] | None] = {}
+        self._lib: ModuleType | None = None
+        self._reset_step: Callable[[], None] | None = None
+
+    # noinspection PyProtectedMember
+    def _start(self) -> dict[str, dict[str, Any] | None]:
+        """
+        Reset the state of a run
+
+        :return: The results of the run, script_id -> outputs
+        """
+        from pynecore import lib
+        from pynecore.core import function_isolation
+        from pynecore.core import script
+
+        function_isolation.reset()
+        lib._plot_data.clear()
+        self.bar_indices = dict.fromkeys(self.feeds, 0)
+
+        steps: dict[str, list[tuple[str, Any, Callable[..., dict[str, Any]], dict[str, Any]]]] = {}
+        for script_id, (symbol, module, inputs) in self.scripts.items():
+            steps.setdefault(symbol, []).append((script_id, module.main.script, module.main, inputs))
+        self._steps = steps
+        self._libraries = tuple(main_func for _, main_func in script._registered_libraries)
+        self._res = dict.fromkeys(self.scripts)
+        self._lib = lib
+        self._reset_step = function_isolation.reset_step
+        return self._res
+
+    # noinspection PyProtectedMember
+    def _step(self, symbol: str, candle: OHLCV):
+        """
+        Run the scripts of a symbol on its next candle, their outputs go to the results of the run
+        """
+        lib = self._lib
+        bar_index = self.bar_indices[symbol]
+        symbol_steps = self._steps.get(symbol)
+        if symbol_steps:
+            reset_step = self._reset_step
+            _set_lib_properties(candle, bar_index, self.tz, lib)
+            lib.barstate.isfirst = bar_index == 0
+
+            libraries = self._libraries
+            if libraries:
+                reset_step()
+                lib._lib_semaphore = True
+                for main_func in libraries:
+                    main_func()
+                lib._lib_semaphore = False
+
+            res = self._res
+            for script_id, script_, main, inputs in symbol_steps:
+                lib._script = script_
+                reset_step()
+                res[script_id] = main(**inputs)
+        self.bar_indices[symbol] = bar_index + 1
+
+    # noinspection PyProtectedMember
+    def run_iter(self) -> Iterator[tuple[int, dict[str, OHLCV], dict[str, dict[str, Any] | None]]]:
+        """
+        Run the scripts on the merged feeds
+
+        :return: Iterator of (timestamp, {symbol: candle} of the feeds having a bar there, results),
+                 results are script_id -> outputs, scripts without a bar at the timestamp keep their
+                 last outputs. The results dictionary is reused, copy it if you need to keep it
+        """
+        from pynecore import lib
+        from pynecore.core import function_isolation
+
+        res = self._start()
+        step = self._step
+
+        try:
+            for timestamp, candles in merge_feeds(self.feeds):
+                _aligned.update(candles)
+                for symbol, candle in candles.items():
+                    step(symbol, candle)
+                yield timestamp, candles, res
+
+        except GeneratorExit:
+            pass
+        finally:
+            _aligned.clear()
+            _reset_lib_vars(lib)
+            function_isolation.reset()
+
+    # noinspection PyProtectedMember
+    def run_arrivals(self, arrivals: Iterable[tuple[str, OHLCV]]) \
+            -> Iterator[tuple[str, OHLCV, dict[str, dict[str, Any] | None]]]:
+        """
+        Run the scripts on candles in the order they arrive, like from a live source, instead of merging
+        the feeds, the feeds of the runner only name the symbols then
+
+        :param arrivals: Iterator of (symbol, candle), the candles of a symbol in timestamp order,
+                         it may block until the next candle arrives
+        :return: Iterator of (symbol, candle, results) after every candle, results are like in `run_iter`
+        """
+        from pynecore import lib
+        from pynecore.core import function_isolation
+
+        res = self._start()
+        step = self._step
+
+        try:
+            for symbol, candle in arrivals:
+                _aligned[symbol] = candle
+                step(symbol, candle)
+                yield symbol, candle, res
+
+        except GeneratorExit:
+            pass
+        finally:
+            _aligned.clear()
+            _reset_lib_vars(lib)
+            function_isolation.reset()
@@ -0,0 +1,340 @@
+from typing import Iterable, Iterator
+from pathlib import Path
+from array import array
+from bisect import bisect_left, bisect_right
+from itertools import accumulate
+import struct
+import json
+import zlib
+import lzma
+
+from pynecore.types.ohlcv import OHLCV
+
+__all__ = [
+    'OHLCVArchiveWriter',
+    'OHLCVArchiveReader',
+]
+
+# Archive layout:
+#   MAGIC
+#   header length (uint32) + JSON header: codec, decimals, float_format
+#   chunks: compressed columns, every column is a byte shuffled array:
+#       timestamp: zigzag int64 deltas, the first one is the absolute timestamp
+#       open, high, low, close: zigzag int64 deltas of the prices scaled by 10^decimals, or floats
+#       volume: floats
+#   index: (first timestamp, last timestamp, offset, compressed size, count) per chunk
+#   footer: index offset (uint64), chunk count (uint32), MAGIC
+
+MAGIC = b'PYNEOHA1'
+_INDEX_ENTRY = struct.Struct('<qqQII')
+_FOOTER = struct.Struct('<QI8s')
+_HEADER_LEN = struct.Struct('<I')
+
+_COMPRESSORS = {
+    'zlib': (lambda data: zlib.compress(data, 6), zlib.decompress),
+    'lzma': (lambda data: lzma.compress(data, preset=6), lzma.decompress),
+}
+
+
+def _deltas(values: Iterable[int]) -> array:
+    """
+    Delta encode with zigzag, so small negative deltas are small positive numbers,
+    the first element stays absolute
+    """
+    res = array('q')
+    prev = 0
+    for value in values:
+        delta = value - prev
+        res.append((delta << 1) ^ (delta >> 63))
+        prev = value
+    return res
+
+
+def _undeltas(data: array) -> Iterator[int]:
+    """
+    Reverse of `_deltas`
+    """
+    return accumulate((value >> 1) ^ -(value & 1) for value in data)
+
+
+def _shuffle(column: array) -> bytes:
+    """
+    Byte shuffle: all the 1st bytes of the items, then all the 2nd bytes, ...
+    Slowly changing values have long runs of equal high bytes this way, which compress much better
+    """
+    raw = column.tobytes()
+    itemsize = column.itemsize
+    return b''.join(raw[i::itemsize] for i in range(itemsize))
+
+
+def _unshuffle(typecode: str, data: memoryview, count: int) -> array:
+    """
+    Reverse of `_shuffle`
+    """
+    res = array(typecode)
+    itemsize = res.itemsize
+    raw = bytearray(count * itemsize)
+    for i in range(itemsize):
+        raw[i::itemsize] = data[i * count:(i + 1) * count]
+    res.frombytes(raw)
+    return res
+
+
+class OHLCVArchiveWriter:
+    """
+    Writer of compressed, chunked OHLCV archives
+    """
+
+    __slots__ = ('path', 'chunk_size', 'codec', 'decimals', 'float_format',
+                 '_file', '_columns', '_index', '_compress', '_scale')
+
+    def __init__(self, path: Path | str, *, chunk_size: int = 4096, codec: str = 'zlib',
+                 decimals: int | None = None, float_format: str = 'd'):
+        """
+        :param path: Path of the archive file
+        :param chunk_size: Number of candles per chunk, this is the seeking granularity
+        :param codec: Compression of the chunks: 'zlib' or 'lzma'
+        :param decimals: Store prices as integers scaled by 10^decimals (lossless up to that precision),
+                         None stores them as floats
+        :param float_format: Array typecode of the float columns: 'd' (lossless) or 'f' (float32, like `.ohlcv`)
+        :raises ValueError: If the codec or the float format is unknown
+        """
+        if codec not in _COMPRESSORS:
+            raise ValueError(f"Unknown codec: {codec}")
+        if float_format not in ('d', 'f'):
+            raise ValueError(f"Unknown float format: {float_format}")
+        self.path = path
+        self.chunk_size = chunk_size
+        self.codec = codec
+        self.decimals = decimals
+        self.float_format = float_format
+        self._file = None
+        self._columns: tuple[list, ...] = ([], [], [], [], [], [])
+        self._index: list[tuple[int, int, int, int, int]] = []
+        self._compress = _COMPRESSORS[codec][0]
+        self._scale = 10 ** decimals if decimals is not None else None
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def open(self) -> 'OHLCVArchiveWriter':
+        """
+        Create the archive file and write the header
+        """
+        self._file = open(self.path, 'wb')
+        header = json.dumps({'codec': self.codec, 'decimals': self.decimals,
+                             'float_format': self.float_format}).encode()
+        self._file.write(MAGIC + _HEADER_LEN.pack(len(header)) + header)
+        return self
+
+    def write(self, candle: OHLCV):
+        """
+        Write a candle, candles must be in timestamp order
+        """
+        columns = self._columns
+        for column, value in zip(columns, candle):
+            column.append(value)
+        if len(columns[0]) >= self.chunk_size:
+            self._flush_chunk()
+
+    def write_many(self, ohlcv_iter: Iterable[OHLCV], skip_gaps: bool = True) -> int:
+        """
+        Write candles
+
+        :param ohlcv_iter: Iterator of OHLCV data
+        :param skip_gaps: Skip gap candles (negative volume), that the `.ohlcv` writer uses to fill gaps
+        :return: Number of candles written
+        """
+        count = 0
+        for candle in ohlcv_iter:
+            if skip_gaps and candle.volume < 0:
+                continue
+            self.write(candle)
+            count += 1
+        return count
+
+    def _flush_chunk(self):
+        timestamps, *prices, volumes = self._columns
+        if not timestamps:
+            return
+        assert self._file is not None
+
+        parts = [_shuffle(_deltas(timestamps))]
+        scale = self._scale
+        for column in prices:
+            if scale is None:
+                parts.append(_shuffle(array(self.float_format, column)))
+            else:
+                parts.append(_shuffle(_deltas([round(value * scale) for value in column])))
+        parts.append(_shuffle(array(self.float_format, volumes)))
+
+        data = self._compress(b''.join(parts))
+        self._index.append((timestamps[0], timestamps[-1], self._file.tell(), len(data), len(timestamps)))
+        self._file.write(data)
+        for column in self._columns:
+            column.clear()
+
+    def close(self):
+        """
+        Flush the last chunk, write the index and close the file
+        """
+        if self._file is None:
+            return
+        self._flush_chunk()
+        index_offset = self._file.tell()
+        for entry in self._index:
+            self._file.write(_INDEX_ENTRY.pack(*entry))
+        self._file.write(_FOOTER.pack(index_offset, len(self._index), MAGIC))
+        self._file.close()
+        self._file = None
+
+
+class OHLCVArchiveReader:
+    """
+    Streaming reader of OHLCV archives, it decodes one chunk at a time
+    """
+
+    __slots__ = ('path', 'codec', 'decimals', 'float_format', '_file', '_index', '_first_timestamps',
+                 '_last_timestamps', '_decompress')
+
+    def __init__(self, path: Path | str):
+        """
+        :param path: Path of the archive file
+        """
+        self.path = path
+        self.codec: str | None = None
+        self.decimals: int | None = None
+        self.float_format: str | None = None
+        self._file = None
+        self._index: list[tuple[int, int, int, int, int]] = []
+        self._first_timestamps: list[int] = []
+        self._last_timestamps: list[int] = []
+        self._decompress = None
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def open(self) -> 'OHLCVArchiveReader':
+        """
+        Open the archive, read the header and the chunk index
+
+        :raises ValueError: If the file is not an OHLCV archive
+        """
+        self._file = open(self.path, 'rb')
+        if self._file.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"Not an OHLCV archive: {self.path}")
+        header = json.loads(self._file.read(_HEADER_LEN.unpack(self._file.read(_HEADER_LEN.size))[0]))
+        self.codec = header['codec']
+        self.decimals = header['decimals']
+        self.float_format = header['float_format']
+        self._decompress = _COMPRESSORS[self.codec][1]
+
+        self._file.seek(-_FOOTER.size, 2)
+        index_offset, chunk_count, magic = _FOOTER.unpack(self._file.read(_FOOTER.size))
+        if magic != MAGIC:
+            raise ValueError(f"Truncated OHLCV archive: {self.path}")
+        self._file.seek(index_offset)
+        data = self._file.read(chunk_count * _INDEX_ENTRY.size)
+        self._index = list(_INDEX_ENTRY.iter_unpack(data))
+        self._first_timestamps = [entry[0] for entry in self._index]
+        self._last_timestamps = [entry[1] for entry in self._index]
+        return self
+
+    def close(self):
+        """
+        Close the archive file
+        """
+        if self._file:
+            self._file.close()
+            self._file = None
+
+    @property
+    def size(self) -> int:
+        """
+        Number of candles in the archive
+        """
+        return sum(entry[4] for entry in self._index)
+
+    @property
+    def start_timestamp(self) -> int | None:
+        """
+        Timestamp of the first candle
+        """
+        return self._index[0][0] if self._index else None
+
+    @property
+    def end_timestamp(self) -> int | None:
+        """
+        Timestamp of the last candle
+        """
+        return self._index[-1][1] if self._index else None
+
+    def _decode_chunk(self, chunk_no: int) -> tuple[array, ...]:
+        """
+        Decode a chunk into columns: timestamp, open, high, low, close, volume
+        """
+        assert self._file is not None
+        _, _, offset, compressed_size, count = self._index[chunk_no]
+        self._file.seek(offset)
+        data = memoryview(self._decompress(self._file.read(compressed_size)))
+
+        int_size = 8
+        scale = 10 ** self.decimals if self.decimals is not None else None
+        float_size = array(self.float_format).itemsize
+        price_size = int_size if scale is not None else float_size
+
+        pos = count * int_size
+        timestamps = array('q', _undeltas(_unshuffle('q', data[:pos], count)))
+        columns = [timestamps]
+        for _ in range(4):
+            end = pos + count * price_size
+            if scale is None:
+                columns.append(_unshuffle(self.float_format, data[pos:end], count))
+            else:
+                columns.append(array('d', [value / scale for value in _undeltas(_unshuffle('q', data[pos:end], count))]))
+            pos = end
+        columns.append(_unshuffle(self.float_format, data[pos:pos + count * float_size], count))
+        return tuple(columns)
+
+    def iter_chunks(self, start_timestamp: int | None = None,
+                    end_timestamp: int | None = None) -> Iterator[tuple[array, ...]]:
+        """
+        Decode the chunks overlapping a time range, trimmed to the range
+
+        :param start_timestamp: Start timestamp (inclusive), None means from the first candle
+        :param end_timestamp: End timestamp (inclusive), None means until the last candle
+        :return: Iterator of (timestamp, open, high, low, close, volume) column tuples
+        """
+        first_chunk = 0 if start_timestamp is None else bisect_left(self._last_timestamps, start_timestamp)
+        last_chunk = len(self._index) if end_timestamp is None \
+            else bisect_right(self._first_timestamps, end_timestamp)
+
+        for chunk_no in range(first_chunk, last_chunk):
+            columns = self._decode_chunk(chunk_no)
+            timestamps = columns[0]
+            lo = 0 if start_timestamp is None else bisect_left(timestamps, start_timestamp)
+            hi = len(timestamps) if end_timestamp is None else bisect_right(timestamps, end_timestamp)
+            if lo > 0 or hi < len(timestamps):
+                columns = tuple(column[lo:hi] for column in columns)
+            yield columns
+
+    def read_from(self, start_timestamp: int | None = None, end_timestamp: int | None = None) -> Iterator[OHLCV]:
+        """
+        Read candles in a time range, chunk by chunk, it can be passed directly to `fork_runner`
+
+        :param start_timestamp: Start timestamp (inclusive), None means from the first candle
+        :param end_timestamp: End timestamp (inclusive), None means until the last candle
+        """
+        for columns in self.iter_chunks(start_timestamp, end_timestamp):
+            yield from map(OHLCV, *columns)
+
+    def __iter__(self) -> Iterator[OHLCV]:
+        return self.read_from()
@@ -0,0 +1,20 @@
+from pathlib import Path
+
+from run_daemon import RunDaemon, serve_http
+
+
+data_path = Path("./data/ccxt_BYBIT_BTC_USDT_60.ohlcv")
+
+# Query it like:
+# curl -d '{"script": "./scripts/demo_pyne.py", "symbol": "BYBIT:BTC/USDT",
+#           "inputs": {"src": "close", "fast_length": 20, "slow_length": 32}}' http://127.0.0.1:8765/run
+# curl http://127.0.0.1:8765/stats
+
+
+def main():
+    with RunDaemon({"BYBIT:BTC/USDT": data_path}, workers=4) as daemon:
+        serve_http(daemon, port=8765)
+
+
+if __name__ == '__main__':
+    main()
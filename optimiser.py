@@ -0,0 +1,456 @@
+from typing import Any, Callable, Sequence, TYPE_CHECKING
+from pathlib import Path
+from dataclasses import dataclass, field
+from itertools import islice, product
+from copy import deepcopy
+import random
+import math
+import time
+
+if TYPE_CHECKING:
+    from multiprocessing.connection import Connection
+    from pynecore.core.syminfo import SymInfo
+    from pynecore.lib.strategy import Position
+
+__all__ = [
+    'Trial',
+    'OptimiseResult',
+    'Optimiser',
+    'net_profit',
+]
+
+
+def net_profit(position: 'Position') -> float:
+    """
+    Default objective: net profit including the open profit, so a partial history scores
+    the open trade too
+    """
+    return position.netprofit + position.openprofit
+
+
+@dataclass(slots=True)
+class Trial:
+    """
+    A candidate of the search
+
+    :param inputs: Script inputs of the candidate
+    :param score: Objective at the end of its last run
+    :param bars: Number of bars of the history it has run on
+    :param rung: Last rung it has reached, 0 is the shortest prefix
+    :param error: The error its run failed with, its score is -inf then
+    """
+    inputs: dict[str, Any]
+    score: float
+    bars: int
+    rung: int
+    error: str | None = None
+
+
+@dataclass(slots=True)
+class OptimiseResult:
+    """
+    Result of a search
+
+    :param best: The best candidate run on the full history
+    :param trials: Every candidate, best first: the ones reaching further in the history first
+    :param bars_run: Number of bars run by all candidates
+    :param grid_bars: Number of bars an exhaustive grid search would run
+    :param elapsed: Running time in seconds
+    """
+    best: Trial
+    trials: list[Trial]
+    bars_run: int
+    grid_bars: int
+    elapsed: float = field(default=0.0)
+
+    def summary(self, top: int = 10) -> str:
+        """
+        Human readable table of the best candidates
+        """
+        out = [f"{len(self.trials)} candidates, {self.bars_run} bars run in {self.elapsed:.2f} s, "
+               f"{self.bars_run / self.grid_bars:.1%} of the grid cost ({self.grid_bars} bars)",
+               f"{'score':>14} {'bars':>8} {'rung':>5}  inputs"]
+        for trial in self.trials[:top]:
+            error = f"  <-- {trial.error}" if trial.error else ''
+            out.append(f"{trial.score:>14.2f} {trial.bars:>8} {trial.rung:>5}  {trial.inputs}{error}")
+        return '\n'.join(out)
+
+
+def _score(value: Any) -> float:
+    try:
+        value = float(value)
+    except (TypeError, ValueError):  # NA
+        return -math.inf
+    return -math.inf if math.isnan(value) else value
+
+
+class _Run:
+    """
+    A suspended `fork_runner` of a candidate, with its share of the interpreter state
+    """
+
+    __slots__ = ('runner', 'position', 'state', 'function_cache', 'barstate', 'bars', 'error')
+
+    def __init__(self, runner, position, state: dict[str, Any]):
+        self.runner = runner
+        self.position = position
+        # Persistent and series globals of the script module, `main` is not isolated
+        self.state = state
+        self.function_cache: dict = {}
+        self.barstate = (True, False)  # isfirst, islast
+        self.bars = 0
+        # A failed run is not resumed, it keeps scoring -inf
+        self.error: str | None = None
+
+
+# noinspection PyProtectedMember
+def _worker_main(conn: 'Connection', script_path: str, data_path: str, syminfo: 'SymInfo | None',
+                 objective: Callable[['Position'], float]):
+    """
+    Worker process loop: keeps the runs of its candidates suspended, and advances them on request
+
+    The runs share the script module, the function isolation cache and the position of the script,
+    so every switch between the runs swaps them in and out.
+    """
+    from pynecore import lib
+    from pynecore.lib import barstate
+    from pynecore.lib.strategy import Position
+    from pynecore.core import function_isolation
+    from pynecore.core.script_runner import _set_lib_syminfo_properties
+    from pynecore.types import script_type
+    from custom_script_runner_preload_script import fork_runner, import_script
+    from run_helpers import load_candles
+
+    try:
+        script_module = import_script(Path(script_path))
+        script_obj = script_module.main.script
+        if script_obj.script_type != script_type.strategy:
+            raise ValueError(f"Script '{script_path}' is not a strategy!")
+        if syminfo is not None:
+            _set_lib_syminfo_properties(syminfo, lib)
+        candles = load_candles(Path(data_path))
+    except Exception as e:
+        conn.send(('error', f"{type(e).__name__}: {e}"))
+        return
+    conn.send(('ok', len(candles)))
+
+    module_globals = script_module.__dict__
+    # The state of the script before any run, new runs start from a copy of it
+    initial_state = {key: value for key, value in module_globals.items()
+                     if key.startswith(('__persistent_', '__series_')) and not key.endswith('_vars__')}
+    function_cache = function_isolation._function_cache
+    runs: dict[int, _Run] = {}
+    active: _Run | None = None
+
+    def swap(run: _Run):
+        nonlocal active
+        if active is run:
+            return
+        if active is not None:
+            active.state = {key: module_globals[key] for key in initial_state}
+            active.function_cache = dict(function_cache)
+            active.barstate = (barstate.isfirst, barstate.islast)
+        module_globals.update(run.state)
+        function_cache.clear()
+        function_cache.update(run.function_cache)
+        script_obj.position = run.position
+        barstate.isfirst, barstate.islast = run.barstate
+        active = run
+
+    while True:
+        message = conn.recv()
+        if message is None:
+            break
+        command, *args = message
+
+        if command == 'drop':
+            for cand_id in args[0]:
+                run = runs.pop(cand_id)
+                if active is run:
+                    active = None
+                run.runner.close()
+            continue
+
+        try:
+            items, end = args
+            # candidate id -> (score, error)
+            scores: dict[int, tuple[float, str | None]] = {}
+            for cand_id, inputs in items:
+                run = runs.get(cand_id)
+                if run is None:
+                    position = Position()
+                    run = runs[cand_id] = _Run(fork_runner(script_module, candles, inputs), position,
+                                               deepcopy(initial_state))
+                if run.error is None:
+                    # One broken candidate must not fail the others of the batch
+                    try:
+                        swap(run)
+                        # Resume the run where it was suspended
+                        for _ in islice(run.runner, end - run.bars):
+                            pass
+                        run.bars = end
+                        scores[cand_id] = _score(objective(run.position)), None
+                        continue
+                    except Exception as e:
+                        run.error = f"{type(e).__name__}: {e}"
+                scores[cand_id] = -math.inf, run.error
+            conn.send(('ok', scores))
+        except Exception as e:  # The worker must survive broken messages
+            conn.send(('error', f"{type(e).__name__}: {e}"))
+
+
+def _check_schedule(min_bars: int | None, eta: int):
+    """
+    Validate the parameters of the successive halving rungs, None `min_bars` is the default
+    """
+    if min_bars is not None and min_bars < 1:
+        raise ValueError(f"min_bars must be at least 1, got {min_bars}!")
+    if eta < 2:
+        raise ValueError(f"eta must be at least 2, got {eta}!")
+
+
+class Optimiser:
+    """
+    Strategy input optimiser with successive halving and Hyperband
+
+    Many candidates run on a short prefix of the history, the worst ones are pruned, and the survivors
+    are resumed, not restarted, on a longer prefix, until the best ones reach the end of the history.
+    The runs of the candidates stay suspended in worker processes between the rungs. Sampling is seeded,
+    and scores only depend on the inputs, so the result is reproducible with any number of workers.
+    """
+
+    __slots__ = ('script_path', 'data_path', 'space', 'objective', 'syminfo', 'workers', 'seed',
+                 'total_bars', '_rng', '_next_id', '_conns', '_processes', '_assigned', '_bars_run')
+
+    def __init__(self, script_path: Path, data_path: Path, space: dict[str, Sequence[Any]], *,
+                 objective: Callable[['Position'], float] = net_profit, syminfo: 'SymInfo | None' = None,
+                 workers: int | None = None, seed: int | None = None):
+        """
+        Initialize the optimiser
+
+        :param script_path: Path to the strategy script
+        :param data_path: Data file (`.ohlcv` or `.csv`)
+        :param space: Input name -> values to try, the grid is their product, fixed inputs can have one value
+        :param objective: Score of the position of a run, higher is better. It runs in the workers,
+                          so it must be picklable (a module level function)
+        :param syminfo: Symbol information, strategies need at least `mintick` and `pointvalue`
+        :param workers: Number of worker processes, default is the number of CPUs
+        :param seed: Random seed of the sampling of the candidates
+        """
+        import os
+
+        self.script_path = str(Path(script_path).resolve())
+        self.data_path = str(Path(data_path).resolve())
+        self.space = {name: list(values) for name, values in space.items()}
+        self.objective = objective
+        self.syminfo = syminfo
+        self.workers = workers or os.cpu_count() or 1
+        self.seed = seed
+        self.total_bars = 0
+
+        self._rng = random.Random(seed)
+        self._next_id = 0
+        self._conns: list['Connection'] = []
+        self._processes = []
+        # candidate id -> worker index
+        self._assigned: dict[int, int] = {}
+        self._bars_run = 0
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    @property
+    def grid_size(self) -> int:
+        return math.prod(len(values) for values in self.space.values())
+
+    def start(self) -> 'Optimiser':
+        """
+        Start the worker processes, they import the script and load the data
+
+        :raises RuntimeError: If a worker could not import the script or load the data
+        :raises ValueError: If the data file has no candles
+        """
+        import multiprocessing
+
+        ctx = multiprocessing.get_context('spawn')
+        for i in range(self.workers):
+            parent_conn, child_conn = ctx.Pipe()
+            process = ctx.Process(target=_worker_main, args=(child_conn, self.script_path, self.data_path,
+                                                             self.syminfo, self.objective),
+                                  name=f"pyne-optimiser-worker-{i}", daemon=True)
+            process.start()
+            child_conn.close()
+            self._conns.append(parent_conn)
+            self._processes.append(process)
+        for conn in self._conns:
+            self.total_bars = self._reply(conn)
+        if not self.total_bars:
+            self.close()
+            raise ValueError(f"No candles in {self.data_path}")
+        return self
+
+    def close(self):
+        """
+        Stop the workers
+        """
+        for conn in self._conns:
+            conn.send(None)
+        for process in self._processes:
+            process.join()
+        self._conns.clear()
+        self._processes.clear()
+        self._assigned.clear()
+
+    @staticmethod
+    def _reply(conn: 'Connection') -> Any:
+        status, value = conn.recv()
+        if status == 'error':
+            raise RuntimeError(value)
+        return value
+
+    def _sample(self, n: int) -> list[dict[str, Any]]:
+        """
+        Sample distinct candidates from the grid
+        """
+        names = list(self.space)
+        if n >= self.grid_size:
+            grid = list(product(*self.space.values()))
+            self._rng.shuffle(grid)
+            return [dict(zip(names, values)) for values in grid]
+        # Draw by grid index, so the grid is never built
+        sizes = [len(values) for values in self.space.values()]
+        res = []
+        for index in self._rng.sample(range(self.grid_size), n):
+            values = []
+            for name, size in zip(reversed(names), reversed(sizes)):
+                index, i = divmod(index, size)
+                values.append(self.space[name][i])
+            res.append(dict(zip(names, reversed(values))))
+        return res
+
+    def _run(self, candidates: dict[int, dict[str, Any]], new: set[int],
+             end: int) -> dict[int, tuple[float, str | None]]:
+        """
+        Advance the candidates to the end bar in parallel, new candidates are placed on the least loaded worker
+
+        :return: candidate id -> (score, the error if its run failed)
+        """
+        loads = [0] * len(self._conns)
+        for worker in self._assigned.values():
+            loads[worker] += 1
+        for cand_id in sorted(new):
+            worker = loads.index(min(loads))
+            self._assigned[cand_id] = worker
+            loads[worker] += 1
+
+        items: list[list[tuple[int, dict[str, Any] | None]]] = [[] for _ in self._conns]
+        for cand_id, inputs in candidates.items():
+            items[self._assigned[cand_id]].append((cand_id, inputs if cand_id in new else None))
+        busy = [i for i, worker_items in enumerate(items) if worker_items]
+        for i in busy:
+            self._conns[i].send(('run', items[i], end))
+        scores: dict[int, tuple[float, str | None]] = {}
+        for i in busy:
+            scores.update(self._reply(self._conns[i]))
+        return scores
+
+    def _drop(self, cand_ids: list[int]):
+        by_worker: dict[int, list[int]] = {}
+        for cand_id in cand_ids:
+            by_worker.setdefault(self._assigned.pop(cand_id), []).append(cand_id)
+        for worker, ids in by_worker.items():
+            self._conns[worker].send(('drop', ids))
+
+    def _bracket(self, candidates: int, min_bars: int, eta: int) -> list[Trial]:
+        """
+        One successive halving bracket
+        """
+        total = self.total_bars
+        alive: dict[int, dict[str, Any]] = {}
+        for inputs in self._sample(candidates):
+            alive[self._next_id] = inputs
+            self._next_id += 1
+        trials: dict[int, Trial] = {cand_id: Trial(inputs, -math.inf, 0, 0) for cand_id, inputs in alive.items()}
+
+        new = set(alive)
+        # Prefixes grow by eta from about min_bars, the last one is the full history
+        rungs = math.floor(math.log(total / min(max(min_bars, 1), total), eta) + 1e-9) + 1
+        rung = 0
+        budget = total // eta ** (rungs - 1)
+        try:
+            while True:
+                scores = self._run(alive, new, budget)
+                for cand_id, (score, error) in scores.items():
+                    trial = trials[cand_id]
+                    self._bars_run += budget - trial.bars
+                    trial.score, trial.bars, trial.rung, trial.error = score, budget, rung, error
+                new = set()
+                if budget >= total:
+                    break
+
+                # Keep the best 1/eta, ties go to the earlier sampled candidate
+                ranked = sorted(alive, key=lambda cand_id: (-trials[cand_id].score, cand_id))
+                keep = max(1, len(ranked) // eta)
+                self._drop(ranked[keep:])
+                alive = {cand_id: alive[cand_id] for cand_id in ranked[:keep]}
+                rung += 1
+                # A single survivor goes straight to the end
+                budget = total if keep == 1 else total // eta ** (rungs - 1 - rung)
+        finally:
+            self._drop(list(alive))
+        return list(trials.values())
+
+    def _result(self, trials: list[Trial], started: float) -> OptimiseResult:
+        trials.sort(key=lambda trial: (-trial.bars, -trial.score))
+        return OptimiseResult(best=trials[0], trials=trials, bars_run=self._bars_run,
+                              grid_bars=self.grid_size * self.total_bars,
+                              elapsed=time.perf_counter() - started)
+
+    def successive_halving(self, candidates: int = 81, min_bars: int | None = None,
+                           eta: int = 3) -> OptimiseResult:
+        """
+        Run a successive halving search
+
+        :param candidates: Number of candidates sampled from the grid, all of them if it is larger
+        :param min_bars: Length of the first prefix, default is 1/eta^2 of the history (3 rungs). Too short
+                         prefixes rank the candidates by noise, e.g. before long averages even warm up
+        :param eta: Reduction factor: 1/eta of the candidates survive a rung, and run eta times longer
+        :return: The result, the best candidate has run on the full history
+        :raises ValueError: If `min_bars` is less than 1 or `eta` is less than 2
+        """
+        _check_schedule(min_bars, eta)
+        if not self._conns:
+            raise RuntimeError("The optimiser is not started!")
+        started = time.perf_counter()
+        self._bars_run = 0
+        candidates = min(candidates, self.grid_size)
+        if min_bars is None:
+            min_bars = self.total_bars // eta ** 2
+        return self._result(self._bracket(candidates, min_bars, eta), started)
+
+    def hyperband(self, min_bars: int, eta: int = 3) -> OptimiseResult:
+        """
+        Run a Hyperband search: successive halving brackets from aggressive (many candidates, `min_bars`
+        long first rung) to conservative (few candidates on the full history), so strategies which only
+        pay off on long histories are not always pruned early
+
+        :param min_bars: Length of the shortest first prefix
+        :param eta: Reduction factor of the brackets
+        :return: The result of all the brackets
+        :raises ValueError: If `min_bars` is less than 1 or `eta` is less than 2
+        """
+        _check_schedule(min_bars, eta)
+        if not self._conns:
+            raise RuntimeError("The optimiser is not started!")
+        started = time.perf_counter()
+        self._bars_run = 0
+        s_max = max(0, math.floor(math.log(self.total_bars / min_bars, eta)))
+        trials: list[Trial] = []
+        for s in range(s_max, -1, -1):
+            candidates = math.ceil((s_max + 1) / (s + 1) * eta ** s)
+            trials += self._bracket(min(candidates, self.grid_size), self.total_bars // eta ** s, eta)
+        return self._result(trials, started)
@@ -0,0 +1,237 @@
+from typing import Any, BinaryIO, Callable, Iterable, Iterator
+from itertools import islice
+from array import array
+import struct
+import pickle
+import json
+
+__all__ = [
+    'OutputEncoder',
+    'OutputDecoder',
+    'encode_stage',
+    'write_batch',
+    'read_batches',
+]
+
+# Batch layout, little endian, the bars of a batch are stored by columns:
+#   MAGIC, bars (uint32), float changes (uint32), length of the schema (uint32), length of the others (uint32)
+#   schema: JSON list of the new columns [bar, script id, key], their ids follow the known ones
+#   float changes per bar (uint16 each)
+#   column ids of the float changes (uint16 each)
+#   the float changes (float64 each)
+#   others: pickled list of the other changes (bar, column id, value): NA, bools, ints, strings...
+# Only the columns whose value changed since the previous bar are stored. Streams (pipes, sockets,
+# files) prefix every batch with its length (uint32), see `write_batch` / `read_batches`.
+
+MAGIC = b'PYO2'
+MAX_COLUMNS = 0xFFFF
+
+_BATCH_HEAD = struct.Struct('<4sIIII')
+# Last value of a key not sent yet
+_MISSING = object()
+_LENGTH = struct.Struct('<I')
+
+
+class OutputEncoder:
+    """
+    Encoder of `ChartRunner.run_iter` results ({script id: {key: value}}) into compact binary batches
+
+    Columns get an id when first seen, and are announced once in the schema of the batch, a key which
+    disappears and comes back keeps its id. Only the changed values are stored, floats as fixed width
+    float64, the rest (NA, bools, ints, strings) pickled. Keys missing from a bar keep their last value,
+    like in the results of `ChartRunner`. A script without values yet (None) has no columns, it is missing
+    from the decoded results until its first values.
+    """
+
+    __slots__ = ('batch_bars', '_scripts', '_columns', '_new_columns', '_counts', '_ids', '_values', '_others')
+
+    def __init__(self, batch_bars: int = 64):
+        """
+        :param batch_bars: Bars per batch
+        """
+        self.batch_bars = batch_bars
+        # script id -> ({key: column id}, {key: last sent value})
+        self._scripts: dict[str, tuple[dict[str, int], dict[str, Any]]] = {}
+        self._columns: list[tuple[str, str]] = []
+        # The collected bars of the batch
+        self._new_columns: list[tuple[int, str, str]] = []
+        self._counts: list[int] = []
+        self._ids: list[int] = []
+        self._values: list[float] = []
+        self._others: list[tuple[int, int, Any]] = []
+
+    def _add_column(self, script_id: str, key: str, column_ids: dict[str, int]) -> int:
+        column_id = len(self._columns)
+        if column_id >= MAX_COLUMNS:
+            raise ValueError(f"Too many columns, the maximum is {MAX_COLUMNS}!")
+        self._columns.append((script_id, key))
+        self._new_columns.append((len(self._counts), script_id, key))
+        column_ids[key] = column_id
+        return column_id
+
+    def encode(self, res: dict[str, dict[str, Any]]) -> bytes | None:
+        """
+        Encode the results of a bar
+
+        :param res: Results of a bar
+        :return: A batch when `batch_bars` bars are collected, else None
+        """
+        ids = self._ids
+        changes = len(ids)
+        add_id = ids.append
+        add_value = self._values.append
+        scripts = self._scripts
+        for script_id, values in res.items():
+            try:
+                column_ids, last = scripts[script_id]
+            except KeyError:
+                column_ids, last = scripts[script_id] = ({}, {})
+            # Unchanged scripts are skipped by one comparison in C, identical NA and NaN values are equal here,
+            # None is a script without values yet (execution policy not due yet, or a feed without a bar)
+            if values is None or values == last:
+                continue
+            for key, value in values.items():
+                previous = last.get(key, _MISSING)
+                if value is previous or value == previous and value.__class__ is previous.__class__:
+                    continue
+                last[key] = value
+                column_id = column_ids.get(key)
+                if column_id is None:
+                    column_id = self._add_column(script_id, key, column_ids)
+                if value.__class__ is float:
+                    add_id(column_id)
+                    add_value(value)
+                else:
+                    self._others.append((len(self._counts), column_id, value))
+        self._counts.append(len(ids) - changes)
+
+        if len(self._counts) >= self.batch_bars:
+            return self.flush()
+        return None
+
+    def flush(self) -> bytes:
+        """
+        The batch of the collected bars, empty bytes if there are none
+        """
+        if not self._counts:
+            return b''
+        schema = json.dumps(self._new_columns).encode() if self._new_columns else b''
+        others = pickle.dumps(self._others, pickle.HIGHEST_PROTOCOL) if self._others else b''
+        batch = b''.join((_BATCH_HEAD.pack(MAGIC, len(self._counts), len(self._ids), len(schema), len(others)),
+                          schema, array('H', self._counts).tobytes(), array('H', self._ids).tobytes(),
+                          array('d', self._values).tobytes(), others))
+        self._new_columns = []
+        self._counts = []
+        self._ids = []
+        self._values = []
+        self._others = []
+        return batch
+
+
+class OutputDecoder:
+    """
+    Decoder of the batches of an `OutputEncoder`, it keeps the current results of every column
+    """
+
+    __slots__ = ('columns', 'res', '_targets')
+
+    def __init__(self):
+        self.columns: list[tuple[str, str]] = []
+        # The current results, same shape as the results of `ChartRunner.run_iter`
+        self.res: dict[str, dict[str, Any]] = {}
+        # column id -> (dict of its script, key)
+        self._targets: list[tuple[dict[str, Any], str]] = []
+
+    def _add_column(self, script_id: str, key: str):
+        self.columns.append((script_id, key))
+        values = self.res.setdefault(script_id, {})
+        values.setdefault(key, None)
+        self._targets.append((values, key))
+
+    def decode(self, batch: bytes | memoryview) -> Iterator[dict[str, dict[str, Any]]]:
+        """
+        Decode a batch, bar by bar
+
+        :param batch: A batch, any buffer (e.g. a slice of shared memory)
+        :return: The results after every bar, the dictionary is reused between bars, copy it if you need to keep it
+        :raises ValueError: If the batch is not an output batch
+        """
+        data = memoryview(batch)
+        magic, bars, changes, schema_length, others_length = _BATCH_HEAD.unpack_from(data, 0)
+        if magic != MAGIC:
+            raise ValueError("Not an output batch!")
+        offset = _BATCH_HEAD.size
+        schema = json.loads(bytes(data[offset:offset + schema_length])) if schema_length else []
+        offset += schema_length
+        counts = array('H')
+        counts.frombytes(data[offset:offset + bars * 2])
+        offset += bars * 2
+        column_ids = array('H')
+        column_ids.frombytes(data[offset:offset + changes * 2])
+        offset += changes * 2
+        float_values = array('d')
+        float_values.frombytes(data[offset:offset + changes * 8])
+        offset += changes * 8
+        others = pickle.loads(data[offset:offset + others_length]) if others_length else []
+
+        targets = self._targets
+        changed = zip(column_ids, float_values)
+        schema_pos = other_pos = 0
+        for bar, count in enumerate(counts):
+            while schema_pos < len(schema) and schema[schema_pos][0] == bar:
+                self._add_column(*schema[schema_pos][1:])
+                schema_pos += 1
+            for column_id, value in islice(changed, count):
+                values, key = targets[column_id]
+                values[key] = value
+            while other_pos < len(others) and others[other_pos][0] == bar:
+                _, column_id, value = others[other_pos]
+                values, key = targets[column_id]
+                values[key] = value
+                other_pos += 1
+            yield self.res
+
+
+def encode_stage(source: Iterable[dict[str, dict[str, Any]]], write: Callable[[bytes], Any],
+                 batch_bars: int = 64) -> Iterator[dict[str, dict[str, Any]]]:
+    """
+    Encode the results of a run, and write the batches, the results are passed through
+
+    :param source: Results of the bars, e.g. `chart.run_iter()`
+    :param write: Writes a batch, e.g. `conn.send_bytes` of a pipe, or `lambda batch: write_batch(stream, batch)`
+    :param batch_bars: Bars per batch, the last batch may be shorter
+    """
+    encoder = OutputEncoder(batch_bars)
+    try:
+        for res in source:
+            batch = encoder.encode(res)
+            if batch:
+                write(batch)
+            yield res
+    finally:
+        batch = encoder.flush()
+        if batch:
+            write(batch)
+
+
+def write_batch(stream: BinaryIO, batch: bytes):
+    """
+    Write a batch to a byte stream (file, pipe, `socket.makefile('wb')`), prefixed with its length
+    """
+    stream.write(_LENGTH.pack(len(batch)))
+    stream.write(batch)
+
+
+def read_batches(stream: BinaryIO) -> Iterator[bytes]:
+    """
+    Read the batches of `write_batch` from a byte stream until it ends
+    """
+    while True:
+        head = stream.read(_LENGTH.size)
+        if len(head) < _LENGTH.size:
+            return
+        length, = _LENGTH.unpack(head)
+        batch = stream.read(length)
+        if len(batch) < length:
+            raise EOFError("The stream ended in a batch!")
+        yield batch
@@ -0,0 +1,174 @@
+from typing import Iterable, Iterator, Callable, TypeVar, Generic
+import threading
+import queue
+import time
+
+__all__ = [
+    'PrefetchingSource',
+]
+
+T = TypeVar('T')
+
+_END = None
+
+
+def _produce(source: Iterable[T], block_size: int, put: Callable[[object], bool]):
+    """
+    Read the source in blocks and hand them to `put`, it returns False if the consumer is gone
+    """
+    try:
+        block: list[T] = []
+        for item in source:
+            block.append(item)
+            if len(block) >= block_size:
+                if not put(block):
+                    return
+                block = []
+        if block and not put(block):
+            return
+        put(_END)
+    except Exception as e:  # Forwarded to the consumer
+        put(e)
+
+
+def _process_main(factory: Callable[[], Iterable[T]], block_size: int, out_queue):
+    """
+    Producer process: build the source from the factory and feed the queue
+    """
+    def put(block) -> bool:
+        out_queue.put(block)
+        return True
+
+    try:
+        source = factory()
+    except Exception as e:  # Forwarded to the consumer, like the errors of the source
+        put(e)
+        return
+    _produce(source, block_size, put)
+
+
+class PrefetchingSource(Generic[T]):
+    """
+    Source wrapper, which reads the next blocks of candles in a background thread or process,
+    while the runner consumes the current block
+
+    Threads help if the source releases the GIL (file and network I/O, zlib/lzma decompression, sqlite),
+    a process helps with pure Python decoding (e.g. CSV parsing), but blocks are pickled between processes.
+    """
+
+    __slots__ = ('source', 'block_size', 'depth', 'mode', 'stall_time', 'total_time', 'blocks', 'items')
+
+    def __init__(self, source: Iterable[T] | Callable[[], Iterable[T]], *, block_size: int = 1024,
+                 depth: int = 2, mode: str = 'thread'):
+        """
+        :param source: Iterable of candles (thread mode), or a picklable factory returning one (process mode)
+        :param block_size: Number of candles per block
+        :param depth: Number of blocks decoded ahead, 2 is double buffering
+        :param mode: 'thread' or 'process'
+        :raises ValueError: If the mode is unknown, or the source is not a factory in process mode
+        """
+        if mode not in ('thread', 'process'):
+            raise ValueError(f"Unknown mode: {mode}")
+        if mode == 'process' and not callable(source):
+            raise ValueError("Process mode needs a picklable factory of the source, iterators cannot be pickled!")
+        self.source = source
+        self.block_size = block_size
+        self.depth = depth
+        self.mode = mode
+        self.stall_time = 0.0
+        self.total_time = 0.0
+        self.blocks = 0
+        self.items = 0
+
+    def __iter__(self) -> Iterator[T]:
+        if self.mode == 'thread':
+            return self._iter_thread()
+        return self._iter_process()
+
+    def _consume(self, get: Callable[[], object]) -> Iterator[T]:
+        """
+        Yield the items of the blocks, measuring the time spent waiting for the reader
+        """
+        perf_counter = time.perf_counter
+        started = perf_counter()
+        try:
+            while True:
+                wait_started = perf_counter()
+                block = get()
+                self.stall_time += perf_counter() - wait_started
+                if block is _END:
+                    return
+                if isinstance(block, Exception):
+                    raise block
+                self.blocks += 1
+                self.items += len(block)
+                yield from block
+        finally:
+            self.total_time += perf_counter() - started
+
+    def _iter_thread(self) -> Iterator[T]:
+        blocks: queue.Queue = queue.Queue(maxsize=self.depth)
+        stop = threading.Event()
+        source = self.source() if callable(self.source) else self.source
+
+        def put(block) -> bool:
+            while not stop.is_set():
+                try:
+                    blocks.put(block, timeout=0.1)
+                    return True
+                except queue.Full:
+                    pass
+            return False
+
+        thread = threading.Thread(target=_produce, args=(source, self.block_size, put),
+                                  name="pyne-prefetch", daemon=True)
+        thread.start()
+        try:
+            yield from self._consume(blocks.get)
+        finally:
+            stop.set()
+            thread.join()
+
+    def _iter_process(self) -> Iterator[T]:
+        import multiprocessing
+
+        ctx = multiprocessing.get_context()  # Platform default, fork starts much faster where available
+        blocks = ctx.Queue(maxsize=self.depth)
+        process = ctx.Process(target=_process_main, args=(self.source, self.block_size, blocks),
+                              name="pyne-prefetch", daemon=True)
+        process.start()
+
+        def get():
+            while True:
+                try:
+                    return blocks.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+                if not process.is_alive():
+                    # Its last blocks may have reached the pipe after the timeout
+                    try:
+                        return blocks.get(timeout=0.1)
+                    except queue.Empty:
+                        raise RuntimeError(f"The prefetch process died with exit code {process.exitcode}, "
+                                           f"before the end of the source!") from None
+
+        try:
+            yield from self._consume(get)
+        finally:
+            if process.is_alive():
+                process.terminate()
+            process.join()
+            blocks.close()
+
+    def stats(self) -> dict[str, float]:
+        """
+        Reader stall versus compute time in seconds, compute is the time the consumer spent between blocks
+        """
+        compute_time = self.total_time - self.stall_time
+        return {
+            'blocks': self.blocks,
+            'items': self.items,
+            'stall_s': self.stall_time,
+            'compute_s': compute_time,
+            'stall_ratio': self.stall_time / self.total_time if self.total_time else 0.0,
+        }
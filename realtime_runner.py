@@ -0,0 +1,322 @@
+from typing import Iterable, Iterator, Any, NamedTuple, TYPE_CHECKING
+from types import ModuleType
+from collections import deque
+from copy import deepcopy
+import time
+
+from pynecore.types.ohlcv import OHLCV
+from pynecore.types import script_type
+
+from custom_script_runner_preload_script import _set_lib_properties, _reset_lib_vars
+
+if TYPE_CHECKING:
+    from pynecore.core.series import SeriesImpl
+
+__all__ = [
+    'Tick',
+    'StateCheckpoint',
+    'RealtimeRunner',
+]
+
+# Values which can be restored without copying, containers (even tuples) may hold mutable values
+_IMMUTABLE_TYPES = (int, float, bool, str, bytes, type(None))
+
+
+class Tick(NamedTuple):
+    timestamp: float  # Unix timestamp in seconds
+    price: float
+    volume: float = 0.0
+
+
+# noinspection PyProtectedMember
+class StateCheckpoint:
+    """
+    Checkpoint of the persistent and series state of the running scripts at the last confirmed bar
+
+    Persistent variables live in the globals of the script module and of the isolated function
+    instances (one per call site, including library functions like `ta.ema`). Series only need their
+    write position and the one buffer cell the next `add` overwrites, so restoring is cheap.
+    """
+
+    __slots__ = ('_script_module', '_function_cache', '_cache_keys', '_persistent', '_mutable', '_series')
+
+    def __init__(self, script_module: ModuleType):
+        from pynecore.core.function_isolation import _function_cache
+
+        self._script_module = script_module
+        self._function_cache = _function_cache
+        self._cache_keys: set = set()
+        # (globals, key, value) of immutable and mutable persistent values
+        self._persistent: list[tuple[dict[str, Any], str, Any]] = []
+        self._mutable: list[tuple[dict[str, Any], str, Any]] = []
+        # (series, write_pos, size, last_bar_index, next write position, value at next write position)
+        self._series: list[tuple['SeriesImpl', int, int, int, int, Any]] = []
+
+    def capture(self):
+        """
+        Capture the current state, call it after a confirmed bar
+        """
+        from pynecore.core.series import SeriesImpl
+
+        persistent = self._persistent = []
+        mutable = self._mutable = []
+        series_states = self._series = []
+        seen_series: set[int] = set()
+
+        def capture_globals(globals_: dict[str, Any], keys: Iterable[str]):
+            for key in keys:
+                value = globals_[key]
+                if isinstance(value, SeriesImpl):
+                    if id(value) in seen_series:
+                        continue
+                    seen_series.add(id(value))
+                    pos = value._write_pos
+                    if value._size >= value._capacity and pos >= value._capacity:
+                        pos = 0
+                    series_states.append((value, value._write_pos, value._size, value._last_bar_index,
+                                          pos, value._buffer[pos]))
+                elif isinstance(value, _IMMUTABLE_TYPES):
+                    persistent.append((globals_, key, value))
+                else:
+                    mutable.append((globals_, key, deepcopy(value)))
+
+        module_globals = self._script_module.__dict__
+        capture_globals(module_globals, [key for key in module_globals
+                                         if key.startswith(('__persistent_', '__series_'))
+                                         and not key.endswith('_vars__')])
+
+        for func in self._function_cache.values():
+            globals_ = func.__globals__
+            # Only the variables of the function itself are isolated, the registry tells which ones
+            qualname = func.__qualname__.replace('<locals>.', '')
+            keys = [*globals_.get('__persistent_function_vars__', {}).get(qualname, ()),
+                    *globals_.get('__series_function_vars__', {}).get(qualname, ())]
+            if not keys and '__persistent_function_vars__' not in globals_:
+                keys = [key for key in globals_
+                        if key.startswith(('__persistent_', '__series_')) and not key.endswith('_vars__')]
+            capture_globals(globals_, keys)
+
+        self._cache_keys = set(self._function_cache)
+
+    def restore(self):
+        """
+        Roll back to the captured state
+        """
+        for globals_, key, value in self._persistent:
+            globals_[key] = value
+        for globals_, key, value in self._mutable:
+            globals_[key] = deepcopy(value)  # The run may mutate it in place, at any depth
+        for series, write_pos, size, last_bar_index, pos, value in self._series:
+            series._write_pos = write_pos
+            series._size = size
+            series._last_bar_index = last_bar_index
+            series._buffer[pos] = value
+
+        # Drop the function instances of call sites first reached on the unconfirmed bar
+        function_cache = self._function_cache
+        if len(function_cache) != len(self._cache_keys):
+            for key in [key for key in function_cache if key not in self._cache_keys]:
+                del function_cache[key]
+
+
+def _unconfirmed() -> bool:
+    return False
+
+
+def _confirmed() -> bool:
+    return True
+
+
+_unconfirmed.__module_property__ = True  # type: ignore
+_confirmed.__module_property__ = True  # type: ignore
+
+
+# noinspection PyProtectedMember
+class RealtimeRunner:
+    """
+    Realtime runner, builds the forming candle from streamed ticks and re-runs the script on it
+    on every tick, like `calc_on_every_tick` in Pine Script
+
+    Before every tick the state is rolled back to the last confirmed bar, when the bar closes
+    the script runs on the final candle and the state is committed.
+    Only indicators are supported. The runner owns the global `lib` state while it is used.
+    """
+
+    __slots__ = ('script_module', 'script', 'script_inputs', 'timeframe', 'bar_index', 'tz',
+                 'forming', 'checkpoint', 'latencies_ns', '_lib', '_function_isolation', '_registered_libraries',
+                 '_barstate_props')
+
+    def __init__(self, script_module: ModuleType, timeframe: int, script_inputs: dict[str, Any] | None = None,
+                 *, latency_samples: int = 10000):
+        """
+        Initialize the realtime runner
+
+        :param script_module: The script module, imported by `import_script`
+        :param timeframe: Timeframe of the bars in seconds
+        :param script_inputs: Inputs to pass to pyne script: {"src": "close", "length": 20,}
+        :param latency_samples: Number of recent tick-to-value latencies to keep
+        :raises ValueError: If the script is a strategy
+        """
+        from zoneinfo import ZoneInfo
+        from pynecore import lib
+        from pynecore.core import function_isolation
+        from pynecore.core import script
+
+        self.script_module = script_module
+        self.script = script_module.main.script
+        if self.script.script_type == script_type.strategy:
+            raise ValueError("Strategies are not supported in realtime mode!")
+
+        self.script_inputs = script_inputs or {}
+        self.timeframe = timeframe
+        self.bar_index = 0
+        self.tz = ZoneInfo("UTC")
+        self.forming: list | None = None  # [timestamp, open, high, low, close, volume]
+        self.checkpoint = StateCheckpoint(script_module)
+        self.latencies_ns: deque[int] = deque(maxlen=latency_samples)
+        self._lib = lib
+        self._function_isolation = function_isolation
+        self._registered_libraries = script._registered_libraries
+        self._barstate_props = (lib.barstate.isconfirmed, lib.barstate.isrealtime)
+
+        function_isolation.reset()
+        lib._plot_data.clear()
+        _reset_lib_vars(lib)
+        self.checkpoint.capture()
+
+    def _execute(self, candle: OHLCV, confirmed: bool) -> dict[str, Any]:
+        """
+        Run the script on a candle at the current bar index
+        """
+        lib = self._lib
+        barstate = lib.barstate
+        barstate.isconfirmed = _confirmed if confirmed else _unconfirmed
+        barstate.isrealtime = _unconfirmed if confirmed else _confirmed
+
+        lib._script = self.script
+        _set_lib_properties(candle, self.bar_index, self.tz, lib)
+        self._function_isolation.reset_step()
+
+        # Execute registered library main functions before main script
+        lib._lib_semaphore = True
+        for library_title, main_func in self._registered_libraries:
+            main_func()
+        lib._lib_semaphore = False
+
+        lib._plot_data.clear()
+        res = self.script_module.main(**self.script_inputs)
+        if res is not None:
+            assert isinstance(res, dict), "The 'main' function must return a dictionary!"
+            lib._plot_data.update(res)
+        return dict(lib._plot_data)
+
+    def _commit(self, candle: OHLCV) -> dict[str, Any]:
+        """
+        Run the script on a closed candle and commit the state
+        """
+        self.checkpoint.restore()
+        res = self._execute(candle, confirmed=True)
+        self.checkpoint.capture()
+        self.bar_index += 1
+        self._lib.barstate.isfirst = False
+        return res
+
+    def warm_up(self, ohlcv_iter: Iterable[OHLCV]) -> Iterator[tuple[OHLCV, dict[str, Any]]]:
+        """
+        Run the script on closed historical bars before streaming ticks
+
+        :param ohlcv_iter: Iterator of historical OHLCV data
+        :return: Iterator of (candle, plot data)
+        """
+        capture = self.checkpoint.capture
+        for candle in ohlcv_iter:
+            res = self._execute(candle, confirmed=True)
+            self.bar_index += 1
+            self._lib.barstate.isfirst = False
+            yield candle, res
+        capture()
+
+    def close_bar(self) -> tuple[OHLCV, dict[str, Any]] | None:
+        """
+        Close the forming bar, e.g. on a timer when no tick arrived after the bar end
+
+        :return: The closed candle and the confirmed plot data, or None if there is no forming bar
+        """
+        if self.forming is None:
+            return None
+        candle = OHLCV(*self.forming, extra_fields=None)
+        self.forming = None
+        return candle, self._commit(candle)
+
+    def on_tick(self, tick: Tick) -> list[tuple[OHLCV, dict[str, Any], bool]]:
+        """
+        Process a tick
+
+        :param tick: The tick
+        :return: (candle, plot data, confirmed) tuples: the closed bar if the tick opened a new bar,
+                 then the forming bar
+        """
+        started = time.perf_counter_ns()
+        out = []
+
+        bar_start = int(tick.timestamp) - int(tick.timestamp) % self.timeframe
+        forming = self.forming
+        if forming is not None and bar_start > forming[0]:
+            closed = self.close_bar()
+            out.append((closed[0], closed[1], True))
+            forming = None
+
+        if forming is None:
+            forming = self.forming = [bar_start, tick.price, tick.price, tick.price, tick.price, tick.volume]
+        else:
+            if tick.price > forming[2]:
+                forming[2] = tick.price
+            if tick.price < forming[3]:
+                forming[3] = tick.price
+            forming[4] = tick.price
+            forming[5] += tick.volume
+
+        candle = OHLCV(*forming, extra_fields=None)
+        self.checkpoint.restore()
+        out.append((candle, self._execute(candle, confirmed=False), False))
+
+        self.latencies_ns.append(time.perf_counter_ns() - started)
+        return out
+
+    def run_iter(self, tick_iter: Iterable[Tick]) -> Iterator[tuple[OHLCV, dict[str, Any], bool]]:
+        """
+        Process a stream of ticks
+
+        :param tick_iter: Iterator of ticks
+        :return: Iterator of (candle, plot data, confirmed)
+        """
+        try:
+            for tick in tick_iter:
+                yield from self.on_tick(tick)
+        finally:
+            self.close()
+
+    def close(self):
+        """
+        Give back the global lib state
+        """
+        barstate = self._lib.barstate
+        barstate.isconfirmed, barstate.isrealtime = self._barstate_props
+        _reset_lib_vars(self._lib)
+
+    def latency_stats(self) -> dict[str, float]:
+        """
+        Tick-to-value latency statistics in microseconds
+        """
+        samples = sorted(self.latencies_ns)
+        if not samples:
+            return {}
+        n = len(samples)
+        return {
+            'count': n,
+            'mean_us': sum(samples) / n / 1000.0,
+            'p50_us': samples[n // 2] / 1000.0,
+            'p90_us': samples[min(n - 1, int(n * 0.9))] / 1000.0,
+            'p99_us': samples[min(n - 1, int(n * 0.99))] / 1000.0,
+            'max_us': samples[-1] / 1000.0,
+        }
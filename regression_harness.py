@@ -0,0 +1,305 @@
+from typing import Any, Iterable
+from pathlib import Path
+from dataclasses import dataclass, field
+import math
+import json
+import gzip
+import time
+import os
+
+from run_helpers import load_candles, plain_value
+
+__all__ = [
+    'CORPUS',
+    'Divergence',
+    'Slowdown',
+    'RegressionReport',
+    'run_script',
+    'time_script',
+    'record',
+    'record_timing',
+    'check',
+]
+
+ohlcv_path = Path("./data/ccxt_BYBIT_BTC_USDT_60.ohlcv")
+golden_folder = Path("./golden")
+# Timing baseline of this machine, not committed: absolute speeds don't carry over to other machines
+timing_path = golden_folder / "timing.local.json"
+
+# (script path, inputs) of the scripts checked
+CORPUS: list[tuple[Path, dict[str, Any]]] = [
+    (Path("./scripts/demo_pyne.py"), {"src": "close", "fast_length": 16, "slow_length": 30}),
+    (Path("./scripts/vstop.py"), {"length": 30, "src": "close", "factor": 2.0}),
+]
+
+
+@dataclass(slots=True)
+class Divergence:
+    """
+    Numeric divergence of an output column from the golden output
+    """
+    script: str
+    column: str
+    mismatches: int
+    first_bar: int
+    max_abs_diff: float
+    expected: Any
+    actual: Any
+
+
+@dataclass(slots=True)
+class Slowdown:
+    """
+    Slowdown of a script compared to the timing baseline
+    """
+    script: str
+    baseline_bars_per_s: float
+    bars_per_s: float
+
+    @property
+    def ratio(self) -> float:
+        return self.baseline_bars_per_s / self.bars_per_s
+
+
+@dataclass(slots=True)
+class RegressionReport:
+    """
+    Result of a check, numeric divergences and slowdowns are reported separately
+    """
+    pynecore_version: str
+    golden_version: str
+    divergences: list[Divergence] = field(default_factory=list)
+    slowdowns: list[Slowdown] = field(default_factory=list)
+    timings: dict[str, tuple[float, float]] = field(default_factory=dict)  # script -> (baseline, current)
+    missing: list[str] = field(default_factory=list)
+    # Timing is advisory unless strict, a slowdown fails the check only then
+    strict_timing: bool = False
+    timing_recorded: bool = True
+
+    @property
+    def ok(self) -> bool:
+        return not self.divergences and not self.missing and not (self.strict_timing and self.slowdowns)
+
+    def summary(self) -> str:
+        out = [f"pynecore {self.pynecore_version} vs golden outputs of pynecore {self.golden_version}", "",
+               "Numeric divergence:"]
+        if not self.divergences:
+            out.append("    none")
+        for d in self.divergences:
+            out.append(f"    {d.script} / {d.column}: {d.mismatches} bars differ, first at bar {d.first_bar} "
+                       f"({d.expected!r} -> {d.actual!r}), max abs diff {d.max_abs_diff:g}")
+        for script in self.missing:
+            out.append(f"    {script}: no golden output, record it first")
+
+        out += ["", f"Timing (bars/s, local baseline adjusted to the machine speed -> current)"
+                    f"{'' if self.strict_timing else ', advisory'}:"]
+        if not self.timing_recorded:
+            out.append("    no local baseline, run `python regression_harness.py record-timing` first")
+        slow = {s.script for s in self.slowdowns}
+        for script, (baseline, current) in self.timings.items():
+            out.append(f"    {script}: {baseline:.0f} -> {current:.0f} ({current / baseline - 1:+.1%})"
+                       f"{'  <-- SLOWDOWN' if script in slow else ''}")
+        out += ["", "OK" if self.ok else "FAILED"]
+        return '\n'.join(out)
+
+
+def _pynecore_version() -> str:
+    from importlib.metadata import version, PackageNotFoundError
+    try:
+        return version('pynesys-pynecore')
+    except PackageNotFoundError:  # Source checkout
+        return 'unknown'
+
+
+def run_script(script_path: Path, inputs: dict[str, Any], candles: list) -> dict[str, list]:
+    """
+    Run a script on the candles
+
+    :return: Output columns
+    """
+    from custom_script_runner_preload_script import fork_runner, import_script
+
+    module = import_script(script_path)
+    columns: dict[str, list] = {}
+    for bar_index, (candle, plot_data, *_) in enumerate(fork_runner(module, candles, inputs)):
+        for key, value in plot_data.items():
+            column = columns.get(key)
+            if column is None:
+                column = columns[key] = [None] * bar_index
+            column.append(plain_value(value))
+        # Keys missing on this bar
+        for column in columns.values():
+            if len(column) <= bar_index:
+                column.append(None)
+    return columns
+
+
+def time_script(script_path: Path, inputs: dict[str, Any], candles: list, rounds: int = 3) -> float:
+    """
+    Time a script on the candles, the outputs are not collected
+
+    :return: The best bars/s of the rounds
+    """
+    from custom_script_runner_preload_script import fork_runner, import_script
+
+    module = import_script(script_path)
+    best = float('inf')
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for _ in fork_runner(module, candles, inputs):
+            pass
+        best = min(best, time.perf_counter() - start)
+    return len(candles) / best
+
+
+def _calibrate(rounds: int = 5) -> float:
+    """
+    Speed of the machine on a fixed pure Python workload (iterations/s, best of rounds),
+    script speeds are compared relative to it, so machine load and CPU frequency changes mostly cancel out
+    """
+    best = float('inf')
+    for _ in range(rounds):
+        start = time.perf_counter()
+        acc = 0.0
+        values = {'a': 1.0, 'b': 2.0}
+        for i in range(200_000):
+            acc = acc * 0.5 + values['a' if i & 1 else 'b'] + min(acc, 3.0)
+        best = min(best, time.perf_counter() - start)
+    return 200_000 / best
+
+
+def _golden_path(script_path: Path) -> Path:
+    return golden_folder / f"{script_path.stem}.json.gz"
+
+
+def record(corpus: Iterable[tuple[Path, dict[str, Any]]] = CORPUS):
+    """
+    Record golden outputs with the installed pynecore
+    """
+    candles = load_candles(ohlcv_path)
+    golden_folder.mkdir(exist_ok=True)
+    version = _pynecore_version()
+    for script_path, inputs in corpus:
+        columns = run_script(script_path, inputs, candles)
+        with gzip.open(_golden_path(script_path), 'wt') as f:
+            json.dump({'pynecore_version': version, 'inputs': inputs, 'bars': len(candles),
+                       'columns': columns}, f)
+        print(f"{script_path.stem}: {len(columns)} columns")
+
+
+def record_timing(corpus: Iterable[tuple[Path, dict[str, Any]]] = CORPUS, rounds: int = 3):
+    """
+    Record the timing baseline of this machine, e.g. before upgrading pynecore, it is not committed
+    """
+    candles = load_candles(ohlcv_path)
+    golden_folder.mkdir(exist_ok=True)
+    bars_per_s = {}
+    for script_path, inputs in corpus:
+        bars_per_s[script_path.stem] = time_script(script_path, inputs, candles, rounds)
+        print(f"{script_path.stem}: {bars_per_s[script_path.stem]:.0f} bars/s")
+    with open(timing_path, 'w') as f:
+        json.dump({'pynecore_version': _pynecore_version(), 'calibration': _calibrate(),
+                   'bars_per_s': bars_per_s}, f, indent=2)
+
+
+def _compare(script: str, name: str, expected: list, actual: list, rel_tol: float,
+             abs_tol: float) -> Divergence | None:
+    mismatches = 0
+    first_bar = -1
+    max_diff = 0.0
+    for bar_index in range(max(len(expected), len(actual))):
+        e = expected[bar_index] if bar_index < len(expected) else None
+        a = actual[bar_index] if bar_index < len(actual) else None
+        if isinstance(e, float) and isinstance(a, float):
+            if math.isclose(e, a, rel_tol=rel_tol, abs_tol=abs_tol):
+                continue
+            max_diff = max(max_diff, abs(e - a))
+        elif e == a:
+            continue
+        mismatches += 1
+        if first_bar < 0:
+            first_bar = bar_index
+    if not mismatches:
+        return None
+    return Divergence(script, name, mismatches, first_bar, max_diff,
+                      expected[first_bar] if first_bar < len(expected) else None,
+                      actual[first_bar] if first_bar < len(actual) else None)
+
+
+def check(corpus: Iterable[tuple[Path, dict[str, Any]]] = CORPUS, *, rel_tol: float = 1e-9, abs_tol: float = 1e-9,
+          max_slowdown: float = 0.1, rounds: int = 3, strict_timing: bool = False) -> RegressionReport:
+    """
+    Run the corpus with the installed pynecore and compare it to the golden outputs, and to the local
+    timing baseline if there is one
+
+    :param corpus: (script path, inputs) of the scripts
+    :param rel_tol: Relative tolerance of the float outputs
+    :param abs_tol: Absolute tolerance of the float outputs
+    :param max_slowdown: Flag scripts slower than the baseline by more than this ratio
+    :param rounds: Timing rounds, the best one counts, 0 skips the timing
+    :param strict_timing: Slowdowns fail the check, else they are only reported
+    """
+    candles = load_candles(ohlcv_path)
+    report = RegressionReport(_pynecore_version(), '', strict_timing=strict_timing)
+    timing = None
+    if rounds:
+        if timing_path.exists():
+            with open(timing_path) as f:
+                timing = json.load(f)
+            # The baseline adjusted to the current speed of the machine
+            speed = _calibrate() / timing['calibration']
+        else:
+            report.timing_recorded = False
+    for script_path, inputs in corpus:
+        script = script_path.stem
+        golden_path = _golden_path(script_path)
+        if not golden_path.exists():
+            report.missing.append(script)
+            continue
+        with gzip.open(golden_path, 'rt') as f:
+            golden = json.load(f)
+        report.golden_version = golden['pynecore_version']
+
+        columns = run_script(script_path, golden['inputs'], candles)
+        for name in sorted(set(golden['columns']) | set(columns)):
+            divergence = _compare(script, name, golden['columns'].get(name, []), columns.get(name, []),
+                                  rel_tol, abs_tol)
+            if divergence:
+                report.divergences.append(divergence)
+
+        if timing is None or script not in timing['bars_per_s']:
+            continue
+        baseline = timing['bars_per_s'][script] * speed
+        bars_per_s = time_script(script_path, golden['inputs'], candles, rounds)
+        report.timings[script] = (baseline, bars_per_s)
+        if bars_per_s < baseline * (1.0 - max_slowdown):
+            report.slowdowns.append(Slowdown(script, baseline, bars_per_s))
+    return report
+
+
+if __name__ == '__main__':
+    import argparse
+    import sys
+
+    os.environ.setdefault('PYNE_SAVE_SCRIPT_TOML', '0')
+
+    parser = argparse.ArgumentParser(description="Golden output and timing regression check of the scripts")
+    parser.add_argument('command', choices=('record', 'record-timing', 'check'),
+                        help="record: store golden outputs, record-timing: store the timing baseline of this "
+                             "machine, check: compare to them")
+    parser.add_argument('--rel-tol', type=float, default=1e-9)
+    parser.add_argument('--abs-tol', type=float, default=1e-9)
+    parser.add_argument('--max-slowdown', type=float, default=0.1, help="e.g. 0.1 flags 10%% slowdowns")
+    parser.add_argument('--rounds', type=int, default=3, help="timing rounds, 0 skips the timing")
+    parser.add_argument('--strict-timing', action='store_true', help="slowdowns fail the check")
+    args = parser.parse_args()
+
+    if args.command == 'record':
+        record()
+    elif args.command == 'record-timing':
+        record_timing(rounds=args.rounds)
+    else:
+        result = check(rel_tol=args.rel_tol, abs_tol=args.abs_tol, max_slowdown=args.max_slowdown,
+                       rounds=args.rounds, strict_timing=args.strict_timing)
+        print(result.summary())
+        sys.exit(0 if result.ok else 1)
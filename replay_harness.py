@@ -0,0 +1,357 @@
+from typing import Any, Iterator, TYPE_CHECKING
+from pathlib import Path
+from dataclasses import dataclass, field
+from array import array
+from queue import Queue, Full
+from time import perf_counter_ns
+import threading
+import random
+import time
+import os
+
+if TYPE_CHECKING:
+    from pynecore.types.ohlcv import OHLCV
+    from candle_cursor import CandleCursor
+
+__all__ = [
+    'PATTERNS',
+    'ReplayResult',
+    'CapacityReport',
+    'replay',
+    'capacity',
+]
+
+ohlcv_path = Path("./data/ccxt_BYBIT_BTC_USDT_60.ohlcv")
+script_path = Path("./scripts/vstop.py")
+script_inputs = {"length": 30, "src": "close", "factor": 2.0}
+
+# Arrival patterns of the candles of a bar period:
+#   aligned: every symbol at the close of the bar, one burst of all the symbols, like an exchange closing the bars
+#   staggered: evenly spread over the period, the best case
+#   random: uniformly random in the period, so bursts and gaps by chance
+PATTERNS = ('aligned', 'staggered', 'random')
+
+
+def _rank(ordered: list[int], q: float) -> int:
+    return ordered[min(len(ordered) - 1, max(0, round(q / 100.0 * len(ordered)) - 1))]
+
+
+@dataclass(slots=True)
+class ReplayResult:
+    """
+    Result of a replay at one load
+    """
+    symbols: int
+    speed: float
+    pattern: str
+    sent: int
+    processed: int
+    dropped: int
+    # Wall time of the replay, and the time the runner was busy with the candles, in seconds
+    elapsed: float
+    busy: float
+    # End-to-end latencies of the candles after the warmup (from the scheduled arrival until the scripts
+    # are done), and the depth of the queue when the runner took a candle
+    latencies_ns: array = field(repr=False)
+    queue_depths: array = field(repr=False)
+
+    def percentile(self, q: float) -> float:
+        """
+        Latency percentile in seconds, nearest rank
+
+        :param q: Percentile, e.g. 99
+        """
+        if not self.latencies_ns:
+            return float('nan')
+        return _rank(sorted(self.latencies_ns), q) / 1e9
+
+    @property
+    def p99(self) -> float:
+        return self.percentile(99)
+
+    @property
+    def max_queue(self) -> int:
+        return max(self.queue_depths, default=0)
+
+    @property
+    def utilization(self) -> float:
+        """
+        Busy time of the runner per wall time
+        """
+        return self.busy / self.elapsed if self.elapsed else 0.0
+
+    def ok(self, target_p99: float) -> bool:
+        """
+        The runner kept up: nothing dropped and the p99 latency within the target
+        """
+        return not self.dropped and self.processed == self.sent and self.p99 <= target_p99
+
+    def summary(self) -> str:
+        ordered = sorted(self.latencies_ns)
+        mean_queue = sum(self.queue_depths) / len(self.queue_depths) if self.queue_depths else 0.0
+        if ordered:
+            latencies = ', '.join(f"p{q:g} {_rank(ordered, q) / 1e6:.2f}" for q in (50, 90, 99, 99.9))
+            latencies += f", max {ordered[-1] / 1e6:.2f} ms"
+        else:
+            latencies = "no candles"
+        return (f"{self.symbols} symbols, speed x{self.speed:g}, {self.pattern}: {self.processed}/{self.sent} "
+                f"candles, {self.dropped} dropped, latency {latencies}, queue max {self.max_queue} "
+                f"mean {mean_queue:.1f}, runner busy {self.utilization:.0%}")
+
+
+@dataclass(slots=True)
+class CapacityReport:
+    """
+    Capacity of a runner core: the most symbols it keeps up with at the target p99 latency
+    """
+    script: str
+    target_p99: float
+    speed: float
+    pattern: str
+    bar_period: int
+    repeats: int = 1
+    max_symbols: int = 0
+    # Every load passed up to the limit of the search, the capacity may be higher
+    limit_reached: bool = False
+    results: list[ReplayResult] = field(default_factory=list)
+
+    def summary(self) -> str:
+        lines = [f"Capacity of {self.script}: bars of {self.bar_period} s replayed at x{self.speed:g} "
+                 f"({self.speed / self.bar_period:g} candles/s per symbol), {self.pattern} arrivals, "
+                 f"target p99 {self.target_p99 * 1e3:g} ms, median of {self.repeats} replays per load", ""]
+        for result in sorted(self.results, key=lambda r: r.symbols):
+            verdict = "ok" if result.ok(self.target_p99) else "FAIL"
+            lines.append(f"    {verdict:>4}  {result.summary()}")
+        lines.append("")
+        if self.max_symbols:
+            rate = self.max_symbols * self.speed / self.bar_period
+            if self.limit_reached:
+                lines.append(f"at least {self.max_symbols} symbols per core ({rate:.0f} candles/s, the search limit) "
+                             f"at p99 <= {self.target_p99 * 1e3:g} ms, raise max_symbols to find the capacity")
+            else:
+                lines.append(f"max {self.max_symbols} symbols per core ({rate:.0f} candles/s) at p99 <= "
+                             f"{self.target_p99 * 1e3:g} ms")
+        else:
+            lines.append(f"no load met p99 <= {self.target_p99 * 1e3:g} ms")
+        return '\n'.join(lines)
+
+
+def _load_history(path: Path) -> 'CandleCursor':
+    from candle_cursor import CandleCursor
+
+    history = CandleCursor.from_ohlcv_file(path)
+    if len(history) < 2:
+        raise ValueError(f"Not enough candles in {path}!")
+    return history
+
+
+def _schedule(history: 'CandleCursor', symbols: list[str], bars: int, interval_ns: int, pattern: str,
+              rng: random.Random) -> Iterator[tuple[int, str, 'OHLCV']]:
+    """
+    Arrivals of the synthetic symbols in time order
+
+    Every symbol replays the history from its own offset, so the symbols don't compute the same values,
+    the timestamps are continuous from the start of the history.
+
+    :return: Iterator of (scheduled time from the start in ns, symbol, candle)
+    """
+    size = len(history)
+    start = history.timestamps[0]
+    period = history.timestamps[1] - start
+    # A stride coprime to most sizes spreads the offsets over the history
+    offsets = [i * 7919 % size for i in range(len(symbols))]
+    spacing = interval_ns / len(symbols)
+    for bar in range(bars):
+        bar_ns = bar * interval_ns
+        if pattern == 'aligned':
+            times = [bar_ns] * len(symbols)
+        elif pattern == 'staggered':
+            times = [bar_ns + round(i * spacing) for i in range(len(symbols))]
+        else:
+            times = [bar_ns + rng.randrange(interval_ns) for _ in symbols]
+        timestamp = start + bar * period
+        arrivals = sorted(zip(times, range(len(symbols))))
+        for due_ns, i in arrivals:
+            candle = history.ohlcv((offsets[i] + bar) % size)
+            yield due_ns, symbols[i], candle._replace(timestamp=timestamp)
+
+
+def replay(symbols: int, speed: float, pattern: str = 'aligned', *, bars: int = 20, warmup: int = 2,
+           max_queue: int = 10_000, script: Path = script_path, inputs: dict[str, Any] = script_inputs,
+           history: 'Path | CandleCursor' = ohlcv_path, seed: int = 1) -> ReplayResult:
+    """
+    Replay a history as live candles of many synthetic symbols into a `MultiFeedChartRunner`
+
+    A feeder thread puts the candles into a bounded queue at their scheduled times, the runner takes them
+    in the calling thread. Candles not fitting in the queue are dropped, like a live source overrunning
+    its consumer. The feeder shares the GIL with the runner, as the network threads of a live runner would,
+    and its timer slack (the oversleep of `time.sleep`, ~0.1 ms) is part of the latencies.
+
+    :param symbols: Number of symbols, every one runs its own instance of the script
+    :param speed: Speed multiplier of the history, e.g. 3600 replays 1 hour bars at 1 candle/s per symbol
+    :param pattern: Arrival pattern of the candles of a bar period, see `PATTERNS`
+    :param bars: Bars per symbol
+    :param warmup: Bars per symbol excluded from the latencies (the first calls of the scripts are slower)
+    :param max_queue: Capacity of the queue
+    :param script: Path to the script
+    :param inputs: Inputs of the script
+    :param history: The `.ohlcv` file to replay, or its candles
+    :param seed: Seed of the random pattern
+    :raises ValueError: If the pattern is unknown
+    """
+    from candle_cursor import CandleCursor
+    from multi_feed import MultiFeedChartRunner
+
+    if pattern not in PATTERNS:
+        raise ValueError(f"Unknown pattern: {pattern}, use one of {', '.join(PATTERNS)}")
+    if not isinstance(history, CandleCursor):
+        history = _load_history(history)
+
+    names = [f"SYN{i:05d}" for i in range(symbols)]
+    # The script instances are imported once per symbol, and reused by later replays
+    chart = MultiFeedChartRunner(dict.fromkeys(names, ()), [(name, script, inputs) for name in names])
+    interval_ns = round((history.timestamps[1] - history.timestamps[0]) / speed * 1e9)
+    # The candles are made in advance, so the feeder only sleeps and puts
+    schedule = list(_schedule(history, names, bars, interval_ns, pattern, random.Random(seed)))
+
+    queue: Queue[tuple[str, 'OHLCV', int] | None] = Queue(max_queue)
+    dropped = 0
+    started_ns = 0
+    ready = threading.Event()
+
+    def feed():
+        nonlocal dropped
+        put = queue.put_nowait
+        ready.wait()
+        for due_ns, symbol, candle in schedule:
+            due_ns += started_ns
+            wait_ns = due_ns - perf_counter_ns()
+            if wait_ns > 0:
+                time.sleep(wait_ns / 1e9)
+            try:
+                put((symbol, candle, due_ns))
+            except Full:
+                dropped += 1
+        queue.put(None)
+
+    latencies = array('q')
+    depths = array('I')
+    skip = warmup * symbols
+    busy_ns = 0
+    due_ns = taken_ns = 0
+
+    def arrivals() -> Iterator[tuple[str, 'OHLCV']]:
+        nonlocal due_ns, taken_ns
+        get = queue.get
+        qsize = queue.qsize
+        while True:
+            item = get()
+            if item is None:
+                return
+            taken_ns = perf_counter_ns()
+            depths.append(qsize())
+            symbol, candle, due_ns = item
+            yield symbol, candle
+
+    feeder = threading.Thread(target=feed, name="replay-feeder", daemon=True)
+    feeder.start()
+    processed = 0
+    started_ns = perf_counter_ns()
+    ready.set()
+    for _ in chart.run_arrivals(arrivals()):
+        done_ns = perf_counter_ns()
+        busy_ns += done_ns - taken_ns
+        processed += 1
+        if processed > skip:
+            latencies.append(done_ns - due_ns)
+    elapsed_ns = perf_counter_ns() - started_ns
+    feeder.join()
+
+    return ReplayResult(symbols, speed, pattern, len(schedule), processed, dropped, elapsed_ns / 1e9,
+                        busy_ns / 1e9, latencies, depths)
+
+
+def capacity(target_p99: float, speed: float, pattern: str = 'aligned', *, start: int = 8,
+             max_symbols: int = 4096, resolution: float = 0.1, repeats: int = 3, **kwargs) -> CapacityReport:
+    """
+    Find the most symbols one runner core keeps up with at the target p99 latency
+
+    The symbols are doubled until a load fails (drops, or p99 over the target), then the range is
+    bisected. The runner runs in one thread, so the result is per core, run a runner per core to scale.
+    Every load is replayed once to warm up (the imports of the script instances, the caches), then
+    `repeats` times, and the median replay passes or fails it, so one noisy replay doesn't move the result.
+
+    :param target_p99: Target p99 latency in seconds
+    :param speed: Speed multiplier of the history
+    :param pattern: Arrival pattern, see `PATTERNS`
+    :param start: Symbols of the first replay
+    :param max_symbols: Upper limit of the search, `limit_reached` of the report tells if it was passed too
+    :param resolution: Stop the bisection when the range is within this ratio of the result
+    :param repeats: Measured replays per load
+    :param kwargs: Other arguments of `replay`
+    """
+    from candle_cursor import CandleCursor
+
+    # Loaded once for all the replays
+    history = kwargs.get('history', ohlcv_path)
+    if not isinstance(history, CandleCursor):
+        kwargs['history'] = history = _load_history(history)
+    report = CapacityReport(Path(kwargs.get('script', script_path)).stem, target_p99, speed, pattern,
+                            history.timestamps[1] - history.timestamps[0], max(1, repeats))
+
+    def ok(symbols: int) -> bool:
+        replay(symbols, speed, pattern, **kwargs)
+        results = [replay(symbols, speed, pattern, **kwargs) for _ in range(report.repeats)]
+        # A replay with drops is worse than any which kept up
+        results.sort(key=lambda r: (bool(r.dropped) or r.processed != r.sent, r.p99))
+        result = results[len(results) // 2]
+        report.results.append(result)
+        return result.ok(target_p99)
+
+    good, bad = 0, 0
+    symbols = start
+    while symbols <= max_symbols:
+        if not ok(symbols):
+            bad = symbols
+            break
+        good = symbols
+        symbols *= 2
+    # The limit itself, if the doubling stepped over it
+    if not bad and good < max_symbols:
+        if ok(max_symbols):
+            good = max_symbols
+        else:
+            bad = max_symbols
+    report.limit_reached = not bad
+    if bad:
+        while bad - good > max(1, good * resolution):
+            symbols = (good + bad) // 2
+            if ok(symbols):
+                good = symbols
+            else:
+                bad = symbols
+    report.max_symbols = good
+    return report
+
+
+if __name__ == '__main__':
+    import argparse
+
+    os.environ.setdefault('PYNE_SAVE_SCRIPT_TOML', '0')
+
+    parser = argparse.ArgumentParser(description="Paced live replay of many synthetic symbols into a runner")
+    parser.add_argument('--symbols', type=int, help="replay this many symbols, else search the capacity")
+    parser.add_argument('--speed', type=float, default=3600.0, help="speed multiplier of the history")
+    parser.add_argument('--pattern', choices=PATTERNS, default='aligned')
+    parser.add_argument('--target-p99', type=float, default=50.0, help="target p99 latency in ms")
+    parser.add_argument('--bars', type=int, default=20, help="bars per symbol")
+    parser.add_argument('--max-symbols', type=int, default=4096)
+    parser.add_argument('--repeats', type=int, default=3, help="measured replays per load of the capacity search")
+    parser.add_argument('--history', type=Path, default=ohlcv_path)
+    args = parser.parse_args()
+
+    if args.symbols:
+        print(replay(args.symbols, args.speed, args.pattern, bars=args.bars, history=args.history).summary())
+    else:
+        print(capacity(args.target_p99 / 1e3, args.speed, args.pattern, bars=args.bars,
+                       max_symbols=args.max_symbols, repeats=args.repeats, history=args.history).summary())
@@ -0,0 +1,429 @@
+from typing import Any, TYPE_CHECKING
+from pathlib import Path
+from dataclasses import dataclass, field, asdict
+from collections import OrderedDict
+from concurrent.futures import Future
+from bisect import bisect_left, bisect_right
+import itertools
+import threading
+import queue
+import time
+import json
+
+from run_helpers import load_candles
+
+if TYPE_CHECKING:
+    from multiprocessing.connection import Connection
+    from pynecore.types.ohlcv import OHLCV
+
+__all__ = [
+    'RunRequest',
+    'RunDaemon',
+    'serve_http',
+    'serve_unix',
+    'request_unix',
+]
+
+
+@dataclass(slots=True)
+class RunRequest:
+    """
+    A single run request
+
+    :param script: Path to the pyne script
+    :param symbol: Symbol name, it must be registered in the daemon
+    :param inputs: Inputs to pass to pyne script: {"src": "close", "length": 20,}
+    :param time_from: First candle timestamp to run on (inclusive), None means from the start
+    :param time_to: Last candle timestamp to run on (inclusive), None means until the end
+    :param priority: Lower value is served first
+    """
+    script: str
+    symbol: str
+    inputs: dict[str, Any] = field(default_factory=dict)
+    time_from: int | None = None
+    time_to: int | None = None
+    priority: int = 0
+
+
+# noinspection PyProtectedMember
+def _worker_main(conn: 'Connection', symbols: dict[str, str], data_cache_size: int):
+    """
+    Worker process loop: keeps imported scripts and hot data files resident and runs requests
+    received on the pipe until it gets None
+    """
+    from pynecore import lib
+    from pynecore.types.na import NA
+    from pynecore.types import script_type
+    from pynecore.lib.strategy import Position
+    from pynecore.core.syminfo import SymInfo
+    from pynecore.core.script_runner import _set_lib_syminfo_properties
+    from custom_script_runner_preload_script import fork_runner
+    from run_helpers import import_fresh
+
+    # data path -> (timestamps, candles), least recently used first
+    data_cache: OrderedDict[str, tuple[list[int], list['OHLCV']]] = OrderedDict()
+    # data path -> symbol info from the toml next to the data file, None if there is none
+    syminfos: dict[str, SymInfo | None] = {}
+
+    while True:
+        request: dict[str, Any] | None = conn.recv()
+        if request is None:
+            break
+
+        try:
+            script_path = str(Path(request['script']).resolve())
+            # The state of the previous run must not leak into this one
+            script_module = import_fresh(script_path)
+            script_obj = script_module.main.script
+
+            data_path = symbols[request['symbol']]
+            try:
+                syminfo = syminfos[data_path]
+            except KeyError:
+                toml_path = Path(data_path).with_suffix('.toml')
+                syminfo = syminfos[data_path] = SymInfo.load_toml(toml_path) if toml_path.exists() else None
+            if syminfo is not None:
+                _set_lib_syminfo_properties(syminfo, lib)
+            if script_obj.script_type == script_type.strategy:
+                if syminfo is None:
+                    raise ValueError(f"Strategies need the symbol info of '{request['symbol']}', "
+                                     f"save it to '{Path(data_path).with_suffix('.toml')}'!")
+                script_obj.position = Position()
+
+            try:
+                timestamps, candles = data_cache[data_path]
+                data_cache.move_to_end(data_path)
+            except KeyError:
+                candles = load_candles(Path(data_path))
+                timestamps = [candle.timestamp for candle in candles]
+                data_cache[data_path] = timestamps, candles
+                if len(data_cache) > data_cache_size:
+                    data_cache.popitem(last=False)
+
+            time_from, time_to = request['time_from'], request['time_to']
+            lo = 0 if time_from is None else bisect_left(timestamps, time_from)
+            hi = len(candles) if time_to is None else bisect_right(timestamps, time_to)
+
+            rows: list[dict[str, Any]] = []
+            for res in fork_runner(script_module, candles[lo:hi], request['inputs']):
+                row = {'timestamp': res[0].timestamp}
+                for key, value in res[1].items():
+                    row[key] = None if isinstance(value, NA) else value
+                rows.append(row)
+
+            conn.send(('ok', rows))
+        except Exception as e:  # The worker must survive broken scripts and bad requests
+            conn.send(('error', f"{type(e).__name__}: {e}"))
+
+
+class RunDaemon:
+    """
+    Persistent local run service with a pool of warm worker processes
+
+    Every worker process keeps the scripts it has imported and the most recently used data files
+    in memory, so a request only costs the script execution itself.
+    """
+
+    __slots__ = ('symbols', 'workers', 'data_cache_size', '_queue', '_counter', '_processes',
+                 '_threads', '_lock', '_in_flight', '_served', '_failed', '_respawned', '_service_times',
+                 '_wait_times')
+
+    def __init__(self, symbols: dict[str, Path], *, workers: int | None = None, data_cache_size: int = 8):
+        """
+        Initialize the run daemon
+
+        :param symbols: Symbol name -> data file (`.ohlcv` or `.csv`) mapping, the symbol info is read
+                        from the `.toml` next to the data file, like the pyne runner does,
+                        strategies need it
+        :param workers: Number of worker processes, default is the number of CPUs
+        :param data_cache_size: Number of data files every worker keeps in memory
+        """
+        import os
+
+        self.symbols = {symbol: str(Path(path).resolve()) for symbol, path in symbols.items()}
+        self.workers = workers or os.cpu_count() or 1
+        self.data_cache_size = data_cache_size
+
+        self._queue: queue.PriorityQueue = queue.PriorityQueue()
+        self._counter = itertools.count()  # FIFO order between requests of the same priority
+        self._processes = []
+        self._threads: list[threading.Thread] = []
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._served = 0
+        self._failed = 0
+        self._respawned = 0
+        # Recent service and queue wait times in seconds, for the stats
+        self._service_times: list[float] = []
+        self._wait_times: list[float] = []
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _spawn(self, i: int) -> 'Connection':
+        """
+        Start the worker process of a slot
+
+        :return: The parent end of its pipe
+        """
+        import multiprocessing
+
+        ctx = multiprocessing.get_context('spawn')
+        parent_conn, child_conn = ctx.Pipe()
+        process = ctx.Process(target=_worker_main, args=(child_conn, self.symbols, self.data_cache_size),
+                              name=f"pyne-run-worker-{i}", daemon=True)
+        process.start()
+        child_conn.close()
+        if i < len(self._processes):
+            self._processes[i] = process
+        else:
+            self._processes.append(process)
+        return parent_conn
+
+    def _respawn(self, i: int, conn: 'Connection') -> 'Connection':
+        """
+        Replace a dead worker process, so its dispatcher doesn't fail every request it takes
+        """
+        conn.close()
+        process = self._processes[i]
+        process.join(timeout=1.0)
+        if process.is_alive():
+            process.kill()
+            process.join()
+        with self._lock:
+            self._respawned += 1
+        return self._spawn(i)
+
+    def start(self) -> 'RunDaemon':
+        """
+        Start the worker processes and their dispatcher threads
+        """
+        for i in range(self.workers):
+            conn = self._spawn(i)
+            thread = threading.Thread(target=self._dispatch, args=(i, conn),
+                                      name=f"pyne-run-dispatch-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def close(self):
+        """
+        Stop the workers, requests already in the queue are served first
+        """
+        for _ in self._threads:
+            self._queue.put((float('inf'), next(self._counter), None, None, 0.0))
+        for thread in self._threads:
+            thread.join()
+        for process in self._processes:
+            process.join()
+        self._threads.clear()
+        self._processes.clear()
+
+    def submit(self, request: RunRequest) -> Future:
+        """
+        Queue a run request
+
+        :param request: The request to run
+        :return: Future of the list of rows: [{"timestamp": ..., <plot key>: <value>, ...}, ...]
+        :raises KeyError: If the symbol is not registered
+        """
+        if request.symbol not in self.symbols:
+            raise KeyError(f"Unknown symbol: {request.symbol}")
+        future = Future()
+        self._queue.put((request.priority, next(self._counter), asdict(request), future, time.perf_counter()))
+        return future
+
+    def run(self, request: RunRequest) -> list[dict[str, Any]]:
+        """
+        Run a request and wait for its result
+
+        :param request: The request to run
+        :return: List of rows: [{"timestamp": ..., <plot key>: <value>, ...}, ...]
+        :raises RuntimeError: If the script failed
+        """
+        return self.submit(request).result()
+
+    def _dispatch(self, i: int, conn: 'Connection'):
+        """
+        Feed one worker process from the shared priority queue, a dead worker is replaced
+        """
+        while True:
+            _, _, request, future, queued_at = self._queue.get()
+            if request is None:
+                try:
+                    conn.send(None)
+                except OSError:  # Already dead
+                    pass
+                conn.close()
+                return
+            if not future.set_running_or_notify_cancel():
+                continue
+            # Died while idle, e.g. killed, the request didn't run yet
+            if not self._processes[i].is_alive():
+                conn = self._respawn(i, conn)
+
+            started_at = time.perf_counter()
+            with self._lock:
+                self._in_flight += 1
+            try:
+                conn.send(request)
+                status, result = conn.recv()
+            except (EOFError, OSError) as e:
+                # The request may have killed it, so it is not retried
+                status, result = 'error', f"Worker died: {type(e).__name__}: {e}"
+                conn = self._respawn(i, conn)
+            finished_at = time.perf_counter()
+
+            with self._lock:
+                self._in_flight -= 1
+                self._wait_times.append(started_at - queued_at)
+                self._service_times.append(finished_at - started_at)
+                # Keep only the recent samples
+                if len(self._service_times) > 10000:
+                    del self._wait_times[:5000]
+                    del self._service_times[:5000]
+                if status == 'ok':
+                    self._served += 1
+                else:
+                    self._failed += 1
+
+            if status == 'ok':
+                future.set_result(result)
+            else:
+                future.set_exception(RuntimeError(result))
+
+    def stats(self) -> dict[str, Any]:
+        """
+        Queue depth and service time statistics, times are in milliseconds
+        """
+        with self._lock:
+            service_times = sorted(self._service_times)
+            wait_times = sorted(self._wait_times)
+            res = {
+                'workers': self.workers,
+                'queue_depth': self._queue.qsize(),
+                'in_flight': self._in_flight,
+                'served': self._served,
+                'failed': self._failed,
+                'respawned': self._respawned,
+            }
+
+        for name, samples in (('service', service_times), ('wait', wait_times)):
+            if samples:
+                res[f'{name}_ms_mean'] = 1000.0 * sum(samples) / len(samples)
+                res[f'{name}_ms_p50'] = 1000.0 * samples[len(samples) // 2]
+                res[f'{name}_ms_p95'] = 1000.0 * samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+            else:
+                res[f'{name}_ms_mean'] = res[f'{name}_ms_p50'] = res[f'{name}_ms_p95'] = None
+        return res
+
+
+def _handle_message(daemon: RunDaemon, message: Any) -> dict[str, Any]:
+    """
+    Handle a decoded JSON message, common for all transports
+    """
+    if not isinstance(message, dict):
+        return {'status': 'error', 'error': "The message must be a JSON object"}
+    if message.get('op') == 'stats':
+        return {'status': 'ok', 'stats': daemon.stats()}
+    try:
+        rows = daemon.run(RunRequest(**message))
+    except (TypeError, KeyError, RuntimeError) as e:
+        return {'status': 'error', 'error': str(e)}
+    return {'status': 'ok', 'rows': rows}
+
+
+def serve_http(daemon: RunDaemon, host: str = '127.0.0.1', port: int = 8765):
+    """
+    Serve the daemon over localhost HTTP, it blocks until interrupted
+
+    `POST /run` with a JSON `RunRequest` body, `GET /stats` for the queue statistics.
+
+    :param daemon: Started run daemon
+    :param host: Host to bind to, keep it on localhost, there is no authentication
+    :param port: Port to listen on
+    """
+    from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+    class Handler(BaseHTTPRequestHandler):
+        def _reply(self, code: int, body: dict[str, Any]):
+            data = json.dumps(body).encode()
+            self.send_response(code)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        # noinspection PyPep8Naming
+        def do_GET(self):
+            if self.path == '/stats':
+                self._reply(200, _handle_message(daemon, {'op': 'stats'}))
+            else:
+                self._reply(404, {'status': 'error', 'error': 'Not found'})
+
+        # noinspection PyPep8Naming
+        def do_POST(self):
+            if self.path != '/run':
+                self._reply(404, {'status': 'error', 'error': 'Not found'})
+                return
+            try:
+                message = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+            except ValueError as e:
+                self._reply(400, {'status': 'error', 'error': str(e)})
+                return
+            res = _handle_message(daemon, message)
+            self._reply(200 if res['status'] == 'ok' else 400, res)
+
+        def log_message(self, *args):
+            pass
+
+    with ThreadingHTTPServer((host, port), Handler) as server:
+        server.serve_forever()
+
+
+def serve_unix(daemon: RunDaemon, socket_path: Path):
+    """
+    Serve the daemon over a Unix socket, it blocks until interrupted
+
+    The protocol is newline delimited JSON: one `RunRequest` (or `{"op": "stats"}`) per line,
+    one response per line.
+
+    :param daemon: Started run daemon
+    :param socket_path: Path of the socket file, it is replaced if exists
+    """
+    import socketserver
+
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            for line in self.rfile:
+                try:
+                    res = _handle_message(daemon, json.loads(line))
+                except ValueError as e:
+                    res = {'status': 'error', 'error': str(e)}
+                self.wfile.write(json.dumps(res).encode() + b'\n')
+
+    socket_path.unlink(missing_ok=True)
+    with socketserver.ThreadingUnixStreamServer(str(socket_path), Handler) as server:
+        server.serve_forever()
+
+
+def request_unix(socket_path: Path, message: dict[str, Any]) -> dict[str, Any]:
+    """
+    Send one message to a daemon served by `serve_unix` and return its response
+
+    :param socket_path: Path of the socket file
+    :param message: `RunRequest` fields or `{"op": "stats"}`
+    :return: The decoded response
+    """
+    import socket
+
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(str(socket_path))
+        with sock.makefile('rwb') as f:
+            f.write(json.dumps(message).encode() + b'\n')
+            f.flush()
+            return json.loads(f.readline())
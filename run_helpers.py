@@ -0,0 +1,74 @@
+from typing import Any, TYPE_CHECKING
+from types import ModuleType
+from pathlib import Path
+from copy import deepcopy
+import math
+
+if TYPE_CHECKING:
+    from pynecore.types.ohlcv import OHLCV
+
+__all__ = [
+    'load_candles',
+    'plain_value',
+    'import_fresh',
+]
+
+
+def load_candles(data_path: Path) -> list['OHLCV']:
+    """
+    Load all candles of a data file into memory, `.ohlcv` and `.csv` files are supported
+    """
+    from pynecore.types.ohlcv import OHLCV
+
+    if data_path.suffix == '.csv':
+        import csv
+        with open(data_path, mode='r') as csvfile:
+            return [OHLCV(
+                timestamp=int(row['timestamp']),
+                open=float(row['open']),
+                high=float(row['high']),
+                low=float(row['low']),
+                close=float(row['close']),
+                volume=float(row['volume']),
+                extra_fields=None,
+            ) for row in csv.DictReader(csvfile)]
+
+    from pynecore.core.ohlcv_file import OHLCVReader
+    with OHLCVReader(str(data_path)) as reader:
+        return [candle for candle in reader if candle.volume >= 0]  # skip gaps, like `read_from` does
+
+
+def plain_value(value: Any) -> Any:
+    """
+    JSON compatible value of a script output, NA and NaN are None
+    """
+    if value is None or isinstance(value, (bool, int, str)):
+        return value
+    if isinstance(value, float):
+        return None if math.isnan(value) else value
+    from pynecore.types.na import NA
+    if isinstance(value, NA):
+        return None
+    return str(value)
+
+
+# Scripts imported by this process, and their module state before any run
+_modules: dict[str, tuple[ModuleType, dict[str, Any]]] = {}
+
+
+def import_fresh(script_path: str) -> ModuleType:
+    """
+    Import a script, or restore its module state if it has run already in this process,
+    `main` is not isolated, so its persistent and series globals would leak into the next run
+    """
+    from custom_script_runner_preload_script import import_script
+
+    try:
+        module, initial_state = _modules[script_path]
+        module.__dict__.update(deepcopy(initial_state))
+    except KeyError:
+        module = import_script(Path(script_path))
+        initial_state = {key: deepcopy(value) for key, value in module.__dict__.items()
+                         if key.startswith(('__persistent_', '__series_')) and not key.endswith('_vars__')}
+        _modules[script_path] = module, initial_state
+    return module
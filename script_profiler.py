@@ -0,0 +1,360 @@
+from dataclasses import dataclass
+from pathlib import Path
+from time import perf_counter_ns
+from types import FrameType
+import linecache
+import os
+import time
+import threading
+import sys
+
+__all__ = [
+    'LineStat',
+    'CallSiteStat',
+    'ScriptProfiler',
+]
+
+
+@dataclass(slots=True)
+class LineStat:
+    """
+    Time spent on a script line
+
+    :param script_id: The script
+    :param lineno: Line number in the script source
+    :param hits: Calls of the script function which executed the line, so loop iterations count once
+                 (trace mode), or samples on the line (sample mode)
+    :param total_ns: Time on the line, including the calls made from it
+    :param self_ns: Time on the line, without the library calls and script functions called from it
+    """
+    script_id: str
+    lineno: int
+    hits: int = 0
+    total_ns: int = 0
+    self_ns: int = 0
+
+
+@dataclass(slots=True)
+class CallSiteStat:
+    """
+    Time spent in a library call (e.g. `ta.atr`) made from a script line
+
+    :param script_id: The script
+    :param lineno: Line number of the call in the script source
+    :param callee: The called function, e.g. `lib.ta.atr`
+    :param calls: Number of calls (trace mode), or samples in the call (sample mode)
+    :param total_ns: Time in the call, including everything it called
+    """
+    script_id: str
+    lineno: int
+    callee: str
+    calls: int = 0
+    total_ns: int = 0
+
+
+def _callee_name(frame: FrameType) -> str:
+    module = frame.f_globals.get('__name__', '?')
+    if module.startswith('pynecore.'):
+        module = module[9:]
+    return f"{module}.{frame.f_code.co_qualname}"
+
+
+class ScriptProfiler:
+    """
+    Time profiler of Pyne scripts, it attributes the time to the lines of the script sources and to the
+    library calls made from them (e.g. `ta.atr` on line 24)
+
+    The import hook keeps the file names and the line numbers of the scripts in the transformed code,
+    so the frames of the scripts (and of the functions defined in them) are found by their file.
+    In `trace` mode every line and every library call of the scripts is timed by `sys.settrace`,
+    it's exact, but slows the scripts down several times, use it in development. In `sample` mode
+    a background thread looks at the stack of the runner every `interval` seconds, the cost is
+    a few percent, the times are estimated from the samples. The runner holds the GIL for up to
+    `sys.getswitchinterval()` (5 ms by default), so the sampler can't look more often than that.
+    """
+
+    __slots__ = ('mode', 'interval', 'lines', 'call_sites', 'stacks', 'samples', 'elapsed_ns',
+                 '_paths', '_files', '_started', '_thread', '_running', '_thread_id', '_previous_trace')
+
+    def __init__(self, mode: str = 'sample', interval: float = 0.001):
+        """
+        Initialize the profiler
+
+        :param mode: 'sample' for a low overhead statistical profile, 'trace' for a deterministic one
+        :param interval: Sampling interval in seconds in sample mode
+        :raises ValueError: If the mode is unknown
+        """
+        if mode not in ('sample', 'trace'):
+            raise ValueError(f"Unknown profiling mode: {mode}")
+        self.mode = mode
+        self.interval = interval
+        self.lines: dict[tuple[str, int], LineStat] = {}
+        self.call_sites: dict[tuple[str, int, str], CallSiteStat] = {}
+        # Folded stack -> self time in nanoseconds
+        self.stacks: dict[str, int] = {}
+        # All samples, also the ones outside the scripts
+        self.samples = 0
+        self.elapsed_ns = 0
+        # Resolved script path -> script_id
+        self._paths: dict[str, str] = {}
+        # File name of a code object -> script_id, or None if it is not a script
+        self._files: dict[str, str | None] = {}
+        self._started = 0
+        self._thread: threading.Thread | None = None
+        self._running = False
+        self._thread_id = 0
+        self._previous_trace = None
+
+    def start(self, script_files: dict[str, str]):
+        """
+        Start profiling the current thread, runners call it before the first bar
+
+        :param script_files: script_id -> script file path
+        """
+        self._paths = {str(Path(filename).resolve()): script_id for script_id, filename in script_files.items()}
+        self._files = {}
+        self._started = perf_counter_ns()
+        self._thread_id = threading.get_ident()
+        if self.mode == 'trace':
+            self._previous_trace = sys.gettrace()
+            sys.settrace(self._trace_call)
+        else:
+            self._running = True
+            self._thread = threading.Thread(target=self._sample_loop, name='pyne-profiler', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """
+        Stop profiling, runners call it when the run ends
+        """
+        if self.mode == 'trace':
+            sys.settrace(self._previous_trace)
+            self._previous_trace = None
+        elif self._thread is not None:
+            self._running = False
+            self._thread.join()
+            self._thread = None
+        self.elapsed_ns += perf_counter_ns() - self._started
+
+    #
+    # Trace mode
+    #
+
+    def _line(self, script_id: str, lineno: int) -> LineStat:
+        key = (script_id, lineno)
+        stat = self.lines.get(key)
+        if stat is None:
+            stat = self.lines[key] = LineStat(script_id, lineno)
+        return stat
+
+    def _call_site(self, script_id: str, lineno: int, callee: str) -> CallSiteStat:
+        key = (script_id, lineno, callee)
+        stat = self.call_sites.get(key)
+        if stat is None:
+            stat = self.call_sites[key] = CallSiteStat(script_id, lineno, callee)
+        return stat
+
+    def _script_id(self, filename: str) -> str | None:
+        """
+        The script of a code object by its file name, the code objects have the path the script was imported by
+        """
+        try:
+            return self._files[filename]
+        except KeyError:
+            script_id = self._files[filename] = self._paths.get(os.path.abspath(filename))
+            return script_id
+
+    def _add_stack(self, stack: str, ns: int):
+        self.stacks[stack] = self.stacks.get(stack, 0) + ns
+
+    def _trace_call(self, frame: FrameType, event: str, _):
+        """
+        Global trace function, called on every new frame, only the script frames and the library calls
+        made directly from them get a local trace function
+        """
+        if event != 'call':
+            return None
+        caller = frame.f_back
+        caller_trace = caller.f_trace if caller is not None else None
+        caller_tracer = getattr(caller_trace, '__self__', None)
+        if caller_tracer.__class__ is not _LineTracer:
+            caller_tracer = None
+
+        script_id = self._script_id(frame.f_code.co_filename)
+        if script_id is not None:
+            # A script frame: main, or a function defined in the script
+            name = frame.f_code.co_qualname
+            if caller_tracer is not None:
+                stack = f"{caller_tracer.stack}:{caller_tracer.lineno};{script_id}:{name}"
+            else:
+                stack = f"{script_id}:{name}"
+            return _LineTracer(self, caller_tracer, script_id, stack, frame.f_lineno).trace
+
+        if caller_tracer is not None:
+            # A library call made from a script line, only its return is traced
+            frame.f_trace_lines = False
+            return _CallTracer(self, caller_tracer, _callee_name(frame)).trace
+        return None
+
+    #
+    # Sample mode
+    #
+
+    def _sample_loop(self):
+        interval = self.interval
+        script_id_of = self._script_id
+        thread_id = self._thread_id
+        last = perf_counter_ns()
+        while self._running:
+            time.sleep(interval)
+            frame = sys._current_frames().get(thread_id)
+            # A sample stands for the time since the previous one, the GIL may delay it beyond the interval
+            now = perf_counter_ns()
+            interval_ns = now - last
+            last = now
+            self.samples += 1
+            # Script frames from the innermost, and the frame called by the innermost one
+            script_frames: list[tuple[str, FrameType]] = []
+            callee: FrameType | None = None
+            while frame is not None:
+                script_id = script_id_of(frame.f_code.co_filename)
+                if script_id is not None:
+                    script_frames.append((script_id, frame))
+                elif not script_frames:
+                    callee = frame
+                frame = frame.f_back
+            if not script_frames:
+                continue
+
+            seen: set[tuple[str, int]] = set()
+            for script_id, script_frame in script_frames:
+                key = (script_id, script_frame.f_lineno)
+                if key not in seen:
+                    seen.add(key)
+                    stat = self._line(*key)
+                    stat.hits += 1
+                    stat.total_ns += interval_ns
+            script_id, inner = script_frames[0]
+            stack = ';'.join(f"{sid}:{f.f_code.co_qualname}:{f.f_lineno}" for sid, f in reversed(script_frames))
+            if callee is not None:
+                name = _callee_name(callee)
+                site = self._call_site(script_id, inner.f_lineno, name)
+                site.calls += 1
+                site.total_ns += interval_ns
+                stack += ';' + name
+            else:
+                self.lines[(script_id, inner.f_lineno)].self_ns += interval_ns
+            self._add_stack(stack, interval_ns)
+
+    #
+    # Reports
+    #
+
+    def folded(self) -> str:
+        """
+        The self time of the stacks in the folded format of flamegraph.pl / speedscope, in microseconds
+        """
+        return ''.join(f"{stack} {ns // 1000}\n" for stack, ns in sorted(self.stacks.items()) if ns >= 1000)
+
+    def write_folded(self, path: Path | str):
+        """
+        Write the folded stacks to a file, e.g. `flamegraph.pl profile.folded > profile.svg`
+        """
+        Path(path).write_text(self.folded())
+
+    def report(self, top: int = 20) -> str:
+        """
+        Flat report of the slowest script lines and library calls
+
+        :param top: Number of lines and call sites to show
+        """
+        paths = {script_id: filename for filename, script_id in self._paths.items()}
+        unit = 'samples' if self.mode == 'sample' else 'hits'
+        out = [f"{self.mode} profile of {self.elapsed_ns / 1e9:.2f} s"
+               + (f", {self.samples} samples" if self.mode == 'sample' else ''),
+               f"{'ms':>10} {'self ms':>10} {unit:>10}  line"]
+        for stat in sorted(self.lines.values(), key=lambda s: s.total_ns, reverse=True)[:top]:
+            source = linecache.getline(paths.get(stat.script_id, ''), stat.lineno).strip()
+            out.append(f"{stat.total_ns / 1e6:>10.1f} {stat.self_ns / 1e6:>10.1f} {stat.hits:>10}  "
+                       f"{stat.script_id}:{stat.lineno}  {source}")
+        out.append('')
+        unit = 'samples' if self.mode == 'sample' else 'calls'
+        out.append(f"{'ms':>10} {unit:>10} {'us/call':>10}  call site")
+        for site in sorted(self.call_sites.values(), key=lambda s: s.total_ns, reverse=True)[:top]:
+            per_call = f"{site.total_ns / site.calls / 1e3:>10.2f}" if self.mode == 'trace' else f"{'':>10}"
+            out.append(f"{site.total_ns / 1e6:>10.1f} {site.calls:>10} {per_call}  "
+                       f"{site.script_id}:{site.lineno}  {site.callee}")
+        return '\n'.join(out)
+
+
+class _LineTracer:
+    """
+    Local trace function of a script frame, it times the lines
+    """
+
+    __slots__ = ('profiler', 'caller', 'script_id', 'stack', 'lineno', 'entered', 'started', 'child_ns', 'hit_lines')
+
+    def __init__(self, profiler: ScriptProfiler, caller: '_LineTracer | None', script_id: str, stack: str,
+                 lineno: int):
+        self.profiler = profiler
+        self.caller = caller
+        self.script_id = script_id
+        # Folded stack of the script frames up to this one
+        self.stack = stack
+        self.lineno = lineno
+        self.entered = self.started = perf_counter_ns()
+        # Time of the calls made from the current line
+        self.child_ns = 0
+        # Lines already counted in this call, the statements the Pyne transformers add to a line
+        # (e.g. series updates before a `return`) have its line number too
+        self.hit_lines: set[int] = set()
+
+    def trace(self, frame: FrameType, event: str, _):
+        if event != 'line' and event != 'return':
+            return self.trace
+        now = perf_counter_ns()
+        profiler = self.profiler
+        elapsed = now - self.started
+        self_ns = elapsed - self.child_ns
+        stat = profiler._line(self.script_id, self.lineno)
+        stat.total_ns += elapsed
+        stat.self_ns += self_ns
+        profiler._add_stack(f"{self.stack}:{self.lineno}", self_ns)
+
+        if event == 'line':
+            lineno = self.lineno = frame.f_lineno
+            if lineno not in self.hit_lines:
+                self.hit_lines.add(lineno)
+                profiler._line(self.script_id, lineno).hits += 1
+            self.child_ns = 0
+            # The time of the profiler is not counted for the next line
+            self.started = perf_counter_ns()
+        elif self.caller is not None:
+            # The line of the caller spent this time in a script function
+            self.caller.child_ns += now - self.entered
+        return self.trace
+
+
+class _CallTracer:
+    """
+    Local trace function of a library call made from a script line, it times the call
+    """
+
+    __slots__ = ('profiler', 'caller', 'callee', 'started')
+
+    def __init__(self, profiler: ScriptProfiler, caller: _LineTracer, callee: str):
+        self.profiler = profiler
+        self.caller = caller
+        self.callee = callee
+        self.started = perf_counter_ns()
+
+    def trace(self, _frame: FrameType, event: str, _):
+        if event == 'return':
+            elapsed = perf_counter_ns() - self.started
+            caller = self.caller
+            site = self.profiler._call_site(caller.script_id, caller.lineno, self.callee)
+            site.calls += 1
+            site.total_ns += elapsed
+            caller.child_ns += elapsed
+            self.profiler._add_stack(f"{caller.stack}:{caller.lineno};{self.callee}", elapsed)
+        return self.trace
@@ -0,0 +1,38 @@
+"""
+@pyne
+EMA Crossover Strategy Demo
+
+Goes long when the fast EMA crosses over the slow EMA, and short when it crosses under.
+"""
+from pynecore import Series
+from pynecore.lib import script, input, ta, strategy
+
+
+@script.strategy(
+    title="EMA Crossover Strategy Demo",
+    shorttitle="EMA Cross",
+    overlay=True,
+    initial_capital=10000,
+    default_qty_type=strategy.percent_of_equity,
+    default_qty_value=100,
+)
+def main(
+    src: Series[float] = input.source("close", title="Price Source"),
+    fast_length: int = input.int(12, title="Fast EMA Length"),
+    slow_length: int = input.int(26, title="Slow EMA Length")
+):
+    """
+    EMA crossover strategy, always in the market after the first cross
+    """
+    fast_ema = ta.ema(src, fast_length)
+    slow_ema = ta.ema(src, slow_length)
+
+    if ta.crossover(fast_ema, slow_ema):
+        strategy.entry("long", strategy.long)
+    elif ta.crossunder(fast_ema, slow_ema):
+        strategy.entry("short", strategy.short)
+
+    return {
+        "Fast EMA": fast_ema,
+        "Slow EMA": slow_ema
+    }
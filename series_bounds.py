@@ -0,0 +1,348 @@
+from typing import Any, Iterator, TYPE_CHECKING
+from types import ModuleType
+from pathlib import Path
+from dataclasses import dataclass, field
+from functools import lru_cache
+import inspect
+import ast
+import sys
+
+if TYPE_CHECKING:
+    from pynecore.core.series import SeriesImpl
+
+__all__ = [
+    'Lookback',
+    'SeriesGuard',
+    'SeriesMemoryReport',
+    'analyse_lookback',
+    'apply_series_bounds',
+    'series_memory',
+]
+
+
+@dataclass(slots=True)
+class Lookback:
+    """
+    The maximum history offset a series is indexed with
+
+    :param offset: Largest constant offset, e.g. 1 for `uptrend[1]`
+    :param inputs: Names of `main` parameters (inputs) used as offset, e.g. `src[length]`
+    :param unbounded: The offset could not be determined statically, the series must not be bounded
+    """
+    offset: int = 0
+    inputs: set[str] = field(default_factory=set)
+    unbounded: bool = False
+
+    def resolve(self, inputs: dict[str, Any]) -> int | None:
+        """
+        Calculate the offset with the actual input values
+
+        :param inputs: Input values of the run
+        :return: The maximum offset or None if it cannot be bounded
+        """
+        if self.unbounded:
+            return None
+        offset = self.offset
+        for name in self.inputs:
+            try:
+                offset = max(offset, int(inputs[name]))
+            except (KeyError, TypeError, ValueError):
+                return None
+        return offset
+
+
+class _LookbackVisitor(ast.NodeVisitor):
+    """
+    Collect every `name[index]` access of the original script source by function scope
+    """
+
+    def __init__(self):
+        self.scope: list[str] = []
+        # Parameters of the functions in scope, the first one is `main`, its parameters are the inputs
+        self.params: list[set[str]] = []
+        # (scope qualname, variable name) -> lookback
+        self.lookbacks: dict[tuple[str, str], Lookback] = {}
+
+    def _lookback(self, name: str) -> Lookback:
+        key = ('.'.join(self.scope), name)
+        try:
+            return self.lookbacks[key]
+        except KeyError:
+            lookback = self.lookbacks[key] = Lookback()
+            return lookback
+
+    def _is_input(self, name: str) -> bool:
+        if not self.scope or self.scope[0] != 'main':
+            return False
+        # The innermost function having this parameter must be `main`, not a shadowing nested function
+        for params in reversed(self.params[1:]):
+            if name in params:
+                return False
+        return name in self.params[0]
+
+    def visit_FunctionDef(self, node: ast.FunctionDef):
+        self.scope.append(node.name)
+        self.params.append({arg.arg for arg in node.args.args + node.args.kwonlyargs})
+        self.generic_visit(node)
+        self.params.pop()
+        self.scope.pop()
+
+    def visit_arg(self, node: ast.arg):
+        pass  # Skip annotations like `Series[float]`
+
+    def visit_AnnAssign(self, node: ast.AnnAssign):
+        self.visit(node.target)
+        if node.value:
+            self.visit(node.value)
+
+    def visit_Subscript(self, node: ast.Subscript):
+        if isinstance(node.value, ast.Name) and isinstance(node.ctx, ast.Load):
+            lookback = self._lookback(node.value.id)
+            index = node.slice
+            if isinstance(index, ast.Constant) and isinstance(index.value, (int, float)) \
+                    and not isinstance(index.value, bool):
+                lookback.offset = max(lookback.offset, int(index.value))
+            elif isinstance(index, ast.Name) and self._is_input(index.id):
+                lookback.inputs.add(index.id)
+            else:
+                lookback.unbounded = True
+        self.generic_visit(node)
+
+    def visit_Call(self, node: ast.Call):
+        # `max_bars_back(var, num)` sets the buffer explicitly, we must not touch it
+        func = node.func
+        name = func.attr if isinstance(func, ast.Attribute) else func.id if isinstance(func, ast.Name) else None
+        if name == 'max_bars_back' and node.args and isinstance(node.args[0], ast.Name):
+            self._lookback(node.args[0].id).unbounded = True
+        self.generic_visit(node)
+
+
+def _series_key_scope(key: str) -> tuple[str, str]:
+    """
+    Split a series global name created by the series transformer into scope and variable name:
+    `__series_main·volStop·uptrend__` -> ('main.volStop', 'uptrend')
+    """
+    *scope, name = key[len('__series_'):-2].split('·')
+    return '.'.join(scope), name
+
+
+def _iter_series(globals_: dict[str, Any]) -> Iterator[tuple[str, 'SeriesImpl']]:
+    """
+    Iterate over the series globals of a script module or of an isolated function
+    """
+    from pynecore.core.series import SeriesImpl
+
+    for key, value in globals_.items():
+        if key.startswith('__series_') and isinstance(value, SeriesImpl):
+            yield key, value
+
+
+def analyse_lookback(script_path: Path) -> dict[str, Lookback]:
+    """
+    Analyse the original script source for the history offsets its series are indexed with
+
+    The result is keyed by variable name within function scope, e.g. `main.volStop.uptrend`.
+    Library functions (`ta.*`) keep their own history, their lengths do not count here.
+
+    :param script_path: The path to the script
+    :return: Lookback of every indexed variable
+    """
+    visitor = _LookbackVisitor()
+    visitor.visit(ast.parse(script_path.read_text(), str(script_path)))
+    return {f"{scope}.{name}" if scope else name: lookback
+            for (scope, name), lookback in visitor.lookbacks.items()}
+
+
+def _series_bound(key: str, lookbacks: dict[str, Lookback], inputs: dict[str, Any]) -> int | None:
+    """
+    Calculate the bound of a series global from the lookbacks of its scope and the nested scopes
+    """
+    scope, name = _series_key_scope(key)
+    offset = 1  # SeriesImpl needs at least 1
+    for lookback_key, lookback in lookbacks.items():
+        lookback_scope, _, lookback_name = lookback_key.rpartition('.')
+        if lookback_name != name or not (lookback_scope == scope or lookback_scope.startswith(scope + '.')):
+            continue
+        lookback_offset = lookback.resolve(inputs)
+        if lookback_offset is None:
+            return None
+        offset = max(offset, lookback_offset)
+    return offset
+
+
+@lru_cache(maxsize=None)
+def _guarded_series_cls() -> type:
+    """
+    Create the guarded series class, lazily, because pynecore is imported lazily
+    """
+    from pynecore.core.series import SeriesImpl
+
+    class GuardedSeries(SeriesImpl):
+        """
+        Series which raises instead of silently returning na, if it is indexed beyond its bound
+        """
+        __slots__ = ()
+
+        def __getitem__(self, key):
+            if isinstance(key, (int, float)) and key > self._max_bars_back:
+                raise IndexError(f"Series is indexed with {key}, but it is bounded to "
+                                 f"{self._max_bars_back} bars, set max_bars_back in the script's toml!")
+            return SeriesImpl.__getitem__(self, key)
+
+    return GuardedSeries
+
+
+class SeriesGuard:
+    """
+    Runtime guard of the bounded series
+
+    Function isolation creates new series for every call site while running, so the guard
+    replaces them with guarded series whenever new isolated functions appear.
+    """
+
+    __slots__ = ('module_name', '_function_cache', '_cache_size')
+
+    def __init__(self, script_module: ModuleType):
+        # noinspection PyProtectedMember
+        from pynecore.core.function_isolation import _function_cache
+
+        self.module_name = script_module.__name__
+        self._function_cache = _function_cache
+        self._cache_size = -1
+
+    def sweep(self):
+        """
+        Guard series of newly isolated functions, it is cheap if there are none
+        """
+        function_cache = self._function_cache
+        if len(function_cache) == self._cache_size:
+            return
+        self._cache_size = len(function_cache)
+
+        guarded_cls = _guarded_series_cls()
+        for func in function_cache.values():
+            globals_ = func.__globals__
+            if globals_.get('__name__') != self.module_name:
+                continue
+            for key, series in list(_iter_series(globals_)):
+                if type(series) is not guarded_cls:
+                    globals_[key] = _guarded_copy(series)
+
+
+# noinspection PyProtectedMember
+def _bounded_copy(series: 'SeriesImpl', bound: int, guarded: bool = False) -> 'SeriesImpl':
+    """
+    Create a series with `bound` max_bars_back and the most recent values of the original
+
+    The `max_bars_back` setter of SeriesImpl never shrinks a buffer which is not full yet,
+    so the new buffer is built here.
+    """
+    from pynecore.core.series import SeriesImpl
+
+    new_series = (_guarded_series_cls() if guarded else SeriesImpl)(bound)
+    items = min(series._size, new_series._capacity)
+    for i in range(items):
+        new_series._buffer[items - 1 - i] = series[i]
+    new_series._size = new_series._write_pos = items
+    new_series._last_bar_index = series._last_bar_index
+    return new_series
+
+
+def _guarded_copy(series: 'SeriesImpl') -> 'SeriesImpl':
+    """
+    Create a guarded series with the same state
+    """
+    return _bounded_copy(series, series._max_bars_back, guarded=True)  # noqa
+
+
+def apply_series_bounds(script_module: ModuleType, script_inputs: dict[str, Any] | None = None,
+                        guard: bool = False) -> SeriesGuard | None:
+    """
+    Bound every series buffer of the script to the maximum offset it is actually indexed with
+
+    It must be called before the run, isolated functions copy the bounds from the module.
+    The `max_bars_back` setting of the script (toml) overrides the analysed bounds.
+
+    :param script_module: The script module imported with `import_script(..., bound_series=True)`
+    :param script_inputs: Inputs of the run, offsets may depend on them
+    :param guard: Replace series with guarded ones, which raise on out of bound indexing
+    :return: The guard to sweep on every bar if guard is set
+    """
+    try:
+        lookbacks: dict[str, Lookback] = script_module.__series_lookback__
+    except AttributeError:
+        lookbacks = script_module.__series_lookback__ = analyse_lookback(Path(script_module.__file__))
+
+    # Actual inputs, defaults of `main` are the input defaults
+    inputs = {name: param.default for name, param in inspect.signature(script_module.main).parameters.items()}
+    inputs.update(script_inputs or {})
+
+    max_bars_back_override = script_module.main.script.max_bars_back or 0
+
+    for key, series in list(_iter_series(script_module.__dict__)):
+        if max_bars_back_override > 0:
+            bound = max_bars_back_override
+        else:
+            bound = _series_bound(key, lookbacks, inputs)
+            if bound is None:
+                continue
+        script_module.__dict__[key] = _bounded_copy(series, bound, guarded=guard)
+
+    return SeriesGuard(script_module) if guard else None
+
+
+@dataclass(slots=True)
+class SeriesMemoryReport:
+    """
+    Memory held by the series of a script
+
+    :param script: The script module name
+    :param series_count: Number of series instances, including the copies of isolated functions
+    :param slots: Total capacity of the series buffers
+    :param bytes: Approximate memory of the series objects and their buffers
+    :param by_key: Per series global: (instances, slots, bytes)
+    """
+    script: str
+    series_count: int = 0
+    slots: int = 0
+    bytes: int = 0
+    by_key: dict[str, tuple[int, int, int]] = field(default_factory=dict)
+
+    def __str__(self) -> str:
+        lines = [f"{self.script}: {self.series_count} series, {self.slots} slots, {self.bytes / 1024:.1f} KiB"]
+        for key, (count, slots, size) in sorted(self.by_key.items(), key=lambda item: -item[1][2]):
+            lines.append(f"  {key}: {count} x, {slots} slots, {size / 1024:.1f} KiB")
+        return '\n'.join(lines)
+
+
+def series_memory(script_module: ModuleType) -> SeriesMemoryReport:
+    """
+    Report the memory held by the series of a script, including the isolated function copies
+    of the current run
+
+    :param script_module: The script module
+    :return: The memory report
+    """
+    # noinspection PyProtectedMember
+    from pynecore.core.function_isolation import _function_cache
+
+    report = SeriesMemoryReport(script_module.__name__)
+
+    globals_list = [script_module.__dict__]
+    globals_list.extend(func.__globals__ for func in _function_cache.values()
+                        if func.__globals__.get('__name__') == script_module.__name__)
+    # Isolated globals are shallow copies of the module globals, the same series may be in many of them
+    seen: set[int] = set()
+    for globals_ in globals_list:
+        for key, series in _iter_series(globals_):
+            if id(series) in seen:
+                continue
+            seen.add(id(series))
+            size = sys.getsizeof(series) + sys.getsizeof(series._buffer)  # noqa
+            count, slots, total = report.by_key.get(key, (0, 0, 0))
+            report.by_key[key] = (count + 1, slots + series._capacity, total + size)  # noqa
+            report.series_count += 1
+            report.slots += series._capacity  # noqa
+            report.bytes += size
+
+    return report
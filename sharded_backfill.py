@@ -0,0 +1,274 @@
+from typing import Any
+from types import ModuleType
+from pathlib import Path
+from dataclasses import dataclass
+import math
+import time
+import os
+
+from candle_cursor import CandleCursor
+from run_helpers import plain_value, import_fresh
+
+__all__ = [
+    'Shard',
+    'BoundaryDeviation',
+    'BackfillResult',
+    'auto_warmup',
+    'plan_shards',
+    'sharded_backfill',
+]
+
+
+@dataclass(slots=True)
+class Shard:
+    """
+    A part of the history run by one process
+
+    :param index: Number of the shard
+    :param warmup_start: Position of the first candle run, the state is built from here
+    :param start: Position of the first candle whose outputs are kept
+    :param end: Position after the last candle
+    """
+    index: int
+    warmup_start: int
+    start: int
+    end: int
+
+    @property
+    def warmup(self) -> int:
+        return self.start - self.warmup_start
+
+
+@dataclass(slots=True)
+class BoundaryDeviation:
+    """
+    Deviation of the sharded outputs from a serial run after a shard boundary
+
+    :param shard: The shard starting at the boundary
+    :param bar_index: Bar index of the boundary
+    :param column: The output
+    :param max_abs_diff: Maximum absolute difference in the checked bars, inf if NA differs from a value
+    :param max_rel_diff: Maximum difference relative to the serial value
+    :param mismatches: Number of bars differing beyond the tolerance
+    """
+    shard: int
+    bar_index: int
+    column: str
+    max_abs_diff: float
+    max_rel_diff: float
+    mismatches: int
+
+
+@dataclass(slots=True)
+class BackfillResult:
+    """
+    Stitched outputs of a sharded backfill
+
+    :param timestamps: Timestamp of every bar
+    :param columns: Output name -> value of every bar, NA is None
+    :param shards: The shards
+    :param elapsed: Running time of the sharded run in seconds
+    :param deviations: Deviations at the shard boundaries, only in verification mode
+    :param serial_elapsed: Running time of the serial run in seconds, only in verification mode
+    """
+    timestamps: list[int]
+    columns: dict[str, list]
+    shards: list[Shard]
+    elapsed: float = 0.0
+    deviations: list[BoundaryDeviation] | None = None
+    serial_elapsed: float | None = None
+
+    @property
+    def max_deviation(self) -> float:
+        """
+        Maximum absolute deviation at the shard boundaries, verification mode only
+        """
+        if self.deviations is None:
+            raise ValueError("The backfill was not verified!")
+        return max((d.max_abs_diff for d in self.deviations), default=0.0)
+
+    def summary(self) -> str:
+        out = [f"{len(self.timestamps)} bars in {len(self.shards)} shards in {self.elapsed:.2f} s "
+               f"(warm-up {', '.join(str(shard.warmup) for shard in self.shards)} bars)"]
+        if self.deviations is not None:
+            out.append(f"serial run: {self.serial_elapsed:.2f} s, max deviation at the boundaries: "
+                       f"{self.max_deviation:g}")
+            for d in self.deviations:
+                if d.mismatches:
+                    out.append(f"    shard {d.shard} (bar {d.bar_index}) / {d.column}: {d.mismatches} bars differ, "
+                               f"max abs diff {d.max_abs_diff:g}, max rel diff {d.max_rel_diff:g}")
+        return '\n'.join(out)
+
+
+def auto_warmup(script_module: ModuleType, inputs: dict[str, Any] | None = None, factor: float = 10.0,
+                minimum: int = 100) -> int:
+    """
+    Derive the warm-up of a script from its length inputs
+
+    Indicators like EMA or ATR forget exponentially: the weight of a bar `factor` * length bars back
+    is about e^(-2 * factor), so 10 lengths are far below float precision for the usual outputs.
+    Scripts with state that never fades (counters, trailing levels) should be verified.
+
+    :param script_module: The script
+    :param inputs: The inputs of the run, the other inputs have their default values
+    :param factor: Warm-up bars per unit of the longest integer input
+    :param minimum: Minimum warm-up
+    """
+    inputs = inputs or {}
+    lengths = [inputs.get(name, input_data.defval)
+               for name, input_data in script_module.main.script.inputs.items()
+               if input_data.input_type == 'int']
+    longest = max((length for length in lengths if isinstance(length, int)), default=0)
+    return max(minimum, math.ceil(longest * factor))
+
+
+def plan_shards(total: int, shards: int, warmup: int) -> list[Shard]:
+    """
+    Split the positions of a history into shards of equal length, every shard but the first starts
+    `warmup` candles earlier
+    """
+    shards = max(1, min(shards, total))
+    bounds = [total * i // shards for i in range(shards + 1)]
+    return [Shard(i, max(0, start - warmup), start, end)
+            for i, (start, end) in enumerate(zip(bounds, bounds[1:]))]
+
+
+def _load(data_path: Path, start_timestamp: int | None = None,
+          end_timestamp: int | None = None) -> CandleCursor:
+    if data_path.suffix == '.csv':
+        cursor = CandleCursor.from_csv(data_path)
+        lo = 0 if start_timestamp is None else next(
+            (i for i, ts in enumerate(cursor.timestamps) if ts >= start_timestamp), len(cursor))
+        hi = len(cursor) if end_timestamp is None else next(
+            (i for i, ts in enumerate(cursor.timestamps) if ts > end_timestamp), len(cursor))
+        return cursor.window(lo, hi)
+    return CandleCursor.from_ohlcv_file(data_path, start_timestamp, end_timestamp)
+
+
+def _run_range(script_path: str, data_path: str, inputs: dict[str, Any], start_timestamp: int | None,
+               end_timestamp: int | None, first_bar_index: int, keep_from: int) -> dict[str, list]:
+    """
+    Run a script on a time range, and collect the outputs from the `keep_from`th candle
+    """
+    from custom_script_runner_preload_script import fork_runner
+
+    script_module = import_fresh(script_path)
+    cursor = _load(Path(data_path), start_timestamp, end_timestamp)
+    columns: dict[str, list] = {}
+    kept = 0
+    for position, (_, plot_data) in enumerate(fork_runner(script_module, cursor, inputs,
+                                                            first_bar_index=first_bar_index)):
+        if position < keep_from:
+            continue
+        for key, value in plot_data.items():
+            column = columns.get(key)
+            if column is None:
+                column = columns[key] = [None] * kept
+            column.append(plain_value(value))
+        kept += 1
+        # Keys missing on this bar
+        for column in columns.values():
+            if len(column) < kept:
+                column.append(None)
+    return columns
+
+
+def _deviation(expected: list, actual: list, rel_tol: float, abs_tol: float) -> tuple[float, float, int]:
+    max_abs = max_rel = 0.0
+    mismatches = 0
+    for e, a in zip(expected, actual):
+        if e == a:
+            continue
+        if isinstance(e, (int, float)) and isinstance(a, (int, float)):
+            diff = abs(e - a)
+            if math.isnan(diff):  # NaN on one side only
+                diff = math.inf
+            rel = diff / abs(e) if e else math.inf
+        else:  # NA on one side only, or non-numeric values
+            diff = rel = math.inf
+        max_abs = max(max_abs, diff)
+        max_rel = max(max_rel, rel)
+        if diff > abs_tol and rel > rel_tol:
+            mismatches += 1
+    return max_abs, max_rel, mismatches
+
+
+def sharded_backfill(script_path: Path, data_path: Path, inputs: dict[str, Any] | None = None, *,
+                     shards: int | None = None, warmup: int | None = None, warmup_factor: float = 10.0,
+                     workers: int | None = None, start_timestamp: int | None = None,
+                     end_timestamp: int | None = None, verify: bool = False, verify_bars: int | None = None,
+                     rel_tol: float = 1e-9, abs_tol: float = 1e-9) -> BackfillResult:
+    """
+    Backfill an indicator by time shards in parallel processes
+
+    The history is split into shards, every shard is run from `warmup` candles before its start,
+    so its state converges to the state of a serial run by the time its outputs are kept, then the
+    outputs are stitched together. This only holds for scripts whose state fades, use `verify` to check it.
+
+    :param script_path: Path to the indicator script, strategies can't be sharded
+    :param data_path: Data file (`.ohlcv` or `.csv`)
+    :param inputs: Inputs to pass to pyne script: {"src": "close", "length": 20,}
+    :param shards: Number of shards, default is the number of workers
+    :param warmup: Warm-up candles before every shard, default is derived by `auto_warmup`
+    :param warmup_factor: Warm-up per unit of the longest integer input, if the warm-up is derived
+    :param workers: Number of processes, default is the number of CPUs
+    :param start_timestamp: Start timestamp (inclusive), None means from the first candle
+    :param end_timestamp: End timestamp (inclusive), None means until the last candle
+    :param verify: Also run the script serially, and report the deviation after every shard boundary
+    :param verify_bars: Bars checked after every boundary, default is the warm-up
+    :param rel_tol: Relative tolerance of the verification
+    :param abs_tol: Absolute tolerance of the verification
+    :return: The stitched outputs
+    :raises ValueError: If the script is a strategy
+    """
+    from concurrent.futures import ProcessPoolExecutor
+    from pynecore.types import script_type
+
+    inputs = inputs or {}
+    script = str(Path(script_path).resolve())
+    data = str(Path(data_path).resolve())
+    workers = workers or os.cpu_count() or 1
+
+    script_module = import_fresh(script)
+    if script_module.main.script.script_type == script_type.strategy:
+        raise ValueError("Strategies can't be sharded, their position depends on the whole history!")
+    if warmup is None:
+        warmup = auto_warmup(script_module, inputs, warmup_factor)
+
+    timestamps = _load(Path(data), start_timestamp, end_timestamp).timestamps
+    shard_list = plan_shards(len(timestamps), shards or workers, warmup)
+
+    started = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=min(workers, len(shard_list))) as executor:
+        futures = [executor.submit(_run_range, script, data, inputs, timestamps[shard.warmup_start],
+                                   timestamps[shard.end - 1], shard.warmup_start, shard.warmup)
+                   for shard in shard_list]
+        parts = [future.result() for future in futures]
+
+    # Stitch the kept parts, keys first seen in a later shard are NA before
+    columns: dict[str, list] = {}
+    length = 0
+    for shard, part in zip(shard_list, parts):
+        for key, values in part.items():
+            columns.setdefault(key, [None] * length).extend(values)
+        length += shard.end - shard.start
+        for column in columns.values():
+            if len(column) < length:
+                column.extend([None] * (length - len(column)))
+    result = BackfillResult(timestamps.tolist(), columns, shard_list, time.perf_counter() - started)
+
+    if verify:
+        started = time.perf_counter()
+        serial = _run_range(script, data, inputs, start_timestamp, end_timestamp, 0, 0)
+        result.serial_elapsed = time.perf_counter() - started
+        checked = verify_bars if verify_bars is not None else max(warmup, 1)
+        result.deviations = []
+        for shard in shard_list[1:]:
+            for key in sorted(set(serial) | set(columns)):
+                lo, hi = shard.start, min(shard.start + checked, shard.end)
+                max_abs, max_rel, mismatches = _deviation(serial.get(key, [None] * len(timestamps))[lo:hi],
+                                                          columns.get(key, [None] * len(timestamps))[lo:hi],
+                                                          rel_tol, abs_tol)
+                result.deviations.append(BoundaryDeviation(shard.index, shard.start, key, max_abs, max_rel,
+                                                           mismatches))
+    return result
@@ -0,0 +1,295 @@
+from typing import Any, Iterable, Iterator, Sequence, TYPE_CHECKING
+from multiprocessing.shared_memory import SharedMemory
+from array import array
+import struct
+import json
+import math
+
+if TYPE_CHECKING:
+    from chart_runner import ChartRunner
+    from metrics import RunnerMetrics
+
+__all__ = [
+    'SharedTablePublisher',
+    'SharedTableReader',
+    'publish_stage',
+]
+
+# Table layout, every slot is 8 bytes:
+#   MAGIC, data offset (uint64), schema length (uint64), JSON schema: symbols, columns, row_slots
+#   rows from the data offset, one per symbol, padded to 64 bytes (cache line), so writers of
+#   different symbols don't share cache lines:
+#       sequence (uint64): odd while the row is written, seqlock
+#       timestamp (int64): candle timestamp
+#       bar_index (int64)
+#       values (float64): one per (script, key) column, NA is NaN, bools are 0.0/1.0
+
+MAGIC = b'PYNESHM1'
+_HEADER = struct.Struct('<8sQQ')
+_ROW_HEAD = 3  # sequence, timestamp, bar_index
+_SLOTS_PER_LINE = 8
+
+# Names of the tables created by this process
+_created: set[str] = set()
+
+
+def _open_shm(name: str) -> SharedMemory:
+    """
+    Attach to an existing shared memory block without registering it to the resource tracker,
+    otherwise the tracker of a reader process would destroy the table when it exits
+    """
+    try:
+        return SharedMemory(name, track=False)  # type: ignore[call-arg]  # Python 3.13+
+    except TypeError:
+        import multiprocessing
+        from multiprocessing import resource_tracker
+        shm = SharedMemory(name)
+        # The table is registered if this process created it, child processes share the tracker of their parent
+        if name not in _created and multiprocessing.parent_process() is None:
+            # noinspection PyProtectedMember
+            resource_tracker.unregister(shm._name, 'shared_memory')  # type: ignore[attr-defined]
+        return shm
+
+
+def _float(value: Any) -> float:
+    if value is None:
+        return math.nan
+    try:
+        return float(value)
+    except (TypeError, ValueError):  # NA and non-numeric values
+        return math.nan
+
+
+class _Table:
+    """
+    Common part of the publisher and the reader
+    """
+
+    __slots__ = ('shm', 'symbols', 'columns', 'row_slots', '_ints', '_floats', '_rows', '_column_index')
+
+    def _attach(self, shm: SharedMemory):
+        self.shm = shm
+        magic, data_offset, schema_length = _HEADER.unpack_from(shm.buf, 0)
+        if magic != MAGIC:
+            raise ValueError(f"Not a shared indicator table: {shm.name}")
+        schema = json.loads(bytes(shm.buf[_HEADER.size:_HEADER.size + schema_length]))
+        self.symbols: list[str] = schema['symbols']
+        self.columns: list[tuple[str, str]] = [tuple(column) for column in schema['columns']]  # type: ignore
+        self.row_slots: int = schema['row_slots']
+        data = shm.buf[data_offset:data_offset + len(self.symbols) * self.row_slots * 8]
+        self._ints = data.cast('q')
+        self._floats = data.cast('d')
+        # symbol -> first slot of its row
+        self._rows: dict[str, int] = {symbol: i * self.row_slots for i, symbol in enumerate(self.symbols)}
+        self._column_index: dict[tuple[str, str], int] = {column: i for i, column in enumerate(self.columns)}
+
+    def _release(self):
+        self._ints.release()
+        self._floats.release()
+
+
+class SharedTablePublisher(_Table):
+    """
+    Writer of the latest indicator values into a shared memory table, one row per symbol
+
+    Every row has a single writer. Rows are protected by a seqlock: the sequence is odd while the row is
+    being written, so readers never lock the writer, they retry if they raced with it.
+    """
+
+    __slots__ = ('owner',)
+
+    def __init__(self, name: str, symbols: Sequence[str] | None = None,
+                 columns: Sequence[tuple[str, str]] | None = None):
+        """
+        Create the table, or attach to an existing one if symbols and columns are not given
+        (e.g. a writer process per symbol)
+
+        :param name: Name of the shared memory block
+        :param symbols: Symbols, the rows of the table
+        :param columns: (script id, output key) columns of the table
+        """
+        if symbols is None or columns is None:
+            self.owner = False
+            self._attach(_open_shm(name))
+            return
+
+        self.owner = True
+        row_slots = -(-(_ROW_HEAD + len(columns)) // _SLOTS_PER_LINE) * _SLOTS_PER_LINE
+        schema = json.dumps({'symbols': list(symbols), 'columns': [list(column) for column in columns],
+                             'row_slots': row_slots}).encode()
+        data_offset = -(-(_HEADER.size + len(schema)) // 64) * 64
+        shm = SharedMemory(name, create=True, size=data_offset + len(symbols) * row_slots * 8)
+        _created.add(name)
+        shm.buf[_HEADER.size:_HEADER.size + len(schema)] = schema
+        _HEADER.pack_into(shm.buf, 0, MAGIC, data_offset, len(schema))
+        self._attach(shm)
+        # NaN values until the first publication
+        nans = array('d', [math.nan] * len(self.columns))
+        for row in self._rows.values():
+            self._floats[row + _ROW_HEAD:row + _ROW_HEAD + len(nans)] = nans
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def publish_row(self, symbol: str, timestamp: int, bar_index: int, values: Sequence[float]):
+        """
+        Publish the values of a symbol in column order
+        """
+        row = self._rows[symbol]
+        ints = self._ints
+        ints[row] += 1  # Odd: writing
+        ints[row + 1] = timestamp
+        ints[row + 2] = bar_index
+        start = row + _ROW_HEAD
+        self._floats[start:start + len(values)] = array('d', values)
+        ints[row] += 1  # Even: consistent
+
+    def publish(self, symbol: str, timestamp: int, bar_index: int, res: dict[str, dict[str, Any] | None]):
+        """
+        Publish the outputs of a chart of a symbol, `ChartRunner.run_iter` results
+
+        :param symbol: The symbol
+        :param timestamp: Timestamp of the candle
+        :param bar_index: Bar index of the candle
+        :param res: script_id -> outputs, outputs of missing scripts or keys are published as NaN
+        """
+        values = []
+        for script_id, key in self.columns:
+            outputs = res.get(script_id)
+            values.append(_float(outputs.get(key)) if outputs else math.nan)
+        self.publish_row(symbol, timestamp, bar_index, values)
+
+    def close(self):
+        """
+        Detach, and destroy the table if it was created by this publisher
+        """
+        self._release()
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+            _created.discard(self.shm.name.lstrip('/'))
+
+
+class SharedTableReader(_Table):
+    """
+    Reader of a shared memory table, it copies a row only if it changed, without locking the writer
+    """
+
+    __slots__ = ()
+
+    def __init__(self, name: str):
+        """
+        :param name: Name of the shared memory block
+        """
+        self._attach(_open_shm(name))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def sequence(self, symbol: str) -> int:
+        """
+        Version of the row of the symbol, it changes on every publication, it is cheap to poll
+        """
+        return self._ints[self._rows[symbol]]
+
+    def read_row(self, symbol: str) -> tuple[int, int, int, list[float]]:
+        """
+        Read a consistent copy of the row of the symbol
+
+        :return: (sequence, timestamp, bar_index, values in column order)
+        """
+        row = self._rows[symbol]
+        ints = self._ints
+        floats = self._floats
+        start = row + _ROW_HEAD
+        end = start + len(self.columns)
+        while True:
+            seq = ints[row]
+            if seq & 1:  # Being written
+                continue
+            timestamp = ints[row + 1]
+            bar_index = ints[row + 2]
+            values = floats[start:end].tolist()
+            if ints[row] == seq:
+                return seq, timestamp, bar_index, values
+
+    def read(self, symbol: str) -> dict[str, dict[str, float]]:
+        """
+        Read the latest values of a symbol
+
+        :return: script_id -> {key: value}, like the results of `ChartRunner.run_iter`
+        """
+        _, _, _, values = self.read_row(symbol)
+        res: dict[str, dict[str, float]] = {}
+        for (script_id, key), value in zip(self.columns, values):
+            res.setdefault(script_id, {})[key] = value
+        return res
+
+    def get(self, symbol: str, script_id: str, key: str) -> float:
+        """
+        Read a single value
+        """
+        row = self._rows[symbol]
+        slot = row + _ROW_HEAD + self._column_index[(script_id, key)]
+        ints = self._ints
+        while True:
+            seq = ints[row]
+            if seq & 1:
+                continue
+            value = self._floats[slot]
+            if ints[row] == seq:
+                return value
+
+    def poll(self, symbols: Iterable[str] | None = None,
+             last: dict[str, int] | None = None) -> Iterator[tuple[str, tuple[int, int, int, list[float]]]]:
+        """
+        Read the rows which changed since the last poll
+
+        :param symbols: Symbols to poll, default is all
+        :param last: symbol -> last seen sequence, it is updated
+        :return: Iterator of (symbol, row) of the changed rows
+        """
+        if last is None:
+            last = {}
+        ints = self._ints
+        rows = self._rows
+        for symbol in symbols or self.symbols:
+            if ints[rows[symbol]] != last.get(symbol):
+                row = self.read_row(symbol)
+                last[symbol] = row[0]
+                yield symbol, row
+
+    def close(self):
+        """
+        Detach from the table
+        """
+        self._release()
+        self.shm.close()
+
+
+def publish_stage(publisher: SharedTablePublisher, symbol: str, chart: 'ChartRunner',
+                  metrics: 'RunnerMetrics | None' = None) -> Iterator[dict[str, dict[str, Any]]]:
+    """
+    Run a chart and publish the results of every bar, the results are passed through
+
+    :param publisher: The publisher
+    :param symbol: Symbol of the chart
+    :param chart: The chart runner
+    :param metrics: Metrics of the chart run, the publications are counted as the `shm` writer
+    """
+    from pynecore import lib
+
+    writer = metrics.writer('shm') if metrics else None
+    row_bytes = publisher.row_slots * 8
+    for res in chart.run_iter(metrics=metrics):
+        # lib._time is the timestamp of the current bar in milliseconds
+        publisher.publish(symbol, lib._time // 1000, chart.bar_index, res)
+        if writer:
+            writer.record(1, row_bytes)
+        yield res
@@ -0,0 +1,266 @@
+from typing import Iterable, Iterator
+from pathlib import Path
+from array import array
+import sqlite3
+
+from pynecore.types.ohlcv import OHLCV
+
+__all__ = [
+    'SQLiteOHLCVWriter',
+    'SQLiteOHLCVReader',
+]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS ohlcv (
+    symbol TEXT NOT NULL,
+    timestamp INTEGER NOT NULL,
+    open REAL NOT NULL,
+    high REAL NOT NULL,
+    low REAL NOT NULL,
+    close REAL NOT NULL,
+    volume REAL NOT NULL,
+    PRIMARY KEY (symbol, timestamp)
+) WITHOUT ROWID
+"""
+
+_INSERT = "INSERT OR REPLACE INTO ohlcv VALUES (?, ?, ?, ?, ?, ?, ?)"
+
+
+def _range_query(columns: str, start_timestamp: int | None, end_timestamp: int | None, ordered: bool = True) -> str:
+    """
+    Build a range query on the (symbol, timestamp) primary key, the range is pushed down to the index
+    """
+    query = f"SELECT {columns} FROM ohlcv WHERE symbol = ?"
+    if start_timestamp is not None:
+        query += " AND timestamp >= ?"
+    if end_timestamp is not None:
+        query += " AND timestamp <= ?"
+    return query + " ORDER BY timestamp" if ordered else query
+
+
+def _range_params(symbol: str, start_timestamp: int | None, end_timestamp: int | None) -> tuple:
+    return (symbol,) + tuple(ts for ts in (start_timestamp, end_timestamp) if ts is not None)
+
+
+class SQLiteOHLCVWriter:
+    """
+    OHLCV writer into a SQLite database, candles of many symbols in one table, indexed by (symbol, timestamp)
+    """
+
+    __slots__ = ('path', 'batch_size', '_conn')
+
+    def __init__(self, path: Path | str, batch_size: int = 10000):
+        """
+        :param path: Path of the database file, it is created if not exists
+        :param batch_size: Number of rows inserted by one `executemany`
+        """
+        self.path = path
+        self.batch_size = batch_size
+        self._conn: sqlite3.Connection | None = None
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def open(self) -> 'SQLiteOHLCVWriter':
+        """
+        Open the database and create the table if needed
+        """
+        self._conn = sqlite3.connect(self.path)
+        self._conn.execute("PRAGMA journal_mode = WAL")
+        self._conn.execute("PRAGMA synchronous = NORMAL")
+        self._conn.execute(_SCHEMA)
+        return self
+
+    def close(self):
+        """
+        Commit and close the database
+        """
+        if self._conn:
+            self._conn.commit()
+            self._conn.close()
+            self._conn = None
+
+    def write(self, symbol: str, candle: OHLCV):
+        """
+        Write (or replace) a single candle, prefer `write_many` for bulk data
+        """
+        assert self._conn is not None
+        self._conn.execute(_INSERT, (symbol, *candle[:6]))
+
+    def write_many(self, symbol: str, ohlcv_iter: Iterable[OHLCV], skip_gaps: bool = True) -> int:
+        """
+        Write candles in batches, in one transaction
+
+        :param symbol: The symbol of the candles
+        :param ohlcv_iter: Iterator of OHLCV data
+        :param skip_gaps: Skip gap candles (negative volume), that the `.ohlcv` writer uses to fill gaps
+        :return: Number of candles written
+        """
+        assert self._conn is not None
+        count = 0
+        batch: list[tuple] = []
+        with self._conn:
+            for candle in ohlcv_iter:
+                if skip_gaps and candle.volume < 0:
+                    continue
+                batch.append((symbol, *candle[:6]))
+                if len(batch) >= self.batch_size:
+                    self._conn.executemany(_INSERT, batch)
+                    count += len(batch)
+                    batch.clear()
+            if batch:
+                self._conn.executemany(_INSERT, batch)
+                count += len(batch)
+        return count
+
+    def import_ohlcv_file(self, symbol: str, path: Path | str) -> int:
+        """
+        Bulk import a `.ohlcv` file
+
+        :return: Number of candles imported
+        """
+        from pynecore.core.ohlcv_file import OHLCVReader
+
+        with OHLCVReader(str(path)) as reader:
+            return self.write_many(symbol, reader)
+
+    def import_csv(self, symbol: str, path: Path | str) -> int:
+        """
+        Bulk import a CSV file with timestamp,open,high,low,close,volume columns
+
+        :return: Number of candles imported
+        """
+        import csv
+
+        assert self._conn is not None
+        count = 0
+        with open(path, mode='r') as csvfile, self._conn:
+            csv_reader = csv.DictReader(csvfile)
+            batch: list[tuple] = []
+            for row in csv_reader:
+                batch.append((symbol, int(row['timestamp']), float(row['open']), float(row['high']),
+                              float(row['low']), float(row['close']), float(row['volume'])))
+                if len(batch) >= self.batch_size:
+                    self._conn.executemany(_INSERT, batch)
+                    count += len(batch)
+                    batch.clear()
+            if batch:
+                self._conn.executemany(_INSERT, batch)
+                count += len(batch)
+        return count
+
+
+class SQLiteOHLCVReader:
+    """
+    OHLCV reader from a SQLite database written by `SQLiteOHLCVWriter`
+    """
+
+    __slots__ = ('path', 'batch_size', '_conn')
+
+    def __init__(self, path: Path | str, batch_size: int = 4096):
+        """
+        :param path: Path of the database file
+        :param batch_size: Number of rows fetched by one `fetchmany`
+        """
+        self.path = path
+        self.batch_size = batch_size
+        self._conn: sqlite3.Connection | None = None
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def open(self) -> 'SQLiteOHLCVReader':
+        """
+        Open the database read-only
+        """
+        self._conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True)
+        return self
+
+    def close(self):
+        """
+        Close the database
+        """
+        if self._conn:
+            self._conn.close()
+            self._conn = None
+
+    def symbols(self) -> list[str]:
+        """
+        List of the symbols in the database
+        """
+        assert self._conn is not None
+        return [row[0] for row in self._conn.execute("SELECT DISTINCT symbol FROM ohlcv ORDER BY symbol")]
+
+    def get_range(self, symbol: str) -> tuple[int, int] | None:
+        """
+        First and last timestamp of a symbol, or None if the symbol has no data
+        """
+        assert self._conn is not None
+        first, last = self._conn.execute("SELECT MIN(timestamp), MAX(timestamp) FROM ohlcv WHERE symbol = ?",
+                                          (symbol,)).fetchone()
+        return None if first is None else (first, last)
+
+    def get_size(self, symbol: str, start_timestamp: int | None = None, end_timestamp: int | None = None) -> int:
+        """
+        Number of candles of a symbol in the range
+        """
+        assert self._conn is not None
+        return self._conn.execute(_range_query("COUNT(*)", start_timestamp, end_timestamp, ordered=False),
+                                  _range_params(symbol, start_timestamp, end_timestamp)).fetchone()[0]
+
+    def read_from(self, symbol: str, start_timestamp: int | None = None,
+                  end_timestamp: int | None = None) -> Iterator[OHLCV]:
+        """
+        Read candles of a symbol in a time range, it can be passed directly to `fork_runner`
+
+        :param symbol: The symbol
+        :param start_timestamp: Start timestamp (inclusive), None means from the first candle
+        :param end_timestamp: End timestamp (inclusive), None means until the last candle
+        """
+        assert self._conn is not None
+        # The constant NULL column is the extra_fields of OHLCV, so rows can be made into OHLCV directly
+        cursor = self._conn.execute(
+            _range_query("timestamp, open, high, low, close, volume, NULL", start_timestamp, end_timestamp),
+            _range_params(symbol, start_timestamp, end_timestamp))
+        make = OHLCV._make
+        fetchmany = cursor.fetchmany
+        batch_size = self.batch_size
+        try:
+            while rows := fetchmany(batch_size):
+                yield from map(make, rows)
+        finally:
+            cursor.close()
+
+    def read_columns(self, symbol: str, start_timestamp: int | None = None,
+                     end_timestamp: int | None = None) -> dict[str, array]:
+        """
+        Read candles of a symbol in a time range into contiguous columns
+
+        :return: {"timestamp": array('q'), "open": array('d'), ..., "volume": array('d')}
+        """
+        assert self._conn is not None
+        timestamp, open_, high, low, close, volume = \
+            array('q'), array('d'), array('d'), array('d'), array('d'), array('d')
+        cursor = self._conn.execute(
+            _range_query("timestamp, open, high, low, close, volume", start_timestamp, end_timestamp),
+            _range_params(symbol, start_timestamp, end_timestamp))
+        try:
+            while rows := cursor.fetchmany(self.batch_size):
+                ts, o, h, lo, c, v = zip(*rows)
+                timestamp.extend(ts)
+                open_.extend(o)
+                high.extend(h)
+                low.extend(lo)
+                close.extend(c)
+                volume.extend(v)
+        finally:
+            cursor.close()
+        return {'timestamp': timestamp, 'open': open_, 'high': high, 'low': low, 'close': close, 'volume': volume}
@@ -0,0 +1,222 @@
+from typing import Iterable, Iterator, TYPE_CHECKING
+import math
+
+if TYPE_CHECKING:
+    from pynecore.lib.strategy import Trade
+
+__all__ = [
+    'StrategyStats',
+    'track_stats',
+]
+
+YEAR_SECONDS = 365 * 24 * 60 * 60
+
+
+class StrategyStats:
+    """
+    Performance statistics of a strategy run, updated in O(1) per closed trade and per bar
+
+    Nothing is retained but a few running sums, so the memory is constant, and every statistic
+    can be read at any time during the run. The equity curve is sampled on the bar closes, so the
+    drawdown doesn't see intrabar lows. The Sharpe ratio is computed from the bar to bar returns
+    of the equity (Welford's algorithm), annualized by the average bar interval.
+    """
+
+    __slots__ = ('initial_capital', 'risk_free_rate',
+                 'trades', 'wins', 'losses', 'gross_profit', 'gross_loss', 'commission',
+                 'largest_win', 'largest_loss',
+                 'bars', 'equity', 'peak_equity', 'max_drawdown', 'max_drawdown_percent',
+                 'first_timestamp', 'last_timestamp', '_returns', '_mean', '_m2')
+
+    def __init__(self, initial_capital: float, risk_free_rate: float = 0.0):
+        """
+        :param initial_capital: Initial capital of the strategy, the start of the equity curve
+        :param risk_free_rate: Annual risk free rate of the Sharpe ratio, e.g. 0.02 for 2%
+        """
+        self.initial_capital = float(initial_capital)
+        self.risk_free_rate = risk_free_rate
+
+        self.trades = 0
+        self.wins = 0
+        self.losses = 0
+        self.gross_profit = 0.0
+        self.gross_loss = 0.0
+        self.commission = 0.0
+        self.largest_win = 0.0
+        self.largest_loss = 0.0
+
+        self.bars = 0
+        self.equity = self.initial_capital
+        self.peak_equity = self.initial_capital
+        self.max_drawdown = 0.0
+        self.max_drawdown_percent = 0.0
+        self.first_timestamp = 0
+        self.last_timestamp = 0
+        # Count, mean and sum of squared deviations of the bar returns
+        self._returns = 0
+        self._mean = 0.0
+        self._m2 = 0.0
+
+    def on_trade(self, trade: 'Trade'):
+        """
+        Record a closed trade
+        """
+        profit = float(trade.profit)
+        self.trades += 1
+        self.commission += float(trade.commission)
+        if profit > 0.0:
+            self.wins += 1
+            self.gross_profit += profit
+            if profit > self.largest_win:
+                self.largest_win = profit
+        elif profit < 0.0:
+            self.losses += 1
+            self.gross_loss -= profit
+            if profit < self.largest_loss:
+                self.largest_loss = profit
+
+    def on_bar(self, timestamp: int, equity: float):
+        """
+        Record the equity at the close of a bar
+
+        :param timestamp: Timestamp of the candle in seconds
+        :param equity: Equity including the open profit
+        """
+        if self.bars:
+            previous = self.equity
+            if previous:
+                # Welford's online mean and variance
+                r = equity / previous - 1.0
+                self._returns += 1
+                delta = r - self._mean
+                self._mean += delta / self._returns
+                self._m2 += delta * (r - self._mean)
+        else:
+            self.first_timestamp = timestamp
+        self.bars += 1
+        self.last_timestamp = timestamp
+        self.equity = equity
+
+        if equity > self.peak_equity:
+            self.peak_equity = equity
+        else:
+            drawdown = self.peak_equity - equity
+            if drawdown > self.max_drawdown:
+                self.max_drawdown = drawdown
+            if self.peak_equity > 0.0:
+                drawdown_percent = drawdown / self.peak_equity * 100.0
+                if drawdown_percent > self.max_drawdown_percent:
+                    self.max_drawdown_percent = drawdown_percent
+
+    @property
+    def net_profit(self) -> float:
+        """
+        Profit of the closed trades
+        """
+        return self.gross_profit - self.gross_loss
+
+    @property
+    def open_profit(self) -> float:
+        """
+        Profit of the open trades at the last bar
+        """
+        return self.equity - self.initial_capital - self.net_profit
+
+    @property
+    def even(self) -> int:
+        return self.trades - self.wins - self.losses
+
+    @property
+    def win_rate(self) -> float:
+        """
+        Ratio of the winning trades, NaN without trades
+        """
+        return self.wins / self.trades if self.trades else math.nan
+
+    @property
+    def profit_factor(self) -> float:
+        """
+        Gross profit / gross loss, inf without losing trades, NaN without trades
+        """
+        if self.gross_loss:
+            return self.gross_profit / self.gross_loss
+        return math.inf if self.gross_profit else math.nan
+
+    @property
+    def avg_trade(self) -> float:
+        return self.net_profit / self.trades if self.trades else math.nan
+
+    @property
+    def periods_per_year(self) -> float:
+        """
+        Bars per year by the average bar interval, NaN before the second bar
+        """
+        if self.bars < 2 or self.last_timestamp == self.first_timestamp:
+            return math.nan
+        return YEAR_SECONDS * (self.bars - 1) / (self.last_timestamp - self.first_timestamp)
+
+    @property
+    def sharpe(self) -> float:
+        """
+        Annualized Sharpe ratio of the bar returns, NaN if the equity never changed
+        """
+        if self._returns < 2 or not self._m2:
+            return math.nan
+        periods = self.periods_per_year
+        std = math.sqrt(self._m2 / (self._returns - 1))
+        excess = self._mean - self.risk_free_rate / periods
+        return excess / std * math.sqrt(periods)
+
+    def as_dict(self) -> dict[str, float | int]:
+        """
+        The statistics at the current bar
+        """
+        return {
+            'net_profit': self.net_profit,
+            'open_profit': self.open_profit,
+            'gross_profit': self.gross_profit,
+            'gross_loss': self.gross_loss,
+            'commission': self.commission,
+            'trades': self.trades,
+            'wins': self.wins,
+            'losses': self.losses,
+            'win_rate': self.win_rate,
+            'profit_factor': self.profit_factor,
+            'avg_trade': self.avg_trade,
+            'largest_win': self.largest_win,
+            'largest_loss': self.largest_loss,
+            'equity': self.equity,
+            'max_drawdown': self.max_drawdown,
+            'max_drawdown_percent': self.max_drawdown_percent,
+            'sharpe': self.sharpe,
+            'bars': self.bars,
+        }
+
+    def summary(self) -> str:
+        """
+        Human readable statistics
+        """
+        return (f"{self.bars} bars, {self.trades} trades, net profit {self.net_profit:.2f} "
+                f"(open {self.open_profit:.2f}), win rate {self.win_rate:.2%}, "
+                f"profit factor {self.profit_factor:.3f}, max drawdown {self.max_drawdown:.2f} "
+                f"({self.max_drawdown_percent:.2f}%), Sharpe {self.sharpe:.3f}")
+
+
+def track_stats(source: Iterable[tuple], stats: StrategyStats) -> Iterator[tuple]:
+    """
+    Pass through the iterator of `fork_runner` of a strategy, and update the statistics on every bar
+
+    :param source: The iterator of `fork_runner`: (candle, plot data, new closed trades)
+    :param stats: The statistics to update, query it while iterating
+    :return: The items of the source, the statistics are up to date when an item is yielded
+    """
+    from pynecore import lib
+
+    for item in source:
+        script = lib._script
+        if len(item) == 3:
+            for trade in item[2]:
+                stats.on_trade(trade)
+        position = script.position
+        stats.on_bar(item[0].timestamp, script.initial_capital + position.netprofit + position.openprofit)
+        yield item